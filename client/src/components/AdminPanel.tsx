@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Plus, Edit, Trash2, Building2, BookOpen, X, Save, Search, MapPin, Users, Shield, ShieldOff, UserX, ArrowLeft, PenBox, Pen, List } from "lucide-react";
 import "../styles/AdminPanel.css";
 import axiosInstance from "../utils/axiosInstance.ts";
@@ -50,11 +50,33 @@ interface Test{
 
 type EntityType = 'faculty' | 'subject' | 'module' | 'user' | 'test';
 
+// GET /catalog/tree: faculties -> modules -> subjects, each subject with its test count
+interface CatalogTree {
+  faculties: { modules: { subjects: { code: string; test_count: number }[] }[] }[];
+}
+
+const catalogTestCounts = (tree: CatalogTree) => {
+  const counts: Record<string, number> = {};
+  tree.faculties.forEach(f => f.modules.forEach(m => m.subjects.forEach(s => {
+    counts[s.code] = s.test_count;
+  })));
+  return counts;
+};
+
+// Tests fetched per request in the subject's test list (the /tests/find maximum)
+const TESTS_PAGE_SIZE = 100;
+
 function AdminPanel() {
   const [activeTab, setActiveTab] = useState<EntityType>('faculty');
   const [faculties, setFaculties] = useState<Faculty[]>([]);
   const [subjects, setSubjects] = useState<Subject[]>([]);
   const [tests, setTests] = useState<Test[]>([]);
+  const [testsTotal, setTestsTotal] = useState<number | null>(null);
+  // Tests per subject code, from the catalog tree
+  const [testCounts, setTestCounts] = useState<Record<string, number>>({});
+  const [testsLoading, setTestsLoading] = useState(false);
+  // Subject whose tests are listed; responses for a previously opened subject are dropped
+  const testsSubject = useRef<string | null>(null);
   const [users, setUsers] = useState<User[]>([]);
   const [searchQuery, setSearchQuery] = useState("");
   const [showModal, setShowModal] = useState(false);
@@ -101,10 +123,12 @@ function AdminPanel() {
         const res = await axiosInstance.get("/faculties");
         setFaculties(res.data);
       } else if (activeTab === 'subject') {
-        const res = await axiosInstance.get("/subjects");
+        const [res, tree] = await Promise.all([
+          axiosInstance.get("/subjects"),
+          axiosInstance.get("/catalog/tree")
+        ]);
         setSubjects(res.data);
-        const tests = await axiosInstance.get("/tests/all");
-        setTests(tests.data);
+        setTestCounts(catalogTestCounts(tree.data));
       } else if (activeTab === 'user') {
         const usersData = await userService.getAllUsers();
         setUsers(usersData);
@@ -150,11 +174,38 @@ function AdminPanel() {
     setShowDeleteModal(true);
   };
 
-  const handleListTests = (item:any) => {
+  const fetchTestsPage = async (subjectCode: string, skip: number) => {
+    setTestsLoading(true);
+    try {
+      const res = await axiosInstance.get("/tests/find", {
+        params: { subject_code: subjectCode, limit: TESTS_PAGE_SIZE, skip }
+      });
+      if (testsSubject.current !== subjectCode) return;
+      setTests(tests => skip === 0 ? res.data : [...tests, ...res.data]);
+      // A short page means there is nothing more, whatever the count said
+      if (res.data.length < TESTS_PAGE_SIZE) setTestsTotal(skip + res.data.length);
+    } catch (error) {
+      console.error("Error fetching tests:", error);
+    } finally {
+      if (testsSubject.current === subjectCode) setTestsLoading(false);
+    }
+  };
+
+  const handleListTests = async (item:any) => {
     setEditingItem(item);
     setShowTests(true);
+    // Don't show the previous subject's tests while this one loads
+    testsSubject.current = item.code;
+    setTests([]);
+    setTestsTotal(testCounts[item.code] ?? null);
+    // Load only this subject's tests, a page at a time; the total comes from the catalog tree
+    await fetchTestsPage(item.code, 0);
   }
 
+  const handleLoadMoreTests = () => {
+    if (editingItem && !testsLoading) fetchTestsPage(editingItem.code, tests.length);
+  };
+
   const confirmDelete = async () => {
     if (!deleteTarget) return;
     try {
@@ -173,6 +224,10 @@ function AdminPanel() {
           const filtered = tests.filter(t => t.id !== deleteTarget.id);
           return filtered;
         });
+        setTestsTotal(total => total === null ? null : Math.max(total - 1, 0));
+        if (editingItem) {
+          setTestCounts(counts => ({ ...counts, [editingItem.code]: Math.max((counts[editingItem.code] ?? 1) - 1, 0) }));
+        }
 
         await axiosInstance.delete(`/tests/${deleteTarget.id}`);
       }
@@ -416,6 +471,10 @@ function AdminPanel() {
                   <span className="detail-label">ECTS:</span>
                   <span className="detail-value">{subject.espb}</span>
                 </div>
+                <div className="detail-item">
+                  <span className="detail-label">Tests:</span>
+                  <span className="detail-value">{testCounts[subject.code] ?? 0}</span>
+                </div>
               </div>
               <div className="card-badges">
                 {subject.mandatory ? (
@@ -802,7 +861,7 @@ function AdminPanel() {
             <div className="modal-body">
               <div className="test-questions">
                 {tests.filter(t => t.subject_code === editingItem.code).length === 0 ? (
-                  <p className="no-modules">No tests found for this subject</p>
+                  <p className="no-modules">{testsLoading ? "Loading tests..." : "No tests found for this subject"}</p>
                 ) : (
                   tests.map((t, index) => {
                     if (t.subject_code === editingItem.code)
@@ -841,6 +900,18 @@ function AdminPanel() {
                   })
                 )}
               </div>
+              {tests.length > 0 && (
+                <div className="tests-pager">
+                  <span>
+                    Showing {tests.length}{testsTotal !== null && ` of ${testsTotal}`} tests
+                  </span>
+                  {(testsTotal === null || tests.length < testsTotal) && (
+                    <button onClick={handleLoadMoreTests} className="load-more-btn" disabled={testsLoading}>
+                      {testsLoading ? "Loading..." : "Load more"}
+                    </button>
+                  )}
+                </div>
+              )}
 
             </div>
           </div>
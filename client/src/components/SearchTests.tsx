@@ -4,8 +4,8 @@ import "../styles/SearchTests.css";
 import axiosInstance from "../utils/axiosInstance.ts";
 import { useNavigate } from "react-router-dom";
 
+// Shapes of GET /catalog/tree, which carries the whole faculty -> module -> subject navigation
 interface Faculty {
-  _id: string;
   name: string;
   code: string;
   modules: Module[];
@@ -13,20 +13,20 @@ interface Faculty {
 
 interface Module {
   name: string;
-  code: string;
-  description?: string;
+  code?: string;
+  subjects: Subject[];
 }
 
 interface Subject {
-  _id: string;
   code: string;
   name: string;
-  faculty_code: string;
-  module_code: string;
   year: number;
   semester: number;
   mandatory: boolean;
-  espb: number;
+  espb?: number;
+  test_count: number;
+  latest_academic_year?: string;
+  latest_exam_period?: string;
 }
 
 interface Test {
@@ -41,7 +41,8 @@ interface Test {
 interface QuestionFrequency {
   question: string;
   count: number;
-  test_ids: string[];
+  test_ids?: string[];
+  test_count: number;
   exam_periods: string[];
 }
 
@@ -51,12 +52,14 @@ interface QuestionAnalysis {
   total_questions: number;
   unique_questions: number;
   questions: QuestionFrequency[];
+  next_cursor?: string;
 }
 
+const FREQUENCY_PAGE_SIZE = 50;
+
 function SearchTests() {
   const [step, setStep] = useState(1);
   const [faculties, setFaculties] = useState<Faculty[]>([]);
-  const [subjects, setSubjects] = useState<Subject[]>([]);
   const [tests, setTests] = useState<Test[]>([]);
   const [allTests, setAllTests] = useState<Test[]>([]);
   
@@ -83,7 +86,7 @@ function SearchTests() {
   const navigate = useNavigate();
 
   useEffect(() => {
-    fetchFaculties();
+    fetchCatalog();
   }, []);
 
   // Cleanup blob URLs on unmount
@@ -180,13 +183,14 @@ function SearchTests() {
     }
   };
 
-  const fetchFaculties = async () => {
+  // One request for the whole navigation; modules and subjects are picked from it locally
+  const fetchCatalog = async () => {
     setIsLoading(true);
     try {
-      const res = await axiosInstance.get("/faculties");
-      setFaculties(res.data);
+      const res = await axiosInstance.get("/catalog/tree");
+      setFaculties(res.data.faculties);
     } catch (error) {
-      console.error("Error fetching faculties:", error);
+      console.error("Error fetching catalog:", error);
     }
     setIsLoading(false);
   };
@@ -198,43 +202,14 @@ function SearchTests() {
     setStep(2);
   };
 
-  const handleSelectModule = async (module: Module) => {
+  const handleSelectModule = (module: Module) => {
     setSelectedModule(module);
     setSelectedSubject(null);
     setStep(3);
-    
-    setIsLoading(true);
-    try {
-      const res = await axiosInstance.get(`/subjects`, {
-        params: {
-          module_code: module.code,
-          year: selectedYear
-        }
-      });
-      setSubjects(res.data);
-    } catch (error) {
-      console.error("Error fetching subjects:", error);
-    }
-    setIsLoading(false);
   };
 
-  const handleYearChange = async (year: number) => {
+  const handleYearChange = (year: number) => {
     setSelectedYear(year);
-    if (selectedModule) {
-      setIsLoading(true);
-      try {
-        const res = await axiosInstance.get(`/subjects`, {
-          params: {
-            module_code: selectedModule.code,
-            year: year
-          }
-        });
-        setSubjects(res.data);
-      } catch (error) {
-        console.error("Error fetching subjects:", error);
-      }
-      setIsLoading(false);
-    }
   };
 
   const handleSelectSubject = async (subject: Subject) => {
@@ -264,7 +239,9 @@ function SearchTests() {
     
     setIsLoadingFrequency(true);
     try {
-      const res = await axiosInstance.get(`/tests/analyze/${selectedSubject.code}`);
+      const res = await axiosInstance.get(`/tests/analyze/${selectedSubject.code}`, {
+        params: { top_k: FREQUENCY_PAGE_SIZE, include_test_ids: false }
+      });
       setFrequencyData(res.data);
       setShowFrequencyView(true);
     } catch (error) {
@@ -273,6 +250,24 @@ function SearchTests() {
     setIsLoadingFrequency(false);
   };
 
+  const handleLoadMoreFrequency = async () => {
+    if (!selectedSubject || !frequencyData?.next_cursor) return;
+
+    setIsLoadingFrequency(true);
+    try {
+      const res = await axiosInstance.get(`/tests/analyze/${selectedSubject.code}`, {
+        params: { top_k: FREQUENCY_PAGE_SIZE, include_test_ids: false, cursor: frequencyData.next_cursor }
+      });
+      setFrequencyData({
+        ...res.data,
+        questions: [...frequencyData.questions, ...res.data.questions]
+      });
+    } catch (error) {
+      console.error("Error loading more questions:", error);
+    }
+    setIsLoadingFrequency(false);
+  };
+
   const handleTestSearch = async () => {
     if (!selectedSubject) return;
 
@@ -309,7 +304,6 @@ function SearchTests() {
     setSubjectSearch("");
     setTestTextSearch("");
     setTests([]);
-    setSubjects([]);
     setShowFrequencyView(false);
     setFrequencyData(null);
     setShowingOriginal({});
@@ -323,9 +317,11 @@ function SearchTests() {
 
   const filteredModules = selectedFaculty?.modules.filter(m =>
     m.name.toLowerCase().includes(moduleSearch.toLowerCase()) ||
-    m.code.toLowerCase().includes(moduleSearch.toLowerCase())
+    (m.code || "").toLowerCase().includes(moduleSearch.toLowerCase())
   ) || [];
 
+  const subjects = selectedModule?.subjects.filter(s => s.year === selectedYear) || [];
+
   const filteredSubjects = subjects.filter(s =>
     s.name.toLowerCase().includes(subjectSearch.toLowerCase()) ||
     s.code.toLowerCase().includes(subjectSearch.toLowerCase())
@@ -422,7 +418,7 @@ function SearchTests() {
               <div className="cards-grid">
                 {filteredFaculties.map((faculty) => (
                   <div
-                    key={faculty._id}
+                    key={faculty.code}
                     className="select-card"
                     onClick={() => handleSelectFaculty(faculty)}
                   >
@@ -472,8 +468,8 @@ function SearchTests() {
                       <Filter />
                     </div>
                     <h3>{module.name}</h3>
-                    <span className="card-code">{module.code}</span>
-                    {module.description && <p className="card-desc">{module.description}</p>}
+                    {module.code && <span className="card-code">{module.code}</span>}
+                    <p className="card-meta">{module.subjects.length} subjects</p>
                   </div>
                 ))}
               </div>
@@ -520,7 +516,7 @@ function SearchTests() {
               <div className="cards-grid">
                 {filteredSubjects.map((subject) => (
                   <div
-                    key={subject._id}
+                    key={subject.code}
                     className="select-card subject-card"
                     onClick={() => handleSelectSubject(subject)}
                   >
@@ -532,7 +528,8 @@ function SearchTests() {
                     <div className="subject-meta">
                       <span className="meta-item">Year {subject.year}</span>
                       <span className="meta-item">Sem {subject.semester}</span>
-                      <span className="meta-item">{subject.espb} ECTS</span>
+                      {subject.espb !== undefined && <span className="meta-item">{subject.espb} ECTS</span>}
+                      <span className="meta-item">{subject.test_count} tests</span>
                     </div>
                     {subject.mandatory ? (
                       <span className="mandatory-badge">Mandatory</span>
@@ -610,6 +607,14 @@ function SearchTests() {
                     return (
                       <div key={test.id} className="test-card">
                         <div className="test-header">
+                          <img
+                            src={`${axiosInstance.defaults.baseURL}/tests/${test.id}/preview`}
+                            alt={`Preview of ${test.exam_period}`}
+                            className="test-thumbnail"
+                            loading="lazy"
+                            onClick={() => handleShowOriginal(test.id)}
+                            onError={(e) => { e.currentTarget.style.display = "none"; }}
+                          />
                           <div className="test-icon">
                             <FileText />
                           </div>
@@ -724,6 +729,16 @@ function SearchTests() {
                           </div>
                         </div>
                       ))}
+
+                      {frequencyData.next_cursor && (
+                        <button
+                          onClick={handleLoadMoreFrequency}
+                          className="load-more-btn"
+                          disabled={isLoadingFrequency}
+                        >
+                          {isLoadingFrequency ? 'Loading...' : 'Load more questions'}
+                        </button>
+                      )}
                     </div>
                   </>
                 )}
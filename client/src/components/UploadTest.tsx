@@ -23,6 +23,15 @@ interface Subject {
   year: number;
 }
 
+interface PageProgress {
+  page: number;
+  pages: number;
+  method: string;
+  elapsed_ms: number;
+  question_offset: number;
+  questions: string[];
+}
+
 function UploadTestForm() {
   const [faculties, setFaculties] = useState<Faculty[]>([]);
   const [subjects, setSubjects] = useState<Subject[]>([]);
@@ -40,6 +49,7 @@ function UploadTestForm() {
   const [isSuccess, setIsSuccess] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [isDragging, setIsDragging] = useState(false);
+  const [progress, setProgress] = useState<PageProgress | null>(null);
 
   const navigate = useNavigate();
 
@@ -81,6 +91,7 @@ function UploadTestForm() {
     e.preventDefault();
     setIsUploading(true);
     setMessage("");
+    setProgress(null);
 
     if (!file) {
       setMessage("Please select a file first.");
@@ -104,9 +115,7 @@ function UploadTestForm() {
     formData.append("file", file);
     
     try {
-      const res = await axiosInstance.post("/tests", formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
+      await uploadWithProgress(formData);
       
       setMessage("Test uploaded successfully!");
       setIsSuccess(true);
@@ -120,16 +129,67 @@ function UploadTestForm() {
         setTestType("regular");
         setFile(null);
         setMessage("");
+        setProgress(null);
       }, 3000);
     } catch (err: any) {
       console.error(err);
-      setMessage(err.response?.data?.detail || "Upload failed");
+      setMessage(err.message || "Upload failed");
       setIsSuccess(false);
     } finally {
       setIsUploading(false);
     }
   };
 
+  // Streams per-page extraction results (Server-Sent Events) from /tests/stream
+  const uploadWithProgress = async (formData: FormData) => {
+    const token = localStorage.getItem("access_token");
+    const res = await fetch(`${axiosInstance.defaults.baseURL}/tests/stream`, {
+      method: "POST",
+      body: formData,
+      headers: token ? { Authorization: `Bearer ${token}` } : undefined,
+    });
+
+    if (!res.ok || !res.body) {
+      const body = await res.json().catch(() => null);
+      throw new Error(body?.detail || "Upload failed");
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = raw.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) continue;
+
+        const payload = JSON.parse(data);
+        if (event === "page") {
+          // Each event only carries the questions from question_offset on
+          setProgress((prev) => ({
+            ...payload,
+            questions: [...(prev?.questions.slice(0, payload.question_offset) ?? []), ...payload.questions],
+          }));
+        } else if (event === "error") {
+          throw new Error(payload.detail || "Upload failed");
+        } else if (event === "done") {
+          return payload;
+        }
+      }
+    }
+
+    throw new Error("Upload ended before the test was saved");
+  };
+
   const handleDragOver = (e: React.DragEvent) => {
     e.preventDefault();
     setIsDragging(true);
@@ -397,6 +457,22 @@ function UploadTestForm() {
               )}
             </button>
 
+            {isUploading && progress && (
+              <div className="progress-box">
+                <p className="progress-text">
+                  Page {progress.page}/{progress.pages} ({progress.method === "ocr" ? "OCR" : "text layer"},{" "}
+                  {(progress.elapsed_ms / 1000).toFixed(1)}s) · {progress.questions.length} questions so far
+                </p>
+                {progress.questions.length > 0 && (
+                  <ol className="progress-questions">
+                    {progress.questions.map((q, i) => (
+                      <li key={i}>{q}</li>
+                    ))}
+                  </ol>
+                )}
+              </div>
+            )}
+
             {message && (
               <div className={`message-box ${isSuccess ? 'success' : 'error'}`}>
                 {isSuccess ? <CheckCircle /> : <AlertCircle />}
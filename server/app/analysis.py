@@ -0,0 +1,115 @@
+import heapq
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+
+def similarity_ratio(str1: str, str2: str) -> float:
+    """Calculate similarity between two strings (0 to 1)"""
+    return SequenceMatcher(None, str1.lower().strip(), str2.lower().strip()).ratio()
+
+
+def extract_questions_from_text(full_text: str) -> List[str]:
+    """Extract individual questions from full_text using same logic as frontend"""
+    if not full_text:
+        return []
+
+    # Find first question (with or without parenthesis)
+    first_question_match = None
+    start_index = 0
+    has_parenthesis = True
+
+    # Try finding "1. (" pattern
+    match = re.search(r'\n\s*1\.\s*\(', full_text)
+    if match:
+        start_index = full_text.index(match.group(0))
+    else:
+        # Try finding "1. " pattern without parenthesis
+        match = re.search(r'^\s*1\.\s+', full_text, re.MULTILINE)
+        if not match:
+            return []
+        start_index = full_text.index(match.group(0))
+        has_parenthesis = False
+
+    cleaned_text = full_text[start_index:].strip()
+
+    # Split by question numbers
+    if has_parenthesis:
+        question_parts = re.split(r'\n\s*(?=\d+\.\s*\()', cleaned_text)
+    else:
+        question_parts = re.split(r'\n\s*(?=\d+\.\s+)', cleaned_text)
+
+    question_parts = [q.strip() for q in question_parts if q.strip()]
+
+    # Remove question numbers and clean up
+    questions = []
+    for q in question_parts:
+        # Remove number prefix like "1. " or "1. ("
+        without_number = re.sub(r'^\d+\.\s*', '', q)
+        # Join lines and clean
+        cleaned = ' '.join([line.strip() for line in without_number.split('\n') if line.strip()])
+        if cleaned:
+            questions.append(cleaned)
+
+    return questions
+
+
+def cluster_questions(all_questions: List[dict], similarity_threshold: float) -> List[dict]:
+    """
+    Greedy grouping of similar questions: each question not yet grouped starts
+    a group and absorbs every later question at least similarity_threshold
+    similar to it. Items are dicts with 'text', 'test_id' and 'exam_period'.
+    Groups are returned in discovery order, see rank_groups. Top-level so it
+    can be handed to the worker pool.
+    """
+    question_groups = []
+    processed = set()
+
+    for i, q1 in enumerate(all_questions):
+        if i in processed:
+            continue
+
+        # Start a new group
+        group = {
+            'question': q1['text'],
+            'count': 1,
+            'test_ids': [q1['test_id']],
+            'exam_periods': [q1['exam_period']]
+        }
+        processed.add(i)
+
+        # Find similar questions
+        for j, q2 in enumerate(all_questions):
+            if j <= i or j in processed:
+                continue
+
+            # Check similarity
+            sim = similarity_ratio(q1['text'], q2['text'])
+            if sim >= similarity_threshold:
+                group['count'] += 1
+                group['test_ids'].append(q2['test_id'])
+                group['exam_periods'].append(q2['exam_period'])
+                processed.add(j)
+
+        question_groups.append(group)
+
+    return question_groups
+
+
+def _rank_key(item):
+    index, group = item
+    return -group['count'], index
+
+
+def rank_groups(question_groups: List[dict], offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """
+    Groups ordered by frequency (most common first, ties in discovery order),
+    sliced to [offset, offset + limit). With a limit only offset + limit groups
+    are kept on a bounded heap instead of sorting the whole list.
+    """
+    indexed = enumerate(question_groups)
+    if limit is None:
+        ranked = sorted(indexed, key=_rank_key)
+    else:
+        ranked = heapq.nsmallest(offset + limit, indexed, key=_rank_key)
+    return [group for _, group in ranked[offset:]]
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.analysis import cluster_questions, extract_questions_from_text
+from app.caching import ByteBudgetLRU
+from app.models.test import ANALYSIS_INDEX, Test
+from processing.worker_pool import run_in_pool
+
+# Similarity threshold of the default /analyze request, the one that gets warmed up
+DEFAULT_SIMILARITY = 0.85
+
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Seconds between scheduler ticks; 0 disables the warm-up scheduler
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", 30))
+# Warm up only when no analysis request has arrived for this long
+WARMUP_IDLE_SECONDS = float(os.getenv("WARMUP_IDLE_SECONDS", 5))
+# At most this many subjects are recomputed per tick, one at a time
+WARMUP_MAX_SUBJECTS = int(os.getenv("WARMUP_MAX_SUBJECTS", 3))
+# Request counts decay by this factor every tick, so heat follows recent demand
+WARMUP_DECAY = 0.9
+WARMUP_MIN_HEAT = 0.05
+
+analysis_cache = ByteBudgetLRU(ANALYSIS_CACHE_MAX_BYTES)
+
+# Bumped whenever this worker changes a subject's tests; together with the persisted
+# fingerprint (see _tests_fingerprint) it decides whether a cached result is still valid
+_subject_versions: Dict[str, int] = defaultdict(int)
+_subject_heat: Dict[str, float] = defaultdict(float)
+_in_flight = 0
+_last_request = 0.0
+_warmup_task: Optional[asyncio.Task] = None
+
+
+def mark_subject_changed(subject_code: str):
+    _subject_versions[subject_code] += 1
+
+
+def _cache_key(match: dict, similarity_threshold: float) -> tuple:
+    return match["subject_code"], similarity_threshold, json.dumps(match, sort_keys=True, default=str)
+
+
+def _result_size(result: dict) -> int:
+    """Rough in-memory size of an analysis result, for the cache byte budget."""
+    size = 256
+    for group in result["groups"]:
+        size += len(group["question"]) + 64 * len(group["test_ids"]) + 128
+    return size
+
+
+async def _tests_fingerprint(match: dict) -> tuple:
+    """
+    (test count, latest updated_at) of the matching tests. Changes made by other
+    workers or scripts such as reextract_tests never touch _subject_versions but
+    always move this: inserts and deletes change the count, text rewrites updated_at.
+    Runs on every /analyze request, so it is answered from ANALYSIS_INDEX alone.
+    """
+    rows = await Test.get_pymongo_collection().aggregate([
+        {"$match": match},
+        {"$project": {"_id": 0, "updated_at": 1}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "updated_at": {"$max": "$updated_at"}}}
+    ], hint=ANALYSIS_INDEX).to_list(length=None)
+    if not rows:
+        return 0, None
+    return rows[0]["count"], rows[0]["updated_at"]
+
+
+async def compute_analysis(match: dict, similarity_threshold: float) -> dict:
+    """Load the matching tests' text and cluster their questions in the worker pool."""
+    tests = await Test.aggregate([
+        {"$match": match},
+        {"$project": {"full_text": 1, "exam_period": 1}}
+    ]).to_list()
+
+    all_questions = []
+    for test in tests:
+        for q in extract_questions_from_text(test.get("full_text", "")):
+            all_questions.append({
+                'text': q,
+                'test_id': str(test["_id"]),
+                'exam_period': test.get("exam_period")
+            })
+
+    groups = await run_in_pool(cluster_questions, all_questions, similarity_threshold) if all_questions else []
+    return {
+        "total_tests": len(tests),
+        "total_questions": len(all_questions),
+        "groups": groups,
+    }
+
+
+async def get_analysis(match: dict, similarity_threshold: float) -> dict:
+    """Cached analysis for a $match; recomputed when the subject changed since it was built."""
+    key = _cache_key(match, similarity_threshold)
+    version = (_subject_versions[match["subject_code"]], await _tests_fingerprint(match))
+
+    entry = analysis_cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    result = await compute_analysis(match, similarity_threshold)
+    # Tagged with the version read before computing, so a change meanwhile makes it stale
+    analysis_cache.put(key, (version, result), _result_size(result))
+    return result
+
+
+@asynccontextmanager
+async def interactive_request(subject_code: str):
+    """Wrap user-facing analysis requests: counts demand and keeps the warm-up out of the way."""
+    global _in_flight, _last_request
+    _subject_heat[subject_code] += 1
+    _in_flight += 1
+    _last_request = time.monotonic()
+    try:
+        yield
+    finally:
+        _in_flight -= 1
+        _last_request = time.monotonic()
+
+
+def _is_idle() -> bool:
+    return _in_flight == 0 and time.monotonic() - _last_request >= WARMUP_IDLE_SECONDS
+
+
+async def _is_stale(subject_code: str) -> bool:
+    match = {"subject_code": subject_code}
+    entry = analysis_cache.peek(_cache_key(match, DEFAULT_SIMILARITY))
+    if entry is None:
+        return True
+    return entry[0] != (_subject_versions[subject_code], await _tests_fingerprint(match))
+
+
+async def warm_up_once() -> int:
+    """One scheduler tick: decay heat, then recompute the hottest stale subjects while idle."""
+    for subject_code in list(_subject_heat):
+        _subject_heat[subject_code] *= WARMUP_DECAY
+        if _subject_heat[subject_code] < WARMUP_MIN_HEAT:
+            del _subject_heat[subject_code]
+
+    hottest = sorted(_subject_heat, key=lambda s: _subject_heat[s], reverse=True)
+    candidates = []
+    for subject_code in hottest:
+        if len(candidates) == WARMUP_MAX_SUBJECTS:
+            break
+        if await _is_stale(subject_code):
+            candidates.append(subject_code)
+
+    warmed = 0
+    for subject_code in candidates:
+        if not _is_idle():
+            break
+        await get_analysis({"subject_code": subject_code}, DEFAULT_SIMILARITY)
+        warmed += 1
+    return warmed
+
+
+async def _warmup_loop():
+    while True:
+        await asyncio.sleep(WARMUP_INTERVAL_SECONDS)
+        try:
+            warmed = await warm_up_once()
+            if warmed:
+                print(f"[warmup] Recomputed analysis for {warmed} subject(s)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[warmup] Tick failed: {e}")
+
+
+def start_warmup():
+    global _warmup_task
+    if WARMUP_INTERVAL_SECONDS <= 0 or _warmup_task is not None:
+        return
+    _warmup_task = asyncio.create_task(_warmup_loop())
+    print(f"Analysis warm-up scheduler started (every {WARMUP_INTERVAL_SECONDS:g}s)")
+
+
+async def stop_warmup():
+    global _warmup_task
+    if _warmup_task is None:
+        return
+    _warmup_task.cancel()
+    try:
+        await _warmup_task
+    except asyncio.CancelledError:
+        pass
+    _warmup_task = None
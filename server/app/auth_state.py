@@ -0,0 +1,66 @@
+import os
+
+from beanie import PydanticObjectId
+
+from app.caching import TTLCache
+from app.models.user import User
+from app.reference_cache import API_WORKERS, SHARED_INVALIDATION, USERS, invalidate
+
+# Kept short and apart from the reference data cache: this is what bounds how
+# long a revoked token keeps working on a worker that missed the invalidation
+AUTH_STATE_TTL_SECONDS = float(os.getenv("AUTH_STATE_TTL_SECONDS", 5))
+AUTH_STATE_MAX_ENTRIES = int(os.getenv("AUTH_STATE_MAX_ENTRIES", 1024))
+# Several workers need REFERENCE_CACHE_CHANNEL=mongo to hear about revocations;
+# without it the state is read from Mongo on every request.
+AUTH_STATE_CACHING = SHARED_INVALIDATION
+
+auth_state_cache = TTLCache(AUTH_STATE_MAX_ENTRIES, AUTH_STATE_TTL_SECONDS)
+# Bumped on invalidation so a load that raced with a revocation is not cached
+_generation = 0
+
+
+async def _load_auth_state(user_id: str) -> dict:
+    doc = await User.get_pymongo_collection().find_one(
+        {"_id": PydanticObjectId(user_id)}, {"is_active": 1, "auth_version": 1}
+    )
+    if doc is None:
+        return {"exists": False}
+    return {"exists": True, "is_active": doc.get("is_active", True), "auth_version": doc.get("auth_version", 0)}
+
+
+async def get_auth_state(user_id: str) -> dict:
+    """Revocation state of a user ({exists, is_active, auth_version}), cached for a few seconds."""
+    if not AUTH_STATE_CACHING:
+        return await _load_auth_state(user_id)
+
+    key = (USERS, user_id)
+    state = auth_state_cache.get(key)
+    if state is None:
+        generation = _generation
+        state = await _load_auth_state(user_id)
+        if generation == _generation:
+            auth_state_cache.put(key, state)
+    return state
+
+
+def _clear_local():
+    global _generation
+    _generation += 1
+    auth_state_cache.clear()
+
+
+async def invalidate_auth_state():
+    """Forget cached auth state here and, over the invalidation channel, on the other workers."""
+    _clear_local()
+    await invalidate(USERS)
+
+
+async def auth_state_listener(namespace: str):
+    if namespace == USERS:
+        _clear_local()
+
+
+def check_auth_state_config():
+    if not AUTH_STATE_CACHING:
+        print(f"[auth] {API_WORKERS} workers without REFERENCE_CACHE_CHANNEL=mongo: "
+              f"auth state is read from Mongo on every request")
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from app.password_hashing import (
+    hash_password_sync, pending_auth_jobs, shutdown_auth_executor, verify_password, verify_password_sync
+)
+
+PASSWORD = "correct horse battery staple"
+
+
+async def _probe(latencies: list, stop: asyncio.Event, interval: float):
+    """
+    Stand-in for an unrelated cheap endpoint: a tiny coroutine scheduled every
+    `interval` seconds. Its latency is how long it waited for the event loop.
+    """
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0)
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def _blocking_login(hashed: str):
+    # What the handlers did before: bcrypt inside the coroutine
+    return verify_password_sync(PASSWORD, hashed)
+
+
+async def _executor_login(hashed: str):
+    return await verify_password(PASSWORD, hashed)
+
+
+async def _storm(login, hashed: str, logins: int, interval: float) -> dict:
+    latencies, stop = [], asyncio.Event()
+    probe = asyncio.create_task(_probe(latencies, stop, interval))
+    await asyncio.sleep(interval * 5)  # A few probes before the burst
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(hashed) for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    rejected = sum(isinstance(r, HTTPException) for r in results)
+    failed = sum(isinstance(r, Exception) and not isinstance(r, HTTPException) for r in results)
+    return {"latencies": latencies, "elapsed": elapsed, "rejected": rejected, "failed": failed}
+
+
+def _report(name: str, run: dict, logins: int):
+    latencies = sorted(run["latencies"]) or [0.0]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<10} probe p50 {statistics.median(latencies):8.2f} ms   p99 {p99:8.2f} ms   "
+        f"max {latencies[-1]:8.2f} ms   logins {logins - run['rejected'] - run['failed']}/{logins} "
+        f"in {run['elapsed']:.2f}s   rejected {run['rejected']}"
+    )
+
+
+async def benchmark(logins: int, interval: float):
+    """
+    Fire `logins` concurrent password checks and measure how long a cheap
+    unrelated coroutine waits for the event loop meanwhile, with bcrypt run
+    inline (the old handlers) and on the bounded auth executor.
+    """
+    hashed = hash_password_sync(PASSWORD)
+    print(f"{logins} concurrent logins, probe every {interval * 1000:.0f} ms")
+    _report("blocking", await _storm(_blocking_login, hashed, logins, interval), logins)
+    _report("executor", await _storm(_executor_login, hashed, logins, interval), logins)
+    assert pending_auth_jobs() == 0
+    shutdown_auth_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop latency during a burst of logins")
+    parser.add_argument("--logins", type=int, default=50, help="Concurrent login attempts")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between probe requests")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.logins, args.interval))
+
+
+if __name__ == "__main__":
+    main()
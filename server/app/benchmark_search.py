@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.analysis import extract_questions_from_text
+from app.database import init_db, close_db
+from app.models.test import Test
+from app.search_backend import get_index
+from processing.text_normalization import normalize_text
+
+OCR_CONFUSIONS = {"l": "1", "o": "0", "e": "c", "i": "l", "s": "5", "n": "m", "a": "o", "u": "v"}
+
+
+def _garble(word: str, rng: random.Random) -> str:
+    """Replace one character the way OCR tends to, to measure recall on noisy queries."""
+    positions = [i for i, ch in enumerate(word) if ch in OCR_CONFUSIONS]
+    if len(word) < 5 or not positions:
+        return word
+    i = rng.choice(positions)
+    return word[:i] + OCR_CONFUSIONS[word[i]] + word[i + 1:]
+
+
+async def _sample_queries(count: int, words: int, noise: float, rng: random.Random) -> list:
+    """(query, source test id) pairs: a run of words from a random question of a random test."""
+    docs = await Test.aggregate([
+        {"$match": {"full_text": {"$ne": ""}}},
+        {"$sample": {"size": count * 2}},
+        {"$project": {"full_text": 1}}
+    ]).to_list()
+
+    queries = []
+    for doc in docs:
+        questions = [q.split() for q in extract_questions_from_text(doc.get("full_text", "")) if len(q.split()) >= words]
+        if not questions:
+            continue
+        question = rng.choice(questions)
+        start = rng.randrange(len(question) - words + 1)
+        picked = [_garble(w, rng) if rng.random() < noise else w for w in question[start:start + words]]
+        queries.append((" ".join(picked), str(doc["_id"])))
+        if len(queries) == count:
+            break
+    return queries
+
+
+async def _mongo_search(query: str, k: int) -> list:
+    score = {"$meta": "textScore"}
+    cursor = Test.get_pymongo_collection().find(
+        {"$text": {"$search": normalize_text(query)}}, {"score": score}
+    ).sort([("score", score)]).limit(k)
+    return [str(doc["_id"]) for doc in await cursor.to_list(length=k)]
+
+
+async def _bm25_search(query: str, k: int, fuzzy: bool) -> list:
+    hits = await asyncio.to_thread(get_index("tests").search, query, k, False, fuzzy)
+    return [test_id for test_id, _ in hits]
+
+
+def _report(name: str, latencies: list, hits: int, total: int):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<12} p50 {statistics.median(latencies):7.1f} ms   p95 {p95:7.1f} ms   "
+        f"recall {hits / total:6.1%} ({hits}/{total})"
+    )
+
+
+async def benchmark(queries: int, words: int, noise: float, k: int, seed: int):
+    """
+    Recall@k of the test each query was cut from, and latency, for Mongo $text
+    and the BM25 index (exact and fuzzy), over the same sampled queries.
+    """
+    await init_db()
+    try:
+        rng = random.Random(seed)
+        sample = await _sample_queries(queries, words, noise, rng)
+        if not sample:
+            print("No tests with questions to sample from")
+            return
+
+        backends = {
+            "mongo $text": lambda q: _mongo_search(q, k),
+            "bm25": lambda q: _bm25_search(q, k, False),
+            "bm25 fuzzy": lambda q: _bm25_search(q, k, True),
+        }
+        print(f"{len(sample)} queries of {words} words, noise {noise:.0%}, recall@{k}")
+        for name, search in backends.items():
+            latencies, hits = [], 0
+            for query, source_id in sample:
+                started = time.perf_counter()
+                results = await search(query)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += source_id in results
+            _report(name, latencies, hits, len(sample))
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Mongo $text and BM25 search latency and recall")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--words", type=int, default=4, help="Words per query")
+    parser.add_argument("--noise", type=float, default=0.0, help="Share of query words with an OCR-style typo")
+    parser.add_argument("--k", type=int, default=10, help="Cut-off for recall")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.queries, args.words, args.noise, args.k, args.seed))
+
+
+if __name__ == "__main__":
+    main()
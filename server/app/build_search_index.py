@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import os
+import shutil
+import time
+
+from bson import ObjectId
+
+from app.database import init_db, close_db
+from app.models.test import Test
+from app.search_backend import BM25_INDEX_DIR, BM25_MERGE_FACTOR, INDEX_KINDS, acquire_writer_lock, get_index, \
+    index_tests
+
+
+async def build_search_index(batch_size: int = 200, subject_code: str = None, reset: bool = False):
+    """(Re)index every test in _id order; each batch becomes one segment, merged down at the end."""
+    if not acquire_writer_lock():
+        print(f"{BM25_INDEX_DIR} is locked by another process (a running API?); stop it first")
+        return
+    if reset:
+        # The index directories only: the lock file stays, so no other process can start writing
+        for kind in INDEX_KINDS:
+            shutil.rmtree(os.path.join(BM25_INDEX_DIR, kind), ignore_errors=True)
+    await init_db()
+    collection = Test.get_pymongo_collection()
+    started = time.monotonic()
+    indexed = 0
+    last_id = None
+
+    try:
+        while True:
+            query = {"subject_code": subject_code} if subject_code else {}
+            if last_id:
+                query["_id"] = {"$gt": ObjectId(last_id)}
+
+            batch = await collection.find(query, projection={"full_text": 1}) \
+                .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+            if not batch:
+                break
+
+            await asyncio.to_thread(index_tests, [(str(doc["_id"]), doc.get("full_text", "")) for doc in batch])
+            indexed += len(batch)
+            last_id = str(batch[-1]["_id"])
+            print(f"Indexed {indexed} tests")
+
+        for kind in INDEX_KINDS:
+            get_index(kind).merge(1, BM25_MERGE_FACTOR)
+            print(f"{kind}: {len(get_index(kind))} documents in {get_index(kind).segment_count} segment(s)")
+    finally:
+        await close_db()
+
+    print(f"Search index built in {time.monotonic() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 search index from stored tests")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tests per segment")
+    parser.add_argument("--subject", default=None, help="Only index tests of this subject code")
+    parser.add_argument("--reset", action="store_true", help="Delete the existing index first")
+    args = parser.parse_args()
+
+    asyncio.run(build_search_index(batch_size=args.batch_size, subject_code=args.subject, reset=args.reset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+from typing import List, Optional, Tuple, Type
+
+from beanie import Document
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Refuse imports larger than this many rows; split bigger catalogs into several calls
+MAX_BULK_ROWS = 5000
+DUPLICATE_KEY_ERROR = 11000
+# Fields owned by the server, never taken from an import row
+SERVER_FIELDS = {"id", "revision_id", "version"}
+
+
+class BulkRowError(BaseModel):
+    row: int  # 0-based position in the uploaded list / CSV data rows
+    code: Optional[str] = None
+    detail: str
+
+
+class BulkImportResponse(BaseModel):
+    requested: int
+    inserted: int
+    updated: int
+    errors: List[BulkRowError] = []
+
+
+def _unflatten(row: dict) -> dict:
+    """CSV columns like `address.city` become nested objects; empty cells are dropped."""
+    result = {}
+    for column, value in row.items():
+        if column is None or value is None or not value.strip():
+            continue
+        target = result
+        *parents, leaf = column.strip().split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value.strip()
+    return result
+
+
+def _parse_modules(value: str) -> List[dict]:
+    """`CODE:Name;CODE2:Name 2` from a CSV cell."""
+    modules = []
+    for item in value.split(";"):
+        code, _, name = item.partition(":")
+        if code.strip():
+            modules.append({"code": code.strip(), "name": name.strip() or code.strip()})
+    return modules
+
+
+def parse_rows(content: bytes, is_csv: bool) -> List[dict]:
+    """
+    Rows of a JSON list (or {"items": [...]}) or a CSV with a header row.
+    In CSV, nested fields use dotted columns and faculty modules a `modules` cell.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+        if is_csv:
+            rows = [row for row in map(_unflatten, csv.DictReader(io.StringIO(text))) if row]
+            for row in rows:
+                if isinstance(row.get("modules"), str):
+                    row["modules"] = _parse_modules(row["modules"])
+        else:
+            rows = json.loads(text)
+            if isinstance(rows, dict):
+                rows = rows.get("items")
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not parse import file: {str(e)}"
+        )
+
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Import must be a list of objects or a CSV with a header row"
+        )
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_ROWS} rows per import, got {len(rows)}"
+        )
+    return rows
+
+
+async def read_import(request: Request) -> List[dict]:
+    """
+    Accept a multipart upload (`file` field, .csv or .json) or a raw body
+    sent as application/json or text/csv.
+    """
+    content_type = request.headers.get("content-type", "").lower()
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Multipart import needs a `file` field"
+            )
+        is_csv = (upload.filename or "").lower().endswith(".csv") or "csv" in (upload.content_type or "")
+        return parse_rows(await upload.read(), is_csv)
+
+    return parse_rows(await request.body(), "csv" in content_type)
+
+
+def validate_rows(model: Type[Document], rows: List[dict]) -> Tuple[List[Tuple[int, Document]], List[BulkRowError]]:
+    """Validate every row in one pass; returns (row index, document) pairs and per-row errors."""
+    valid, errors = [], []
+    seen_codes = {}
+    for index, row in enumerate(rows):
+        code = row.get("code")
+        try:
+            document = model.model_validate({k: v for k, v in row.items() if k not in SERVER_FIELDS})
+        except ValidationError as e:
+            messages = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append(BulkRowError(row=index, code=code, detail=messages))
+            continue
+        # Repeats inside one file would otherwise race each other in the unordered write
+        if document.code in seen_codes:
+            errors.append(BulkRowError(
+                row=index, code=document.code, detail=f"Duplicate of row {seen_codes[document.code]} in this import"
+            ))
+            continue
+        seen_codes[document.code] = index
+        valid.append((index, document))
+    return valid, errors
+
+
+def _document_fields(document: Document) -> dict:
+    # Raw pymongo writes skip Beanie's event hooks, so derived fields are refreshed here
+    refresh = getattr(document, "refresh_search_fields", None)
+    if refresh is not None:
+        refresh()
+    return document.model_dump(exclude=SERVER_FIELDS)
+
+
+def _write_errors(e: BulkWriteError, positions: List[int], codes: List[str]) -> List[BulkRowError]:
+    errors = []
+    for error in e.details.get("writeErrors", []):
+        op_index = error["index"]
+        if error.get("code") == DUPLICATE_KEY_ERROR:
+            detail = f"Already exists (duplicate {', '.join(error.get('keyValue', {}).keys()) or 'key'})"
+        else:
+            detail = error.get("errmsg", "Write failed")
+        errors.append(BulkRowError(row=positions[op_index], code=codes[op_index], detail=detail))
+    return errors
+
+
+async def bulk_write_documents(model: Type[Document], valid: List[Tuple[int, Document]],
+                               upsert: bool) -> Tuple[int, int, List[BulkRowError], List[Document]]:
+    """
+    One unordered insert_many (or, with upsert, one bulk_write of UpdateOne by
+    code) for all valid rows. Duplicate keys are reported per row by the unique
+    indexes instead of being looked up beforehand.
+    Returns (inserted, updated, errors, written documents).
+    """
+    if not valid:
+        return 0, 0, [], []
+
+    positions = [index for index, _ in valid]
+    documents = [document for _, document in valid]
+    codes = [document.code for document in documents]
+    fields = [_document_fields(document) for document in documents]
+    collection = model.get_pymongo_collection()
+
+    errors = []
+    failed = set()
+    try:
+        if upsert:
+            result = await collection.bulk_write([
+                UpdateOne({"code": f["code"]}, {"$set": f, "$inc": {"version": 1}}, upsert=True) for f in fields
+            ], ordered=False)
+        else:
+            result = await collection.insert_many([{**f, "version": 0} for f in fields], ordered=False)
+    except BulkWriteError as e:
+        errors = _write_errors(e, positions, codes)
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        inserted = e.details.get("nInserted", 0) + e.details.get("nUpserted", 0)
+        updated = e.details.get("nMatched", 0)
+    else:
+        if upsert:
+            inserted, updated = result.upserted_count, result.matched_count
+        else:
+            inserted, updated = len(result.inserted_ids), 0
+
+    written = [document for i, document in enumerate(documents) if i not in failed]
+    return inserted, updated, errors, written
@@ -0,0 +1,141 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class ByteBudgetLRU:
+    """
+    In-process LRU cache bounded by the total size of its values in bytes.
+
+    Values are stored with their size; least recently used entries are
+    evicted until a new value fits. Values larger than max_item_bytes are
+    not cached at all so one huge file cannot flush everything else.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Value without touching recency or hit statistics."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any, size: int) -> bool:
+        if size > self.max_item_bytes or size > self.max_bytes:
+            return False
+
+        self.pop(key)
+        while self._entries and self.current_bytes + size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+        return True
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.current_bytes -= entry[1]
+        return entry[0]
+
+    def keys(self) -> list:
+        return list(self._entries.keys())
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TTLCache:
+    """
+    In-process LRU cache bounded by entry count whose entries also expire
+    ttl_seconds after they were stored. Keys are tuples whose first element
+    is a namespace, so related entries can be dropped together.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: tuple, value: Any):
+        self._entries.pop(key, None)
+        while self._entries and len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, namespace: str) -> int:
+        """Drop every entry whose key starts with namespace."""
+        keys = [key for key in self._entries if key[0] == namespace]
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += 1
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match header covers the strong ETag `"<etag>"`."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return f'"{etag}"' in tags
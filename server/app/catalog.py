@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.models.faculty import Faculty
+from app.models.subject import Subject
+from processing.text_normalization import normalize_text
+
+# Most suggestions a node keeps (and so the most /catalog/suggest returns)
+SUGGEST_TOP_K = 10
+CATALOG_KINDS = ["subject", "faculty"]
+
+
+class _Node:
+    __slots__ = ("children", "terminal", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.terminal: set = set()  # Entries with a key ending exactly here
+        self.top: List[str] = []  # Best SUGGEST_TOP_K entries in this subtree, by rank
+
+
+class SuggestTrie:
+    """
+    Prefix trie over folded keys (code, full name and each word of the name).
+    Every node caches the ranked top-k entries beneath it, so a lookup is one
+    walk down the query and a slice; inserts and removals repair the caches
+    along the touched paths only.
+    """
+
+    def __init__(self, top_k: int = SUGGEST_TOP_K):
+        self.top_k = top_k
+        self.root = _Node()
+        self.entries: Dict[str, dict] = {}
+        self._keys: Dict[str, List[str]] = {}
+        self._ranks: Dict[str, Tuple] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def keys_for(code: str, name: str) -> List[str]:
+        folded_name = normalize_text(name)
+        keys = {normalize_text(code), folded_name}
+        keys.update(word for word in folded_name.split() if len(word) > 1)
+        keys.discard("")
+        return sorted(keys)
+
+    def _path(self, key: str, create: bool = False) -> List[_Node]:
+        node = self.root
+        path = [node]
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return []
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _recompute_top(self, node: _Node):
+        candidates = set(node.terminal)
+        for child in node.children.values():
+            candidates.update(child.top)
+        node.top = sorted(candidates, key=self._ranks.__getitem__)[:self.top_k]
+
+    def add(self, entry_id: str, code: str, name: str, data: dict):
+        """Insert or replace an entry."""
+        self.remove(entry_id)
+        keys = self.keys_for(code, name)
+        self.entries[entry_id] = data
+        self._keys[entry_id] = keys
+        # Shorter names first, so "Matematika 1" precedes "Matematika 1 - praktikum"
+        self._ranks[entry_id] = (len(name), normalize_text(name), entry_id)
+
+        rank = self._ranks[entry_id]
+        for key in keys:
+            path = self._path(key, create=True)
+            path[-1].terminal.add(entry_id)
+            for node in path:
+                if entry_id in node.top:
+                    continue
+                if len(node.top) < self.top_k or rank < self._ranks[node.top[-1]]:
+                    node.top.append(entry_id)
+                    node.top.sort(key=self._ranks.__getitem__)
+                    del node.top[self.top_k:]
+
+    def remove(self, entry_id: str) -> bool:
+        keys = self._keys.pop(entry_id, None)
+        if keys is None:
+            return False
+
+        for key in keys:
+            path = self._path(key)
+            if not path:
+                continue
+            path[-1].terminal.discard(entry_id)
+            # Repair bottom-up so each node merges already-repaired children
+            for node in reversed(path):
+                if entry_id in node.top:
+                    node.top.remove(entry_id)
+                    self._recompute_top(node)
+            # Prune branches left empty
+            for depth in range(len(key), 0, -1):
+                node = path[depth]
+                if node.terminal or node.children:
+                    break
+                del path[depth - 1].children[key[depth - 1]]
+
+        del self.entries[entry_id]
+        del self._ranks[entry_id]
+        return True
+
+    def suggest(self, query: str, limit: int = SUGGEST_TOP_K) -> List[Tuple[Tuple, dict]]:
+        """(rank, entry) pairs of the best entries with a key starting with the folded query."""
+        path = self._path(normalize_text(query))
+        if not path:
+            return []
+        return [(self._ranks[e], self.entries[e]) for e in path[-1].top[:limit]]
+
+    def clear(self):
+        self.__init__(self.top_k)
+
+
+catalog_tries: Dict[str, SuggestTrie] = {kind: SuggestTrie() for kind in CATALOG_KINDS}
+
+
+def index_subject(subject: Subject):
+    catalog_tries["subject"].add(subject.code, subject.code, subject.name, {
+        "type": "subject",
+        "code": subject.code,
+        "name": subject.name,
+        "faculty_code": subject.faculty_code,
+        "module_code": subject.module_code,
+        "year": subject.year,
+    })
+
+
+def index_faculty(faculty: Faculty):
+    catalog_tries["faculty"].add(faculty.code, faculty.code, faculty.name, {
+        "type": "faculty",
+        "code": faculty.code,
+        "name": faculty.name,
+    })
+
+
+def unindex(kind: str, code: str):
+    catalog_tries[kind].remove(code)
+
+
+def suggest(query: str, limit: int = SUGGEST_TOP_K, kind: Optional[str] = None) -> List[dict]:
+    kinds = [kind] if kind else CATALOG_KINDS
+    ranked = []
+    for k in kinds:
+        ranked.extend(catalog_tries[k].suggest(query, limit))
+    ranked.sort(key=lambda item: item[0])
+    return [entry for _, entry in ranked[:limit]]
+
+
+async def load_catalog():
+    """Fill the tries from Mongo; called once at startup."""
+    for trie in catalog_tries.values():
+        trie.clear()
+    async for subject in Subject.find_all():
+        index_subject(subject)
+    async for faculty in Faculty.find_all():
+        index_faculty(faculty)
+    print(f"Catalog suggestions loaded: {len(catalog_tries['subject'])} subjects, "
+          f"{len(catalog_tries['faculty'])} faculties")
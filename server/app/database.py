@@ -5,11 +5,13 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 
-from app.models.test import Test
+from app.models.test import Test, LEGACY_ANALYSIS_INDEX
 from app.models.testuser import TestUser
 from app.models.faculty import Faculty
 from app.models.subject import Subject
 from app.models.user import User
+from app.models.question_trend import QuestionTrend
+from app.text_fields import backfill_text_fields
 
 load_dotenv()
 
@@ -37,6 +39,22 @@ async def init_db():
 
         database = client[MONGODB_DB_NAME]
 
+        # Tests stored before search_text/question_count/simhash existed get them from
+        # full_text (no OCR), so $text search keeps finding them once the legacy
+        # index is gone and stats count their questions
+        tests = database[Test.Settings.name]
+        backfilled = await backfill_text_fields(tests)
+        if backfilled:
+            print(f"Backfilled text fields for {backfilled} tests")
+
+        # A collection can have only one text index: drop the legacy one on raw
+        # full_text so the index on the normalized search_text can be created.
+        # Only after the backfill above, which raises (and so keeps it) on failure.
+        test_indexes = await tests.index_information()
+        if "full_text_text" in test_indexes:
+            await tests.drop_index("full_text_text")
+            print("Dropped legacy full_text text index")
+
         await init_beanie(
             database=database,
             document_models=[
@@ -45,11 +63,25 @@ async def init_db():
                 Faculty,
                 Subject,
                 User,
+                QuestionTrend,
             ]
         )
 
         print("Beanie initialized successfully")
 
+        # Only once init_beanie has built ANALYSIS_INDEX, so its queries always have an index
+        if LEGACY_ANALYSIS_INDEX in test_indexes:
+            await tests.drop_index(LEGACY_ANALYSIS_INDEX)
+            print("Dropped analysis index superseded by the one ending in updated_at")
+
+        # Faculties stored before search keys existed get them on their next save
+        backfilled = 0
+        async for faculty in Faculty.find({"search_keys": {"$exists": False}}):
+            await faculty.save()
+            backfilled += 1
+        if backfilled:
+            print(f"Backfilled search keys for {backfilled} faculties")
+
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         raise
@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+from app.models.test import Test
+
+# Documents pulled from the cursor per round trip; the export never holds more than this
+EXPORT_BATCH_SIZE = 200
+EXPORT_PROJECTION = {
+    "subject_code": 1,
+    "exam_period": 1,
+    "academic_year": 1,
+    "test_type": 1,
+    "full_text": 1,
+    "file_extension": 1,
+    "updated_at": 1,
+}
+
+
+def export_query(
+        subject_code: Optional[str],
+        academic_year: Optional[str],
+        updated_since: Optional[datetime],
+        after: Optional[str]
+) -> dict:
+    query = {}
+    if subject_code:
+        query["subject_code"] = subject_code
+    if academic_year:
+        query["academic_year"] = academic_year
+    if updated_since:
+        query["updated_at"] = {"$gte": updated_since}
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except (InvalidId, Exception):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor token: {after}"
+            )
+    return query
+
+
+def export_cursor(query: dict):
+    """Raw Motor cursor in _id order, so the last exported id is a resume token."""
+    return Test.get_pymongo_collection().find(
+        query, projection=EXPORT_PROJECTION
+    ).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+def ndjson_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
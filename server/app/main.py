@@ -2,15 +2,38 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import init_db, close_db
-from app.routers import faculty_router, subject_router, user_router
+from app.routers import faculty_router, subject_router, user_router, question_router, catalog_router
+from processing.worker_pool import shutdown_pool
+from app.password_hashing import shutdown_auth_executor
+from app.analysis_warmup import start_warmup, stop_warmup
+from app.catalog import load_catalog
+from app.auth_state import auth_state_listener, check_auth_state_config
+from app.reference_cache import SUBJECTS, FACULTIES, start_reference_cache, stop_reference_cache, on_remote_invalidation
+
+
+async def catalog_listener(namespace: str):
+    # Subjects/faculties changed by another worker: rebuild this worker's suggestion tries too
+    if namespace in (SUBJECTS, FACULTIES):
+        await load_catalog()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting application...")
     await init_db()
+    await load_catalog()
+    on_remote_invalidation(catalog_listener)
+    on_remote_invalidation(auth_state_listener)
+    on_remote_invalidation(test_files_listener)
+    check_auth_state_config()
+    await start_reference_cache()
+    start_warmup()
     yield
     print("Shutting down application...")
+    await stop_reference_cache()
+    await stop_warmup()
+    shutdown_pool()
+    shutdown_auth_executor()
     await close_db()
 
 
@@ -37,12 +60,14 @@ app.add_middleware(
 )
 
 try:
-    from app.routers.test_router import test_router
+    from app.routers.test_router import test_router, test_files_listener
 
     app.include_router(test_router, prefix="/tests", tags=["tests"])
     app.include_router(faculty_router, prefix="/faculties", tags=["faculties"])
     app.include_router(subject_router, prefix="/subjects", tags=["subjects"])
     app.include_router(user_router, prefix="/users", tags=["users"])
+    app.include_router(question_router, prefix="/questions", tags=["questions"])
+    app.include_router(catalog_router, prefix="/catalog", tags=["catalog"])
 
     print("All routers loaded successfully")
 except Exception as e:
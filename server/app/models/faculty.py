@@ -1,10 +1,14 @@
-from beanie import Document, Indexed
+from beanie import Document, Indexed, before_event, Insert, Replace, Save, SaveChanges
 from typing import List, Annotated
 from datetime import datetime
 from pydantic import BaseModel, Field
 
 from app.models.address import Address
 from app.models.module import Module
+from processing.text_normalization import ngrams, normalize_text
+
+# Internal search fields, kept out of API responses
+FACULTY_SEARCH_FIELDS = {"search_keys", "search_ngrams"}
 
 
 class Faculty(Document):
@@ -14,6 +18,24 @@ class Faculty(Document):
     description: str = ""
     address: Address
     modules: List[Module] = []
+    version: int = 0  # Incremented by every write; compared by expected_version for optimistic locking
+
+    # Derived from name/code/description on every write, see refresh_search_fields
+    search_keys: List[str] = []  # "n:<folded name>", "w:<name word>", "c:<folded code>" for prefix lookups
+    search_ngrams: List[str] = []  # Trigrams of the folded fields for substring lookups
+
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def refresh_search_fields(self):
+        name = normalize_text(self.name)
+        keys = {f"n:{name}", f"c:{normalize_text(self.code)}"}
+        keys.update(f"w:{word}" for word in name.split())
+        self.search_keys = sorted(keys)
+        self.search_ngrams = ngrams(f"{self.name} {self.code} {self.description}")
 
     class Settings:
-        name = 'faculties'
\ No newline at end of file
+        name = 'faculties'
+        indexes = [
+            # Keys are stored folded, so plain binary indexes serve anchored prefix regexes
+            [("search_keys", 1)],
+            [("search_ngrams", 1)],
+        ]
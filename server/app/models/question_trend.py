@@ -0,0 +1,27 @@
+from beanie import Document, Indexed
+from typing import Dict, List, Annotated
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class TrendCluster(BaseModel):
+    question: str  # Representative text of the cluster (its first question)
+    total: int = 0
+    by_year: List[int] = []  # Occurrences per QuestionTrend.academic_years entry
+    by_period: List[int] = []  # Occurrences per QuestionTrend.exam_periods entry
+    test_counts: Dict[str, int] = {}  # Occurrences per test id, used to subtract deleted tests
+
+
+class QuestionTrend(Document):
+    """Per-subject question occurrence series, maintained as tests are ingested or deleted."""
+
+    subject_code: Annotated[str, Indexed(unique=True)]
+    academic_years: List[str] = []  # Sorted axis of by_year
+    exam_periods: List[str] = []  # Sorted axis of by_period
+    clusters: List[TrendCluster] = []
+    similarity_threshold: float
+    version: int = 0  # Incremented by every save; saves are conditioned on it (see app.trends)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "question_trends"
@@ -15,6 +15,7 @@ class Subject(Document):
     espb: int
     mandatory: bool
     description: str=""
+    version: int = 0  # Incremented by every write; compared by expected_version for optimistic locking
 
     class Settings:
         name = "subjects"
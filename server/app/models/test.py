@@ -4,6 +4,14 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 from app.models.module import Module
 from bson import Binary
+from pymongo import IndexModel
+
+# Covers every analysis $match (subject, year range, period, type) together with
+# updated_at, so freshness fingerprints never fetch the documents and their files
+ANALYSIS_INDEX = [("subject_code", 1), ("academic_year", 1), ("exam_period", 1), ("test_type", 1), ("updated_at", 1)]
+# Superseded by ANALYSIS_INDEX, which has the same prefix; dropped at startup
+LEGACY_ANALYSIS_INDEX = "subject_code_1_academic_year_1_exam_period_1_test_type_1"
+
 
 class Test(Document):
 
@@ -12,8 +20,22 @@ class Test(Document):
     academic_year: str
     test_type: str
     full_text: str
+    search_text: Optional[str] = None  # normalize_text(full_text): Latin script, no diacritics; $text-indexed
+    question_count: Optional[int] = None  # Number of questions in full_text, summed by stats aggregations
     full_file: Optional[Any] = None  # Optional to handle old documents without this field
     file_extension: Optional[str] = None  # Optional to handle old documents without this field
+    file_sha256: Optional[str] = None  # Content hash of full_file, used as the download ETag
+    original_size: Optional[int] = None  # Upload size in bytes before ingest optimization
+    stored_size: Optional[int] = None  # Size of full_file as stored
+    preview: Optional[Any] = None  # Small first-page image (Binary), see processing.preview
+    preview_media_type: Optional[str] = None
+    word_boxes: Optional[Any] = None  # Packed word columns from processing.word_boxes (Binary)
+    page_hashes: List[int] = []  # Perceptual hash per page (signed 64-bit), see processing.hashing
+    phash_bands: List[str] = []  # Band keys of page_hashes for near-duplicate candidate lookup
+    duplicate_of: Optional[str] = None  # Set when uploaded despite a near-duplicate match
+    simhash: Optional[int] = None  # 64-bit SimHash of the normalized full_text (signed)
+    simhash_bands: List[str] = []  # Band keys of simhash for neighbour lookup across subjects
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # Last change of metadata or text
 
     model_config = {"arbitrary_types_allowed": True}
 
@@ -23,10 +45,16 @@ class Test(Document):
             [("subject_code", 1), ("academic_year", 1)],
             [("subject_code", 1), ("exam_period", 1)],
             [("exam_period", 1), ("academic_year", 1)],
+            # updated_at last: /analyze freshness checks and the catalog tree read only index keys
+            ANALYSIS_INDEX,
             [("created_at", -1)],
+            [("subject_code", 1), ("phash_bands", 1)],
+            [("simhash_bands", 1)],
+            [("updated_at", 1)],
 
-            # Text index (use "text" as the value - this is MongoDB's special syntax)
-            [("full_text", "text")],
+            # Text index (use "text" as the value - this is MongoDB's special syntax).
+            # search_text is already folded, so no language-specific stemming is applied.
+            IndexModel([("search_text", "text")], default_language="none"),
             
             # Removed file index - cannot index large binary/base64 data
         ]
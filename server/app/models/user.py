@@ -9,6 +9,8 @@ class User(Document):
     is_admin: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
+    # Bumped whenever is_admin/is_active change; tokens carrying an older value are rejected
+    auth_version: int = 0
 
     class Settings:
         name = "users"
\ No newline at end of file
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+# bcrypt releases the GIL while hashing, so a few threads keep the event loop free
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", 2))
+# Hash/verify calls allowed to run or wait at once; more are refused with 503
+AUTH_MAX_PENDING = int(os.getenv("AUTH_MAX_PENDING", 32))
+# bcrypt cost factor for new hashes; existing hashes keep the cost they were made with
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+AUTH_RETRY_AFTER_SECONDS = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+
+
+def get_auth_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+    return _executor
+
+
+def hash_password_sync(password: str) -> str:
+    """Blocking hash, for scripts outside the event loop (e.g. create_admin)."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+async def _run(fn, *args):
+    """
+    Run a bcrypt call on the auth executor. Admission is checked up front: a
+    login burst beyond AUTH_MAX_PENDING gets 503 at once instead of queueing
+    behind work that would finish after the client gave up.
+    """
+    global _pending
+    if _pending >= AUTH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, please retry shortly",
+            headers={"Retry-After": str(AUTH_RETRY_AFTER_SECONDS)},
+        )
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_auth_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password_sync, plain_password, hashed_password)
+
+
+def pending_auth_jobs() -> int:
+    return _pending
+
+
+def shutdown_auth_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from bson import Binary, ObjectId
+from pymongo import UpdateOne
+
+from app.database import init_db, close_db
+from app.models.test import Test
+from processing.text_extraction import extract_document, extract_questions_with_groups
+from processing.hashing import simhash, simhash_bands
+from app.analysis import extract_questions_from_text
+from processing.text_normalization import normalize_text
+from app.text_fields import text_field_backfill
+from app.trends import rebuild_trends
+from app.search_backend import SEARCH_BM25, acquire_writer_lock, index_tests
+
+DEFAULT_CHECKPOINT = "reextract_checkpoint.json"
+
+
+def _reextract(test_id: str, file_content: bytes, file_extension: str):
+    """Runs in a worker process: re-extract one stored file."""
+    try:
+        extracted = extract_document(file_content, f"test.{file_extension or 'pdf'}")
+        text = extracted["text"]
+        if not text or text.strip() == "" or text.startswith("Text extraction failed"):
+            return test_id, None, None, text or "No text could be extracted"
+        return test_id, extract_questions_with_groups(text), extracted["word_boxes"], None
+    except Exception as e:
+        return test_id, None, None, str(e)
+
+
+def fresh_state() -> dict:
+    # Subjects whose text changed: trends still to rebuild / BM25 index still to update by hand
+    return {"last_id": None, "processed": 0, "updated": 0, "unchanged": 0, "failed": 0,
+            "trend_subjects": [], "reindex_subjects": []}
+
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return fresh_state()
+    with open(path, "r", encoding="utf-8") as f:
+        return {**fresh_state(), **json.load(f)}
+
+
+def _add_subjects(state: dict, key: str, subject_codes: set):
+    state[key] = sorted(set(state[key]) | subject_codes)
+
+
+def save_checkpoint(path: str, state: dict):
+    # Write to a temp file first so an interrupt never leaves a half-written checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_diff(test_id: str, old_text: str, new_text: str):
+    diff = difflib.unified_diff(
+        (old_text or "").splitlines(),
+        new_text.splitlines(),
+        fromfile=f"{test_id} (stored)",
+        tofile=f"{test_id} (re-extracted)",
+        lineterm=""
+    )
+    print("\n".join(diff))
+
+
+async def reextract_tests(
+        batch_size: int = 20,
+        workers: int = 2,
+        checkpoint_path: str = DEFAULT_CHECKPOINT,
+        dry_run: bool = False,
+        max_per_second: float = 0.0,
+        subject_code: str = None,
+        limit: int = 0,
+):
+    await init_db()
+
+    collection = Test.get_pymongo_collection()
+    state = fresh_state() if dry_run else load_checkpoint(checkpoint_path)
+    if state["last_id"]:
+        print(f"Resuming after test {state['last_id']} ({state['processed']} already processed)")
+
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    handled = 0
+    # The API usually holds the BM25 writer lock; then the index is left to build_search_index
+    update_index = SEARCH_BM25 and not dry_run and acquire_writer_lock()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                query = {"full_file": {"$ne": None}}
+                if subject_code:
+                    query["subject_code"] = subject_code
+                if state["last_id"]:
+                    query["_id"] = {"$gt": ObjectId(state["last_id"])}
+
+                batch_limit = batch_size if not limit else min(batch_size, limit - handled)
+                if batch_limit <= 0:
+                    break
+
+                cursor = collection.find(
+                    query,
+                    projection={
+                        "full_file": 1, "file_extension": 1, "full_text": 1, "simhash": 1,
+                        "question_count": 1, "search_text": 1, "word_boxes": 1, "subject_code": 1
+                    }
+                ).sort("_id", 1).limit(batch_limit)
+                batch = await cursor.to_list(length=batch_limit)
+                if not batch:
+                    break
+
+                old_texts = {str(doc["_id"]): doc.get("full_text", "") for doc in batch}
+                stored = {str(doc["_id"]): doc for doc in batch}
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(
+                        pool, _reextract, str(doc["_id"]), bytes(doc["full_file"]), doc.get("file_extension")
+                    )
+                    for doc in batch
+                ])
+
+                operations = []
+                changed = []
+                for test_id, new_text, new_boxes, error in results:
+                    state["processed"] += 1
+                    if error:
+                        state["failed"] += 1
+                        print(f"[{test_id}] failed: {error}")
+                        continue
+
+                    if new_text == old_texts[test_id]:
+                        state["unchanged"] += 1
+                        # Backfill fields of tests stored before they existed
+                        backfill = text_field_backfill(stored[test_id])
+                        if not stored[test_id].get("word_boxes") and new_boxes:
+                            backfill["word_boxes"] = Binary(new_boxes)
+                        if backfill and not dry_run:
+                            operations.append(UpdateOne({"_id": ObjectId(test_id)}, {"$set": backfill}))
+                        continue
+
+                    state["updated"] += 1
+                    if dry_run:
+                        print_diff(test_id, old_texts[test_id], new_text)
+                        continue
+
+                    text_hash = simhash(new_text)
+                    operations.append(UpdateOne(
+                        {"_id": ObjectId(test_id)},
+                        {"$set": {
+                            "full_text": new_text,
+                            "question_count": len(extract_questions_from_text(new_text)),
+                            "search_text": normalize_text(new_text),
+                            "word_boxes": Binary(new_boxes) if new_boxes else None,
+                            "simhash": text_hash,
+                            "simhash_bands": simhash_bands(text_hash),
+                            "updated_at": datetime.utcnow()
+                        }}
+                    ))
+                    changed.append((test_id, new_text))
+
+                if operations:
+                    await collection.bulk_write(operations, ordered=False)
+
+                if changed:
+                    subjects = {stored[test_id]["subject_code"] for test_id, _ in changed}
+                    _add_subjects(state, "trend_subjects", subjects)
+                    if update_index:
+                        await asyncio.to_thread(index_tests, changed)
+                    elif SEARCH_BM25:
+                        _add_subjects(state, "reindex_subjects", subjects)
+
+                handled += len(batch)
+                state["last_id"] = str(batch[-1]["_id"])
+                if not dry_run:
+                    save_checkpoint(checkpoint_path, state)
+
+                print(
+                    f"Processed {state['processed']} "
+                    f"(updated {state['updated']}, unchanged {state['unchanged']}, failed {state['failed']})"
+                )
+
+                # Rate limit: keep the overall pace under max_per_second tests
+                if max_per_second > 0:
+                    expected = handled / max_per_second
+                    elapsed = time.monotonic() - started
+                    if expected > elapsed:
+                        await asyncio.sleep(expected - elapsed)
+
+        # Trends count questions of full_text, so subjects with rewritten tests are recounted
+        while state["trend_subjects"]:
+            subject = state["trend_subjects"][0]
+            await rebuild_trends(subject)
+            print(f"Rebuilt trends for {subject}")
+            state["trend_subjects"] = state["trend_subjects"][1:]
+            save_checkpoint(checkpoint_path, state)
+    finally:
+        await close_db()
+
+    if state["reindex_subjects"]:
+        print("The BM25 index was locked by another process (the API?) and still has the old text; "
+              "with the API stopped, run:")
+        for subject in state["reindex_subjects"]:
+            print(f"  python -m app.build_search_index --subject {subject}")
+    print("Re-extraction finished" + (" (dry run, nothing written)" if dry_run else ""))
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run text extraction over stored test files")
+    parser.add_argument("--batch-size", type=int, default=20, help="Tests fetched and written per batch")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Extraction worker processes")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume")
+    parser.add_argument("--reset", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--dry-run", action="store_true", help="Print diffs of changed tests without writing")
+    parser.add_argument("--max-per-second", type=float, default=0.0,
+                        help="Upper bound on processed tests per second (0 = unlimited)")
+    parser.add_argument("--subject", default=None, help="Only re-extract tests of this subject code")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many tests (0 = all)")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    asyncio.run(reextract_tests(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        dry_run=args.dry_run,
+        max_per_second=args.max_per_second,
+        subject_code=args.subject,
+        limit=args.limit,
+    ))
+
+
+if __name__ == "__main__":
+    main()
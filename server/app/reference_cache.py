@@ -0,0 +1,191 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import CursorType
+
+from app.caching import TTLCache
+from app.models.subject import Subject
+
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv("REFERENCE_CACHE_TTL_SECONDS", 300))
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", 512))
+# "local" keeps invalidation inside this process; "mongo" broadcasts it to every API worker
+# and is required when running more than one worker (see app.auth_state)
+REFERENCE_CACHE_CHANNEL = os.getenv("REFERENCE_CACHE_CHANNEL", "local")
+# uvicorn/gunicorn worker count. Caches that cannot expire stale entries on their own
+# are only kept when every worker hears about changes (one worker or the mongo channel).
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+SHARED_INVALIDATION = API_WORKERS <= 1 or REFERENCE_CACHE_CHANNEL == "mongo"
+INVALIDATION_COLLECTION = "cache_invalidations"
+INVALIDATION_COLLECTION_BYTES = 1024 * 1024
+
+# Cache namespaces, also the messages sent over the invalidation channel
+SUBJECTS = "subjects"
+FACULTIES = "faculties"
+CATALOG = "catalog"  # Derived views over subjects, faculties and tests (e.g. /catalog/tree)
+USERS = "users"  # Only broadcast: auth state lives in its own cache, see app.auth_state
+# Only broadcast, as "test_files:<test id>": the file and preview caches in test_router
+TEST_FILES = "test_files"
+
+reference_cache = TTLCache(REFERENCE_CACHE_MAX_ENTRIES, REFERENCE_CACHE_TTL_SECONDS)
+_loading: Dict[tuple, asyncio.Future] = {}
+# Bumped on invalidation so a load that raced with a write is not cached
+_generations: Dict[str, int] = {}
+# Called with the namespace when another worker changed it (e.g. to reload the catalog tries)
+_remote_listeners: List[Callable[[str], Awaitable[None]]] = []
+
+
+async def cached(key: tuple, loader: Callable[[], Awaitable]):
+    """
+    Read-through lookup: return the cached value or await loader() once and
+    store it. Concurrent misses on one key share a single load. None is not cached.
+    """
+    value = reference_cache.get(key)
+    if value is not None:
+        return value
+
+    pending = _loading.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _loading[key] = future
+    generation = _generations.get(key[0], 0)
+    try:
+        value = await loader()
+        if value is not None and _generations.get(key[0], 0) == generation:
+            reference_cache.put(key, value)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        # Nobody else may be waiting; mark the exception as retrieved
+        future.exception()
+        raise
+    finally:
+        del _loading[key]
+
+
+class LocalInvalidationChannel:
+    """Single-process stand-in: nothing to broadcast, nothing to listen to."""
+
+    async def start(self, on_message: Callable[[str], Awaitable[None]]):
+        pass
+
+    async def publish(self, namespace: str):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class MongoInvalidationChannel:
+    """
+    Broadcast over a capped collection: writers insert {namespace, origin},
+    every worker tails it with a tailable-await cursor and skips its own messages.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.origin = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    async def _collection(self):
+        if INVALIDATION_COLLECTION not in await self.database.list_collection_names():
+            try:
+                await self.database.create_collection(
+                    INVALIDATION_COLLECTION, capped=True, size=INVALIDATION_COLLECTION_BYTES
+                )
+            except Exception:
+                pass  # Created concurrently by another worker
+        return self.database[INVALIDATION_COLLECTION]
+
+    async def start(self, on_message: Callable[[str], Awaitable[None]]):
+        collection = await self._collection()
+        # A tailable cursor on an empty capped collection dies at once, so seed it
+        await collection.insert_one({"namespace": None, "origin": self.origin, "created_at": datetime.utcnow()})
+        latest = await collection.find_one(sort=[("$natural", -1)])
+        self._task = asyncio.create_task(self._tail(collection, latest["_id"], on_message))
+
+    async def _tail(self, collection, last_id, on_message):
+        while True:
+            try:
+                cursor = collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for message in cursor:
+                        last_id = message["_id"]
+                        if message.get("namespace") and message.get("origin") != self.origin:
+                            await on_message(message["namespace"])
+                    await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[reference cache] invalidation listener error: {e}")
+            await asyncio.sleep(1)
+
+    async def publish(self, namespace: str):
+        collection = self.database[INVALIDATION_COLLECTION]
+        await collection.insert_one({"namespace": namespace, "origin": self.origin, "created_at": datetime.utcnow()})
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_channel = LocalInvalidationChannel()
+
+
+def _invalidate_local(message: str):
+    # A message is a namespace, optionally scoped to one key as "namespace:key"
+    namespace = message.split(":", 1)[0]
+    _generations[namespace] = _generations.get(namespace, 0) + 1
+    reference_cache.invalidate(namespace)
+
+
+async def _on_remote_invalidation(namespace: str):
+    _invalidate_local(namespace)
+    for listener in _remote_listeners:
+        try:
+            await listener(namespace)
+        except Exception as e:
+            print(f"[reference cache] listener failed for {namespace}: {e}")
+
+
+def on_remote_invalidation(listener: Callable[[str], Awaitable[None]]):
+    _remote_listeners.append(listener)
+
+
+async def invalidate(*namespaces: str):
+    """Drop namespaces here and tell the other workers to do the same."""
+    for namespace in namespaces:
+        _invalidate_local(namespace)
+        try:
+            await _channel.publish(namespace)
+        except Exception as e:
+            # Other workers catch up when their entries expire
+            print(f"[reference cache] failed to publish invalidation of {namespace}: {e}")
+
+
+async def start_reference_cache(channel=None):
+    """Pick and start the invalidation channel (after init_db); `channel` overrides REFERENCE_CACHE_CHANNEL."""
+    global _channel
+    if channel is None:
+        if REFERENCE_CACHE_CHANNEL == "mongo":
+            channel = MongoInvalidationChannel(Subject.get_pymongo_collection().database)
+        else:
+            channel = LocalInvalidationChannel()
+    _channel = channel
+    await _channel.start(_on_remote_invalidation)
+    print(f"Reference data cache ready ({type(_channel).__name__})")
+
+
+async def stop_reference_cache():
+    await _channel.stop()
+    reference_cache.clear()
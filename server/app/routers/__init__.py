@@ -2,5 +2,7 @@ from .test_router import test_router
 from .faculty_router import faculty_router
 from .subject_router import subject_router
 from .user_router import user_router
+from .question_router import question_router
+from .catalog_router import catalog_router
 
-__all__ = ["test_router", "faculty_router", "subject_router", "user_router"]
\ No newline at end of file
+__all__ = ["test_router", "faculty_router", "subject_router", "user_router", "question_router", "catalog_router"]
\ No newline at end of file
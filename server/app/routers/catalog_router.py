@@ -0,0 +1,160 @@
+import hashlib
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from pydantic import BaseModel
+
+from app.caching import etag_matches
+from app.catalog import CATALOG_KINDS, SUGGEST_TOP_K, suggest
+from app.models.faculty import Faculty
+from app.models.subject import Subject
+from app.models.test import Test
+from app.reference_cache import CATALOG, cached
+
+catalog_router = APIRouter()
+
+
+class CatalogSuggestion(BaseModel):
+    type: str  # subject or faculty
+    code: str
+    name: str
+    faculty_code: Optional[str] = None
+    module_code: Optional[str] = None
+    year: Optional[int] = None
+
+
+@catalog_router.get("/suggest", response_model=List[CatalogSuggestion], response_model_exclude_none=True)
+async def suggest_catalog(
+        q: str = Query(..., min_length=1, description="Prefix of a code, a name or any word of a name"),
+        type: Optional[str] = Query(None, description="Only subject or faculty suggestions"),
+        limit: int = Query(SUGGEST_TOP_K, ge=1, le=SUGGEST_TOP_K)
+):
+    """
+    Autocomplete subjects and faculties from an in-memory trie (no database
+    access). Matching ignores case, script and diacritics; shorter names rank first.
+    """
+    if type is not None and type not in CATALOG_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid type: {type}. Must be one of: {', '.join(CATALOG_KINDS)}"
+        )
+    return suggest(q, limit, type)
+
+
+class CatalogSubject(BaseModel):
+    code: str
+    name: str
+    year: int
+    semester: int
+    mandatory: bool
+    espb: Optional[int] = None
+    test_count: int = 0
+    latest_academic_year: Optional[str] = None
+    latest_exam_period: Optional[str] = None
+
+
+class CatalogModule(BaseModel):
+    code: Optional[str] = None  # None groups subjects whose module is not listed on the faculty
+    name: str
+    subjects: List[CatalogSubject] = []
+
+
+class CatalogFaculty(BaseModel):
+    code: str
+    name: str
+    modules: List[CatalogModule] = []
+
+
+class CatalogTree(BaseModel):
+    faculties: List[CatalogFaculty]
+
+
+def _tree_pipeline() -> list:
+    """Faculties with their subjects, each subject with its test count and latest exam, in one aggregation."""
+    return [
+        {"$sort": {"name": 1}},
+        {"$lookup": {
+            "from": Subject.Settings.name,
+            "localField": "code",
+            "foreignField": "faculty_code",
+            "as": "subjects",
+            "pipeline": [
+                {"$lookup": {
+                    "from": Test.Settings.name,
+                    "localField": "code",
+                    "foreignField": "subject_code",
+                    "as": "tests",
+                    "pipeline": [
+                        # Sorts and reads index keys only, so ANALYSIS_INDEX answers it
+                        # backwards without fetching a test; ties within the latest
+                        # year go to the last exam period by name
+                        {"$sort": {"academic_year": -1, "exam_period": -1}},
+                        {"$project": {"_id": 0, "academic_year": 1, "exam_period": 1}},
+                        {"$group": {
+                            "_id": None,
+                            "test_count": {"$sum": 1},
+                            "latest_academic_year": {"$first": "$academic_year"},
+                            "latest_exam_period": {"$first": "$exam_period"},
+                        }},
+                    ],
+                }},
+                {"$project": {
+                    "_id": 0, "code": 1, "name": 1, "module_code": 1, "year": 1, "semester": 1, "mandatory": 1, "espb": 1,
+                    "stats": {"$first": "$tests"},
+                }},
+                {"$sort": {"year": 1, "semester": 1, "name": 1}},
+            ],
+        }},
+        {"$project": {"_id": 0, "code": 1, "name": 1, "modules": {"code": 1, "name": 1}, "subjects": 1}},
+    ]
+
+
+def _build_tree(faculties: List[dict]) -> CatalogTree:
+    tree = []
+    for faculty in faculties:
+        modules = {m["code"]: CatalogModule(code=m["code"], name=m["name"]) for m in faculty.get("modules", [])}
+        for subject in faculty.get("subjects", []):
+            stats = subject.get("stats") or {}
+            module = modules.get(subject.get("module_code"))
+            if module is None:
+                module = modules.setdefault(None, CatalogModule(code=None, name="Other"))
+            module.subjects.append(CatalogSubject(
+                code=subject["code"],
+                name=subject["name"],
+                year=subject["year"],
+                semester=subject["semester"],
+                mandatory=subject["mandatory"],
+                espb=subject.get("espb"),
+                test_count=stats.get("test_count", 0),
+                latest_academic_year=stats.get("latest_academic_year"),
+                latest_exam_period=stats.get("latest_exam_period"),
+            ))
+        tree.append(CatalogFaculty(code=faculty["code"], name=faculty["name"], modules=list(modules.values())))
+    return CatalogTree(faculties=tree)
+
+
+async def _load_tree() -> tuple:
+    faculties = await Faculty.get_pymongo_collection().aggregate(_tree_pipeline()).to_list(length=None)
+    body = _build_tree(faculties).model_dump_json(exclude_none=True).encode("utf-8")
+    return hashlib.sha256(body).hexdigest(), body
+
+
+@catalog_router.get("/tree", response_model=CatalogTree)
+async def get_catalog_tree(if_none_match: Optional[str] = Header(None)):
+    """
+    Faculties -> modules -> subjects with per-subject test counts and latest exam,
+    for rendering the whole catalog in one request. Cached until a subject,
+    faculty or test changes; send If-None-Match to get 304 when unchanged.
+    """
+    try:
+        etag, body = await cached((CATALOG, "tree"), _load_tree)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to build catalog tree: {str(e)}"
+        )
+
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
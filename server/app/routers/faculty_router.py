@@ -1,17 +1,59 @@
-from fastapi import APIRouter, HTTPException, Query, status
+import re
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from typing import List, Optional
 from beanie import PydanticObjectId
+from pydantic import BaseModel
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 from app.models import Faculty, Module  # Adjust import path as needed
+from app.models.faculty import FACULTY_SEARCH_FIELDS
+from app.bulk_import import BulkImportResponse, bulk_write_documents, read_import, validate_rows
+from app.catalog import index_faculty, unindex
+from app.versioning import concurrent_update_error, raise_update_conflict, version_filter
+from app.reference_cache import FACULTIES, CATALOG, cached, invalidate
+from processing.text_normalization import ngrams, normalize_text
 
 faculty_router = APIRouter()
 
+SEARCH_MODES = ["auto", "prefix", "substring", "regex"]
+# Upper bound on candidates (trigram matches or scanned faculties) checked per substring search
+MAX_SUBSTRING_CANDIDATES = 500
 
-@faculty_router.post("/", response_model=Faculty, status_code=status.HTTP_201_CREATED)
+# Search fields are internal: drop them from single and list responses
+EXCLUDE_SEARCH_FIELDS = FACULTY_SEARCH_FIELDS
+EXCLUDE_SEARCH_FIELDS_LIST = {"__all__": FACULTY_SEARCH_FIELDS}
+
+
+def _prefix_query(folded: str, tags: List[str]) -> dict:
+    """Anchored, case-sensitive regexes over the folded search_keys: each is an index range scan."""
+    return {"search_keys": {"$in": [re.compile("^" + re.escape(f"{tag}:{folded}")) for tag in tags]}}
+
+
+async def _substring_search(folded: str) -> List[Faculty]:
+    """Faculties containing the folded query anywhere, found via trigrams and then verified."""
+    if not folded:
+        return []
+    # Stored grams of short words are the whole word, so a 1-2 character query token
+    # (e.g. "fa" in "onski fa") is only a prefix of them: leave it to the check below
+    grams = [gram for gram in ngrams(folded) if len(gram) == 3]
+    # No trigram left (e.g. "ro"): scan a bounded number of faculties instead
+    query = {"search_ngrams": {"$all": grams}} if grams else {}
+    candidates = await Faculty.find(query).limit(MAX_SUBSTRING_CANDIDATES).to_list()
+    return [
+        f for f in candidates
+        if folded in normalize_text(f"{f.name} {f.code} {f.description}")
+    ]
+
+
+@faculty_router.post("/", response_model=Faculty, status_code=status.HTTP_201_CREATED,
+                     response_model_exclude=EXCLUDE_SEARCH_FIELDS)
 async def create_faculty(faculty: Faculty):
     """Create a new faculty"""
     try:
         await faculty.insert()
+        index_faculty(faculty)
+        await invalidate(FACULTIES, CATALOG)
         return faculty
     except Exception as e:
         if "duplicate key" in str(e).lower():
@@ -25,45 +67,114 @@ async def create_faculty(faculty: Faculty):
         )
 
 
-@faculty_router.get("/", response_model=List[Faculty])
+@faculty_router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_faculties(
+        request: Request,
+        upsert: bool = Query(False, description="Update faculties whose code already exists instead of reporting them")
+):
+    """
+    Import many faculties from a JSON list or a CSV (raw body or multipart `file`)
+    with one unordered insert_many. CSV uses `address.city`-style columns and a
+    `modules` cell of `CODE:Name;CODE2:Name 2`. Duplicate names or codes come back per row.
+    """
+    rows = await read_import(request)
+    valid, errors = validate_rows(Faculty, rows)
+    try:
+        inserted, updated, write_errors, written = await bulk_write_documents(Faculty, valid, upsert)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing faculties: {str(e)}"
+        )
+
+    for faculty in written:
+        index_faculty(faculty)
+    if written:
+        await invalidate(FACULTIES, CATALOG)
+    return BulkImportResponse(
+        requested=len(rows),
+        inserted=inserted,
+        updated=updated,
+        errors=sorted(errors + write_errors, key=lambda error: error.row)
+    )
+
+
+@faculty_router.get("/", response_model=List[Faculty], response_model_exclude=EXCLUDE_SEARCH_FIELDS_LIST)
 async def list_faculties(
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=1000),
-        name: Optional[str] = None,
-        code: Optional[str] = None
+        name: Optional[str] = Query(None, description="Prefix of the name or of any word in it"),
+        code: Optional[str] = Query(None, description="Prefix of the code"),
+        regex: bool = Query(False, description="Treat name/code as case-insensitive regexes (slow, full scan)")
 ):
     """List all faculties with optional filtering and pagination"""
     query = {}
 
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}  # Case-insensitive search
-    if code:
-        query["code"] = {"$regex": code, "$options": "i"}
+    if regex:
+        if name:
+            query["name"] = {"$regex": name, "$options": "i"}  # Case-insensitive search
+        if code:
+            query["code"] = {"$regex": code, "$options": "i"}
+    else:
+        # Folded prefix lookups: script, case and diacritics do not matter
+        filters = []
+        if name:
+            filters.append(_prefix_query(normalize_text(name), ["n", "w"]))
+        if code:
+            filters.append(_prefix_query(normalize_text(code), ["c"]))
+        if filters:
+            query["$and"] = filters
 
-    faculties = await Faculty.find(query).skip(skip).limit(limit).to_list()
+    key = (FACULTIES, "list", skip, limit, name, code, regex)
+    faculties = await cached(key, lambda: Faculty.find(query).skip(skip).limit(limit).to_list())
     return faculties
 
 
-@faculty_router.get("/search", response_model=List[Faculty])
+@faculty_router.get("/search", response_model=List[Faculty], response_model_exclude=EXCLUDE_SEARCH_FIELDS_LIST)
 async def search_faculties(
         q: str = Query(..., min_length=1, description="Search query"),
+        mode: str = Query("auto", description="auto, prefix, substring or regex (full scan, explicit only)"),
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=1000)
 ):
-    """Search faculties by name, code, or description"""
-    query = {
-        "$or": [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"code": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}}
-        ]
-    }
-
-    faculties = await Faculty.find(query).skip(skip).limit(limit).to_list()
-    return faculties
+    """
+    Search faculties by name, code, or description.
+    auto returns name/code prefix matches first, then substring matches.
+    """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid mode: {mode}. Must be one of: {', '.join(SEARCH_MODES)}"
+        )
+
+    if mode == "regex":
+        query = {
+            "$or": [
+                {"name": {"$regex": q, "$options": "i"}},
+                {"code": {"$regex": q, "$options": "i"}},
+                {"description": {"$regex": q, "$options": "i"}}
+            ]
+        }
+        return await Faculty.find(query).skip(skip).limit(limit).to_list()
+
+    folded = normalize_text(q)
+    if not folded:
+        return []
 
+    if mode == "prefix":
+        return await Faculty.find(_prefix_query(folded, ["n", "w", "c"])).skip(skip).limit(limit).to_list()
 
-@faculty_router.get("/{faculty_id}", response_model=Faculty)
+    if mode == "substring":
+        return (await _substring_search(folded))[skip:skip + limit]
+
+    faculties = await Faculty.find(_prefix_query(folded, ["n", "w", "c"])).limit(skip + limit).to_list()
+    if len(faculties) < skip + limit:
+        seen = {f.id for f in faculties}
+        faculties.extend(f for f in await _substring_search(folded) if f.id not in seen)
+    return faculties[skip:skip + limit]
+
+
+@faculty_router.get("/{faculty_id}", response_model=Faculty, response_model_exclude=EXCLUDE_SEARCH_FIELDS)
 async def get_faculty(faculty_id: PydanticObjectId):
     """Get a specific faculty by ID"""
     faculty = await Faculty.get(faculty_id)
@@ -75,34 +186,44 @@ async def get_faculty(faculty_id: PydanticObjectId):
     return faculty
 
 
-@faculty_router.put("/{faculty_id}", response_model=Faculty)
-async def update_faculty(faculty_id: PydanticObjectId, faculty_data: Faculty):
+@faculty_router.put("/{faculty_id}", response_model=Faculty, response_model_exclude=EXCLUDE_SEARCH_FIELDS)
+async def update_faculty(
+        faculty_id: PydanticObjectId,
+        faculty_data: Faculty,
+        expected_version: Optional[int] = Query(None, description="Fail with 409 unless the faculty is at this version")
+):
     """Replace a faculty entirely"""
-    faculty = await Faculty.get(faculty_id)
-    if not faculty:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Faculty with id {faculty_id} not found"
-        )
+    # Raw updates skip the before_event hook, so derive the search fields here
+    faculty_data.refresh_search_fields()
+    fields = faculty_data.model_dump(exclude={"id", "revision_id", "version"})
+    collection = Faculty.get_pymongo_collection()
 
     try:
-        faculty.name = faculty_data.name
-        faculty.code = faculty_data.code
-        faculty.description = faculty_data.description
-        faculty.address = faculty_data.address
-        faculty.modules = faculty_data.modules
-        await faculty.save()
-        return faculty
+        before = await collection.find_one_and_update(
+            {"_id": faculty_id, **version_filter(expected_version)},
+            {"$set": fields, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Faculty with this name or code already exists"
+        )
     except Exception as e:
-        if "duplicate key" in str(e).lower():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Faculty with this name or code already exists"
-            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating faculty: {str(e)}"
         )
+    if before is None:
+        await raise_update_conflict(collection, faculty_id, expected_version, "Faculty")
+        raise concurrent_update_error("Faculty")
+
+    faculty = Faculty.model_validate({**before, **fields, "version": before.get("version", 0) + 1})
+    if faculty.code != before["code"]:
+        unindex("faculty", before["code"])
+    index_faculty(faculty)
+    await invalidate(FACULTIES, CATALOG)
+    return faculty
 
 
 @faculty_router.delete("/{faculty_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -116,36 +237,141 @@ async def delete_faculty(faculty_id: PydanticObjectId):
         )
 
     await faculty.delete()
+    unindex("faculty", faculty.code)
+    await invalidate(FACULTIES, CATALOG)
     return None
 
 
-# Additional endpoints for managing modules within a faculty
+# Additional endpoints for managing modules within a faculty.
+# Each is a single conditional update, so concurrent edits cannot overwrite each other.
 
-@faculty_router.post("/{faculty_id}/modules", response_model=Faculty)
-async def add_module_to_faculty(faculty_id: PydanticObjectId, module: Module):
+@faculty_router.post("/{faculty_id}/modules", response_model=Faculty, response_model_exclude=EXCLUDE_SEARCH_FIELDS)
+async def add_module_to_faculty(
+        faculty_id: PydanticObjectId,
+        module: Module,
+        expected_version: Optional[int] = Query(None, description="Fail with 409 unless the faculty is at this version")
+):
     """Add a module to a faculty"""
-    faculty = await Faculty.get(faculty_id)
-    if not faculty:
+    collection = Faculty.get_pymongo_collection()
+    doc = await collection.find_one_and_update(
+        {"_id": faculty_id, "modules.code": {"$ne": module.code}, **version_filter(expected_version)},
+        {"$push": {"modules": module.model_dump()}, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        await raise_update_conflict(collection, faculty_id, expected_version, "Faculty")
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Faculty with id {faculty_id} not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Module with code {module.code} already exists in this faculty"
         )
 
-    faculty.modules.append(module)
-    await faculty.save()
-    return faculty
+    await invalidate(FACULTIES, CATALOG)
+    return Faculty.model_validate(doc)
 
 
-@faculty_router.delete("/{faculty_id}/modules/{module_code}", response_model=Faculty)
-async def remove_module_from_faculty(faculty_id: PydanticObjectId, module_code: str):
+@faculty_router.delete("/{faculty_id}/modules/{module_code}", response_model=Faculty,
+                       response_model_exclude=EXCLUDE_SEARCH_FIELDS)
+async def remove_module_from_faculty(
+        faculty_id: PydanticObjectId,
+        module_code: str,
+        expected_version: Optional[int] = Query(None, description="Fail with 409 unless the faculty is at this version")
+):
     """Remove a module from a faculty by module code"""
-    faculty = await Faculty.get(faculty_id)
-    if not faculty:
+    collection = Faculty.get_pymongo_collection()
+    doc = await collection.find_one_and_update(
+        {"_id": faculty_id, "modules.code": module_code, **version_filter(expected_version)},
+        {"$pull": {"modules": {"code": module_code}}, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        await raise_update_conflict(collection, faculty_id, expected_version, "Faculty")
+        faculty = await Faculty.get(faculty_id)
+        if faculty is None:
+            # Deleted since raise_update_conflict looked
+            await raise_update_conflict(collection, faculty_id, expected_version, "Faculty")
+        if faculty is None or any(m.code == module_code for m in faculty.modules):
+            # The module is there after all: the faculty changed under the update
+            raise concurrent_update_error("Faculty")
+        # Module was not there: nothing to remove
+        return faculty
+
+    await invalidate(FACULTIES, CATALOG)
+    return Faculty.model_validate(doc)
+
+
+MODULE_OPERATIONS = ["add", "update", "remove"]
+
+
+class ModuleChange(BaseModel):
+    faculty_code: str
+    op: str  # add, update or remove
+    module: Optional[Module] = None  # Required for add and update
+    module_code: Optional[str] = None  # Required for remove
+    expected_version: Optional[int] = None
+
+
+class ModuleBulkResponse(BaseModel):
+    requested: int
+    matched: int
+    modified: int
+
+
+def _module_operation(change: ModuleChange) -> UpdateOne:
+    query = {"code": change.faculty_code, **version_filter(change.expected_version)}
+    if change.op == "add":
+        query["modules.code"] = {"$ne": change.module.code}
+        update = {"$push": {"modules": change.module.model_dump()}}
+    elif change.op == "update":
+        query["modules.code"] = change.module.code
+        update = {"$set": {"modules.$": change.module.model_dump()}}
+    else:
+        query["modules.code"] = change.module_code
+        update = {"$pull": {"modules": {"code": change.module_code}}}
+    update["$inc"] = {"version": 1}
+    return UpdateOne(query, update)
+
+
+@faculty_router.post("/modules/bulk", response_model=ModuleBulkResponse)
+async def bulk_update_modules(changes: List[ModuleChange]):
+    """
+    Apply many module additions, updates and removals across faculties in one
+    unordered bulk_write. Changes whose faculty, module or expected_version do
+    not match are skipped; compare matched with requested to detect them.
+    """
+    for index, change in enumerate(changes):
+        if change.op not in MODULE_OPERATIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Change {index}: invalid op {change.op}. Must be one of: {', '.join(MODULE_OPERATIONS)}"
+            )
+        if change.op in ("add", "update") and change.module is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Change {index}: op {change.op} requires module"
+            )
+        if change.op == "remove" and not change.module_code:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Change {index}: op remove requires module_code"
+            )
+
+    if not changes:
+        return ModuleBulkResponse(requested=0, matched=0, modified=0)
+
+    try:
+        result = await Faculty.get_pymongo_collection().bulk_write(
+            [_module_operation(change) for change in changes], ordered=False
+        )
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Faculty with id {faculty_id} not found"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error applying module changes: {str(e)}"
         )
 
-    faculty.modules = [m for m in faculty.modules if m.code != module_code]
-    await faculty.save()
-    return faculty
\ No newline at end of file
+    if result.modified_count:
+        await invalidate(FACULTIES, CATALOG)
+    return ModuleBulkResponse(
+        requested=len(changes),
+        matched=result.matched_count,
+        modified=result.modified_count
+    )
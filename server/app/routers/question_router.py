@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.analysis import extract_questions_from_text
+from app.models.test import Test
+from app.search_backend import SEARCH_BM25, bm25_search, split_question_doc_id
+from processing.text_normalization import highlight_snippets
+from app.export import export_cursor, export_query, ndjson_line
+
+question_router = APIRouter()
+
+
+@question_router.get("/export")
+async def export_questions(
+        subject_code: Optional[str] = Query(None, description="Exact match: subject code"),
+        academic_year: Optional[str] = Query(None, description="Exact match: academic year"),
+        updated_since: Optional[datetime] = Query(None, description="Only tests changed at or after this time"),
+        after: Optional[str] = Query(None, description="Cursor token: test_id of the last exported line, to resume")
+):
+    """
+    Stream the extracted questions of every matching test as newline-delimited JSON,
+    one question per line. Resume with the `test_id` of the last complete test as `after`.
+    """
+    query = export_query(subject_code, academic_year, updated_since, after)
+
+    async def lines():
+        async for doc in export_cursor(query):
+            test_id = str(doc["_id"])
+            for index, question in enumerate(extract_questions_from_text(doc.get("full_text", ""))):
+                yield ndjson_line({
+                    "test_id": test_id,
+                    "subject_code": doc.get("subject_code"),
+                    "exam_period": doc.get("exam_period"),
+                    "academic_year": doc.get("academic_year"),
+                    "test_type": doc.get("test_type"),
+                    "index": index + 1,
+                    "question": question,
+                })
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+class QuestionSearchResult(BaseModel):
+    test_id: str
+    subject_code: str
+    exam_period: str
+    academic_year: str
+    index: int  # 1-based position of the question in its test, as in /export
+    question: str
+    highlighted: Optional[str] = None
+    score: float
+
+
+@question_router.get("/search", response_model=List[QuestionSearchResult])
+async def search_questions(
+        q: str = Query(..., min_length=1, description="Search text (either script, diacritics optional)"),
+        subject_code: Optional[str] = Query(None, description="Exact match: subject code"),
+        prefix: bool = Query(False, description="Also match words starting with a search term"),
+        fuzzy: bool = Query(False, description="Also match words one typo away (OCR errors)"),
+        limit: int = Query(20, ge=1, le=100)
+):
+    """Rank individual extracted questions with the BM25 index."""
+    if not SEARCH_BM25:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The bm25 search backend is not enabled (set SEARCH_BM25=1)"
+        )
+
+    try:
+        collection = Test.get_pymongo_collection()
+
+        allowed = None
+        if subject_code:
+            allowed_ids = {str(i) for i in await collection.distinct("_id", {"subject_code": subject_code})}
+            allowed = lambda doc_id: split_question_doc_id(doc_id)[0] in allowed_ids
+
+        hits = await bm25_search("questions", q, limit, prefix, fuzzy, allowed)
+        if not hits:
+            return []
+
+        test_ids = {split_question_doc_id(doc_id)[0] for doc_id, _ in hits}
+        docs = await collection.find(
+            {"_id": {"$in": [ObjectId(test_id) for test_id in test_ids]}},
+            {"subject_code": 1, "exam_period": 1, "academic_year": 1, "full_text": 1}
+        ).to_list(length=len(test_ids))
+        docs_by_id = {str(doc["_id"]): doc for doc in docs}
+        questions_by_id = {}
+
+        results = []
+        for doc_id, score in hits:
+            test_id, index = split_question_doc_id(doc_id)
+            doc = docs_by_id.get(test_id)
+            if doc is None:
+                continue
+            if test_id not in questions_by_id:
+                questions_by_id[test_id] = extract_questions_from_text(doc.get("full_text", ""))
+            questions = questions_by_id[test_id]
+            if index >= len(questions):  # Text changed since it was indexed
+                continue
+
+            snippets = highlight_snippets(questions[index], q, 1)
+            results.append(QuestionSearchResult(
+                test_id=test_id,
+                subject_code=doc["subject_code"],
+                exam_period=doc["exam_period"],
+                academic_year=doc["academic_year"],
+                index=index + 1,
+                question=questions[index],
+                highlighted=snippets[0] if snippets else None,
+                score=score
+            ))
+        return results
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Question search failed: {str(e)}"
+        )
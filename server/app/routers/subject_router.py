@@ -1,9 +1,16 @@
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, status, Body, Form, File, UploadFile,Query
+from fastapi import APIRouter, HTTPException, status, Body, Form, File, UploadFile,Query, Request
 
 from app.models.subject import Subject
 from app.models.test import Test
 from app.models.testuser import TestUser
+from app.bulk_import import BulkImportResponse, bulk_write_documents, read_import, validate_rows
+from app.catalog import index_subject, unindex
+from app.reference_cache import SUBJECTS, CATALOG, cached, invalidate
+from app.versioning import concurrent_update_error, raise_update_conflict, version_filter
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from typing import List, Optional
 
 subject_router = APIRouter()
@@ -18,9 +25,43 @@ async def create_subject(subject: Subject):
             detail=f"Subject with code {subject.code} already exists"
         )
     await subject.insert()
+    index_subject(subject)
+    await invalidate(SUBJECTS, CATALOG)
     return subject
 
 
+@subject_router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_subjects(
+        request: Request,
+        upsert: bool = Query(False, description="Update subjects whose code already exists instead of reporting them")
+):
+    """
+    Import many subjects from a JSON list or a CSV (raw body or multipart `file`)
+    with one unordered insert_many; rows that fail validation or hit an
+    existing code are reported individually and do not stop the others.
+    """
+    rows = await read_import(request)
+    valid, errors = validate_rows(Subject, rows)
+    try:
+        inserted, updated, write_errors, written = await bulk_write_documents(Subject, valid, upsert)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing subjects: {str(e)}"
+        )
+
+    for subject in written:
+        index_subject(subject)
+    if written:
+        await invalidate(SUBJECTS, CATALOG)
+    return BulkImportResponse(
+        requested=len(rows),
+        inserted=inserted,
+        updated=updated,
+        errors=sorted(errors + write_errors, key=lambda error: error.row)
+    )
+
+
 @subject_router.get("/", response_model=List[Subject])
 async def get_all_subjects(
         faculty_code: Optional[str] = Query(None),
@@ -43,7 +84,8 @@ async def get_all_subjects(
     if mandatory is not None:
         query["mandatory"] = mandatory
 
-    subjects = await Subject.find(query).to_list()
+    key = (SUBJECTS, "list", faculty_code, module_code, year, semester, mandatory)
+    subjects = await cached(key, lambda: Subject.find(query).to_list())
     return subjects
 
 
@@ -62,7 +104,7 @@ async def get_subject(subject_id: PydanticObjectId):
 @subject_router.get("/code/{code}", response_model=Subject)
 async def get_subject_by_code(code: str):
     """Get a subject by code"""
-    subject = await Subject.find_one(Subject.code == code)
+    subject = await cached((SUBJECTS, "code", code), lambda: Subject.find_one(Subject.code == code))
     if not subject:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,29 +113,76 @@ async def get_subject_by_code(code: str):
     return subject
 
 
-@subject_router.put("/{subject_id}", response_model=Subject)
-async def update_subject(subject_id: PydanticObjectId, subject_data: Subject):
-    """Replace entire subject (not partial update)"""
-    subject = await Subject.get(subject_id)
-    if not subject:
+class SubjectUpdate(BaseModel):
+    """Fields a PATCH may change; omitted fields are left as they are."""
+    name: Optional[str] = None
+    code: Optional[str] = None
+    module_code: Optional[str] = None
+    faculty_code: Optional[str] = None
+    year: Optional[int] = None
+    semester: Optional[int] = None
+    espb: Optional[int] = None
+    mandatory: Optional[bool] = None
+    description: Optional[str] = None
+
+
+async def _apply_subject_update(subject_id: PydanticObjectId, fields: dict, expected_version: Optional[int]) -> Subject:
+    """
+    One conditional find_one_and_update: $set the fields and bump the version,
+    so a concurrent edit is either seen (409) or applied on top, never overwritten.
+    """
+    collection = Subject.get_pymongo_collection()
+    try:
+        before = await collection.find_one_and_update(
+            {"_id": subject_id, **version_filter(expected_version)},
+            {"$set": fields, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Subject with ID {subject_id} not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subject with code {fields.get('code')} already exists"
         )
+    if before is None:
+        await raise_update_conflict(collection, subject_id, expected_version, "Subject")
+        raise concurrent_update_error("Subject")
+
+    subject = Subject.model_validate({**before, **fields, "version": before.get("version", 0) + 1})
+    if subject.code != before["code"]:
+        unindex("subject", before["code"])
+    index_subject(subject)
+    await invalidate(SUBJECTS, CATALOG)
+    return subject
 
-    # Check if code is being changed and if new code already exists
-    if subject_data.code != subject.code:
-        existing = await Subject.find_one(Subject.code == subject_data.code)
-        if existing:
+
+@subject_router.put("/{subject_id}", response_model=Subject)
+async def update_subject(
+        subject_id: PydanticObjectId,
+        subject_data: Subject,
+        expected_version: Optional[int] = Query(None, description="Fail with 409 unless the subject is at this version")
+):
+    """Replace entire subject (not partial update)"""
+    fields = subject_data.model_dump(exclude={"id", "revision_id", "version"})
+    return await _apply_subject_update(subject_id, fields, expected_version)
+
+
+@subject_router.patch("/{subject_id}", response_model=Subject)
+async def patch_subject(
+        subject_id: PydanticObjectId,
+        changes: SubjectUpdate,
+        expected_version: Optional[int] = Query(None, description="Fail with 409 unless the subject is at this version")
+):
+    """Update only the given fields of a subject"""
+    fields = changes.model_dump(exclude_unset=True, exclude_none=True)
+    if not fields:
+        subject = await Subject.get(subject_id)
+        if not subject:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Subject with code {subject_data.code} already exists"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Subject with ID {subject_id} not found"
             )
-
-    # Replace all fields
-    subject_data.id = subject_id
-    await subject_data.replace()
-    return subject_data
+        return subject
+    return await _apply_subject_update(subject_id, fields, expected_version)
 
 
 @subject_router.delete("/{subject_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -106,6 +195,8 @@ async def delete_subject(subject_id: PydanticObjectId):
             detail=f"Subject with ID {subject_id} not found"
         )
     await subject.delete()
+    unindex("subject", subject.code)
+    await invalidate(SUBJECTS, CATALOG)
     return None
 
 
@@ -1,19 +1,62 @@
-from fastapi import APIRouter, HTTPException, status, Body, Form, File, UploadFile, Query, Response
+from fastapi import APIRouter, HTTPException, status, Body, Form, File, UploadFile, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from app.models.test import Test
 from app.models.testuser import TestUser
-from typing import List, Optional
+from typing import Any, List, Optional
 from bson import Binary, ObjectId
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from beanie import PydanticObjectId
 from bson.errors import InvalidId
 from processing.text_extraction import extract_text_structured, get_text_from_bytes, process_image_from_array, safe_process_image, \
-    extract_questions_with_groups
+    extract_questions_with_groups, extract_document, split_pages, extract_page, join_pages
+from processing.word_boxes import WORD_BOX_COLUMNS, unpack_word_boxes
+from processing.archive import MAX_ARCHIVE_ENTRY_BYTES, iter_archive_entries, read_manifest, resolve_metadata
+from processing.worker_pool import OCR_WORKERS, run_in_pool
+from app.caching import ByteBudgetLRU, etag_matches
+from app.analysis import extract_questions_from_text, rank_groups
+from app.trends import schedule_trend_update, add_test_to_trends, remove_test_from_trends, rebuild_trends
+from app.export import export_cursor, export_query, ndjson_line
+from app.models.question_trend import QuestionTrend
+from app.analysis_warmup import get_analysis, interactive_request, mark_subject_changed
+from app.reference_cache import CATALOG, SHARED_INVALIDATION, TEST_FILES, invalidate
+from app.search_backend import SEARCH_BACKENDS, DEFAULT_SEARCH_BACKEND, SEARCH_BM25, bm25_search, \
+    schedule_index_update, schedule_index_removal
+from processing.preview import render_preview, PREVIEW_WIDTH, PREVIEW_MIN_WIDTH, PREVIEW_MAX_WIDTH
+from processing.file_optimization import optimize_file
+from processing.text_normalization import normalize_text, highlight_snippets
+from processing.hashing import compute_page_hashes, page_hash_bands, pages_match, simhash, simhash_bands, \
+    hamming_distance, SIMHASH_MAX_DISTANCE
 
 test_router = APIRouter()
 
 
 from fastapi import UploadFile, File, Form, HTTPException, status
 import asyncio
-from difflib import SequenceMatcher
+import hashlib
+import json
+import os
+import time
+import zipfile
+from collections import deque
+from datetime import datetime
+
+ALLOWED_EXTENSIONS = ["jpg", "jpeg", "png", "pdf", "tiff", "bmp"]
+# Hot original files kept in memory for GET /{test_id}/file. Deletes are broadcast to the
+# other workers (TEST_FILES); when they cannot be, nothing is cached (budget 0).
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 256 * 1024 * 1024)) if SHARED_INVALIDATION else 0
+FILE_CACHE_MAX_ITEM_BYTES = int(os.getenv("FILE_CACHE_MAX_ITEM_BYTES", 32 * 1024 * 1024))
+FILE_CACHE_CONTROL = os.getenv("FILE_CACHE_CONTROL", "public, max-age=86400")
+file_cache = ByteBudgetLRU(FILE_CACHE_MAX_BYTES, FILE_CACHE_MAX_ITEM_BYTES)
+# Previews rendered on demand at non-default widths
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", 32 * 1024 * 1024)) if SHARED_INVALIDATION else 0
+preview_cache = ByteBudgetLRU(PREVIEW_CACHE_MAX_BYTES)
+
+# What to do when an upload is a near-duplicate of an existing test of the same subject
+DUPLICATE_POLICIES = ["reject", "flag", "allow"]
+# "flag" records the match but still creates the test, as uploads did before duplicate checks
+DEFAULT_DUPLICATE_POLICY = "flag"
+# Completed archive entries are written to Mongo in chunks of this size
+ARCHIVE_INSERT_BATCH = 25
 
 # Response model that excludes binary data to avoid UTF-8 serialization errors
 class TestResponse(BaseModel):
@@ -24,8 +67,12 @@ class TestResponse(BaseModel):
     exam_period: str
     academic_year: str
     test_type: str
-    full_text: str
+    full_text: Optional[str] = None  # Left out of ranked text search results unless asked for
     file_extension: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    near_duplicates: List[str] = []  # Tests with a near-identical text (SimHash), filled in on upload
+    score: Optional[float] = None  # Text search relevance
+    snippets: Optional[List[str]] = None  # Matching lines with <mark>ed terms, from text search
 
     @staticmethod
     def from_test(test: Test):
@@ -37,8 +84,161 @@ class TestResponse(BaseModel):
             academic_year=test.academic_year,
             test_type=test.test_type,
             full_text=test.full_text,
-            file_extension=test.file_extension
+            file_extension=test.file_extension,
+            duplicate_of=test.duplicate_of
+        )
+
+class TestPageHashProjection(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    page_hashes: List[int] = []
+
+
+def _validate_duplicate_policy(duplicate_policy: str) -> str:
+    duplicate_policy = duplicate_policy.lower()
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid duplicate_policy. Allowed values: {', '.join(DUPLICATE_POLICIES)}"
+        )
+    return duplicate_policy
+
+
+async def _compute_page_hashes(file_content: bytes, filename: str) -> List[int]:
+    """Perceptual page hashes from the worker pool; hashing problems never block an upload."""
+    try:
+        return await run_in_pool(compute_page_hashes, file_content, filename)
+    except Exception as e:
+        print(f"Perceptual hashing failed: {e}")
+        return []
+
+
+async def _find_near_duplicate(subject_code: str, page_hashes: List[int]) -> Optional[str]:
+    """
+    Id of an existing test of the same subject whose pages match these hashes.
+    Candidates share at least one hash band (indexed), exact Hamming distance is checked here.
+    """
+    if not page_hashes:
+        return None
+
+    candidates = await Test.find(
+        {"subject_code": subject_code, "phash_bands": {"$in": page_hash_bands(page_hashes)}}
+    ).project(TestPageHashProjection).to_list()
+
+    for candidate in candidates:
+        if pages_match(page_hashes, candidate.page_hashes):
+            return str(candidate.id)
+    return None
+
+
+async def _check_near_duplicate(subject_code: str, page_hashes: List[int], duplicate_policy: str) -> Optional[str]:
+    """Apply the duplicate policy before OCR: raise 409 on reject, return the match id on flag."""
+    if duplicate_policy == "allow":
+        return None
+
+    duplicate_id = await _find_near_duplicate(subject_code, page_hashes)
+    if duplicate_id and duplicate_policy == "reject":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"This file looks like a duplicate of test {duplicate_id}"
         )
+    return duplicate_id
+
+
+class TestSimhashProjection(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    subject_code: str
+    exam_period: str
+    academic_year: str
+    simhash: Optional[int] = None
+
+
+class TextDuplicate(BaseModel):
+    id: str
+    subject_code: str
+    exam_period: str
+    academic_year: str
+    distance: int
+
+
+class DuplicateCheckRequest(BaseModel):
+    full_text: str
+
+
+class DuplicateCheckResponse(BaseModel):
+    simhash: Optional[str] = None  # hex
+    duplicates: List[TextDuplicate]
+
+
+async def _find_text_duplicates(
+        simhash_value: Optional[int],
+        exclude_id: Optional[PydanticObjectId] = None,
+        max_distance: int = SIMHASH_MAX_DISTANCE
+) -> List[TextDuplicate]:
+    """
+    Tests in any subject whose SimHash is within max_distance bits.
+    One indexed $in over the band keys yields the candidates.
+    """
+    if simhash_value is None:
+        return []
+
+    query = {"simhash_bands": {"$in": simhash_bands(simhash_value)}}
+    if exclude_id is not None:
+        query["_id"] = {"$ne": exclude_id}
+
+    candidates = await Test.find(query).project(TestSimhashProjection).to_list()
+
+    duplicates = []
+    for candidate in candidates:
+        if candidate.simhash is None:
+            continue
+        distance = hamming_distance(simhash_value, candidate.simhash)
+        if distance <= max_distance:
+            duplicates.append(TextDuplicate(
+                id=str(candidate.id),
+                subject_code=candidate.subject_code,
+                exam_period=candidate.exam_period,
+                academic_year=candidate.academic_year,
+                distance=distance
+            ))
+
+    duplicates.sort(key=lambda d: d.distance)
+    return duplicates
+
+
+async def _render_preview(file_content: bytes, filename: str, width: int = PREVIEW_WIDTH) -> tuple:
+    """First-page preview from the worker pool; (None, None) if it cannot be rendered."""
+    try:
+        return await run_in_pool(render_preview, file_content, filename, width)
+    except Exception as e:
+        print(f"Preview generation failed: {e}")
+        return None, None
+
+
+async def _optimize_for_storage(file_content: bytes, filename: str, file_extension: str) -> tuple:
+    """
+    Compacted/transcoded file for storage from the worker pool; the original on any failure.
+    Returns (content, extension), see optimize_file.
+    """
+    try:
+        return await run_in_pool(optimize_file, file_content, filename, file_extension)
+    except Exception as e:
+        print(f"File optimization failed, storing original: {e}")
+        return file_content, file_extension
+
+
+def _word_boxes_field(word_boxes: Optional[bytes]) -> Optional[Binary]:
+    return Binary(word_boxes) if word_boxes else None
+
+
+def _stored_file_fields(original: bytes, stored: bytes, stored_extension: str) -> dict:
+    return {
+        "full_file": Binary(stored),  # Wrap in Binary to store raw bytes without encoding
+        "file_extension": stored_extension,
+        "file_sha256": hashlib.sha256(stored).hexdigest(),
+        "original_size": len(original),
+        "stored_size": len(stored),
+    }
+
 
 @test_router.post("/", response_model=TestResponse, status_code=status.HTTP_201_CREATED)
 async def create_test_from_file(
@@ -46,19 +246,19 @@ async def create_test_from_file(
     exam_period: str = Form(..., description="Exam period e.g. 'Januarski 2024'"),
     academic_year: str = Form(..., description="Academic year e.g. '2023/2024'"),
     test_type: str = Form("regular", description="Test type: regular, makeup, midterm, final, practical"),
-    file: UploadFile = File(..., description="Image or PDF file of the test/exam")
+    file: UploadFile = File(..., description="Image or PDF file of the test/exam"),
+    duplicate_policy: str = Form(DEFAULT_DUPLICATE_POLICY, description="Near-duplicate upload handling: reject, flag or allow")
 ):
     """
     Create a new test by extracting text from an uploaded image or PDF.
     """
     # Validate file extension
-    allowed_extensions = ["jpg", "jpeg", "png", "pdf", "tiff", "bmp"]
     file_extension = file.filename.split(".")[-1].lower()
 
-    if file_extension not in allowed_extensions:
+    if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
+            detail=f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
 
     # Read file content
@@ -70,9 +270,18 @@ async def create_test_from_file(
             detail=f"Failed to read file: {str(e)}"
         )
     
+    # Look for a near-duplicate of the same subject before paying for OCR
+    duplicate_policy = _validate_duplicate_policy(duplicate_policy)
+    page_hashes = await _compute_page_hashes(file_content, file.filename)
+    duplicate_of = await _check_near_duplicate(subject_code, page_hashes, duplicate_policy)
+
+    # The preview renders in the worker pool while the text is extracted
+    preview_task = asyncio.ensure_future(_render_preview(file_content, file.filename))
+
     # Extract text using our new function in a background thread
     try:
-        extracted_text = await asyncio.to_thread(get_text_from_bytes, file_content, file.filename)
+        extracted = await asyncio.to_thread(extract_document, file_content, file.filename)
+        extracted_text = extracted["text"]
 
         if not extracted_text or extracted_text.strip() == "":
             raise HTTPException(
@@ -85,15 +294,30 @@ async def create_test_from_file(
             detail=f"Text extraction failed: {str(e)}"
         )
 
+    full_text = extract_questions_with_groups(extracted_text)
+    text_hash = simhash(full_text)
+    near_duplicates = await _find_text_duplicates(text_hash)
+    preview, preview_media_type = await preview_task
+    stored_content, stored_extension = await _optimize_for_storage(file_content, file.filename, file_extension)
+
     # Create Test document
     test = Test(
         subject_code=subject_code,
         exam_period=exam_period,
         academic_year=academic_year,
         test_type=test_type.lower(),
-        full_text=extract_questions_with_groups(extracted_text),
-        full_file=Binary(file_content),  # Wrap in Binary to store raw bytes without encoding
-        file_extension=file_extension
+        full_text=full_text,
+        question_count=len(extract_questions_from_text(full_text)),
+        search_text=normalize_text(full_text),
+        **_stored_file_fields(file_content, stored_content, stored_extension),
+        word_boxes=_word_boxes_field(extracted["word_boxes"]),
+        page_hashes=page_hashes,
+        phash_bands=page_hash_bands(page_hashes),
+        duplicate_of=duplicate_of,
+        simhash=text_hash,
+        simhash_bands=simhash_bands(text_hash),
+        preview=Binary(preview) if preview else None,
+        preview_media_type=preview_media_type
     )
     # Save to database
     try:
@@ -103,10 +327,16 @@ async def create_test_from_file(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save test to database: {str(e)}"
         )
+    mark_subject_changed(test.subject_code)
+    schedule_trend_update(add_test_to_trends(test))
+    schedule_index_update([(str(test.id), test.full_text)])
+    await invalidate(CATALOG)
 
     # Convert to response
     try:
-        return TestResponse.from_test(test)
+        response = TestResponse.from_test(test)
+        response.near_duplicates = [d.id for d in near_duplicates]
+        return response
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -114,14 +344,369 @@ async def create_test_from_file(
         )
 
 
-@test_router.get("/find", response_model=List[TestResponse])
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@test_router.post("/stream")
+async def create_test_from_file_stream(
+    subject_code: str = Form(..., description="Subject code e.g. CS302"),
+    exam_period: str = Form(..., description="Exam period e.g. 'Januarski 2024'"),
+    academic_year: str = Form(..., description="Academic year e.g. '2023/2024'"),
+    test_type: str = Form("regular", description="Test type: regular, makeup, midterm, final, practical"),
+    file: UploadFile = File(..., description="Image or PDF file of the test/exam"),
+    duplicate_policy: str = Form(DEFAULT_DUPLICATE_POLICY, description="Near-duplicate upload handling: reject, flag or allow")
+):
+    """
+    Same as `POST /tests/` but streams progress as Server-Sent Events.
+
+    - `start`: number of pages
+    - `page`: page number, method (text or ocr), elapsed time, and the questions that
+      changed: `questions` replaces everything from index `question_offset` on
+      (the last question of a page may continue on the next one)
+    - `done`: the saved test (same shape as TestResponse)
+    - `error`: extraction or save failure
+    """
+    file_extension = file.filename.split(".")[-1].lower()
+
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    try:
+        file_content = await file.read()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to read file: {str(e)}"
+        )
+
+    filename = file.filename
+
+    duplicate_policy = _validate_duplicate_policy(duplicate_policy)
+    page_hashes = await _compute_page_hashes(file_content, filename)
+    duplicate_of = await _check_near_duplicate(subject_code, page_hashes, duplicate_policy)
+
+    async def events():
+        started = time.perf_counter()
+        pending = deque()
+        preview_task = asyncio.ensure_future(_render_preview(file_content, filename))
+        try:
+            # Split once, so each worker gets only its page instead of the whole upload
+            page_parts = await run_in_pool(split_pages, file_content, filename)
+            total_pages = len(page_parts)
+            yield _sse_event("start", {"pages": total_pages})
+
+            # Keep only as many pages queued as there are workers, but emit them in order
+            next_page = 0
+            pages = []
+            sent_questions = 0
+            while next_page < total_pages or pending:
+                while next_page < total_pages and len(pending) < OCR_WORKERS:
+                    pending.append(asyncio.ensure_future(
+                        run_in_pool(extract_page, page_parts[next_page], filename, next_page, True)
+                    ))
+                    page_parts[next_page] = None  # Sent; drop our copy
+                    next_page += 1
+
+                page = await pending.popleft()
+                pages.append(page)
+
+                grouped = extract_questions_with_groups("\n\n".join(p["text"] for p in pages))
+                questions = extract_questions_from_text(grouped)
+                # Only the new questions, plus the previous last one, which may have grown
+                question_offset = max(0, min(sent_questions - 1, len(questions)))
+                sent_questions = len(questions)
+                yield _sse_event("page", {
+                    "page": page["page"] + 1,
+                    "pages": total_pages,
+                    "method": page["method"],
+                    "elapsed_ms": page["elapsed_ms"],
+                    "total_elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "question_offset": question_offset,
+                    "question_count": len(questions),
+                    "questions": questions[question_offset:]
+                })
+
+            extracted = join_pages(pages)
+            if not extracted["text"] or extracted["text"].strip() == "":
+                yield _sse_event("error", {"detail": "No text could be extracted from the uploaded file"})
+                return
+
+            full_text = extract_questions_with_groups(extracted["text"])
+            text_hash = simhash(full_text)
+            near_duplicates = await _find_text_duplicates(text_hash)
+            preview, preview_media_type = await preview_task
+            stored_content, stored_extension = await _optimize_for_storage(file_content, filename, file_extension)
+
+            test = Test(
+                subject_code=subject_code,
+                exam_period=exam_period,
+                academic_year=academic_year,
+                test_type=test_type.lower(),
+                full_text=full_text,
+                question_count=len(extract_questions_from_text(full_text)),
+                search_text=normalize_text(full_text),
+                **_stored_file_fields(file_content, stored_content, stored_extension),
+                word_boxes=_word_boxes_field(extracted["word_boxes"]),
+                page_hashes=page_hashes,
+                phash_bands=page_hash_bands(page_hashes),
+                duplicate_of=duplicate_of,
+                simhash=text_hash,
+                simhash_bands=simhash_bands(text_hash),
+                preview=Binary(preview) if preview else None,
+                preview_media_type=preview_media_type
+            )
+            await test.insert()
+            mark_subject_changed(test.subject_code)
+            schedule_trend_update(add_test_to_trends(test))
+            schedule_index_update([(str(test.id), test.full_text)])
+            await invalidate(CATALOG)
+
+            response = TestResponse.from_test(test)
+            response.near_duplicates = [d.id for d in near_duplicates]
+            yield _sse_event("done", response.model_dump())
+
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Text extraction failed: {str(e)}"})
+        finally:
+            # Client went away or extraction failed: drop pages that have not started yet
+            for future in pending:
+                future.cancel()
+            preview_task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class ArchiveEntryResult(BaseModel):
+    filename: str
+    status: str  # created, failed or skipped
+    test_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class ArchiveIngestResponse(BaseModel):
+    total_entries: int
+    created: int
+    failed: int
+    skipped: int
+    entries: List[ArchiveEntryResult]
+
+
+async def _flush_archive_tests(pending: List[tuple]):
+    """Insert completed archive tests with one insert_many and fill in their report rows."""
+    if not pending:
+        return
+    # Take the batch before awaiting so entries finishing meanwhile go to the next one
+    batch = pending[:]
+    pending.clear()
+    try:
+        result = await Test.insert_many([test for test, _ in batch])
+        for (test, report), inserted_id in zip(batch, result.inserted_ids):
+            report.status = "created"
+            report.test_id = str(inserted_id)
+            test.id = inserted_id
+            mark_subject_changed(test.subject_code)
+            schedule_trend_update(add_test_to_trends(test))
+        # One segment per inserted batch
+        schedule_index_update([(str(test.id), test.full_text) for test, _ in batch])
+        await invalidate(CATALOG)
+    except Exception as e:
+        for _, report in batch:
+            report.status = "failed"
+            report.detail = f"Failed to save test to database: {str(e)}"
+
+
+@test_router.post("/archive", response_model=ArchiveIngestResponse, status_code=status.HTTP_201_CREATED)
+async def create_tests_from_archive(
+    response: Response,
+    file: UploadFile = File(..., description="Zip archive of test images/PDFs"),
+    subject_code: Optional[str] = Form(None, description="Default subject code for entries"),
+    exam_period: Optional[str] = Form(None, description="Default exam period for entries"),
+    academic_year: Optional[str] = Form(None, description="Default academic year for entries"),
+    test_type: str = Form("regular", description="Default test type for entries"),
+    duplicate_policy: str = Form(DEFAULT_DUPLICATE_POLICY, description="Near-duplicate entry handling: reject, flag or allow")
+):
+    """
+    Create many tests from one zip archive.
+
+    Metadata per entry comes from `manifest.json`/`manifest.csv` in the archive,
+    then from the file name (`SUBJECT__2023-2024__Januarski 2024[__type].pdf`),
+    then from the form defaults. Entries are read one at a time, extracted in
+    the OCR worker pool and saved in batches with `insert_many`.
+
+    Responds 201 when every entry was created, 207 when only some were and
+    422 when none were; the per-entry report is returned in every case.
+    """
+    duplicate_policy = _validate_duplicate_policy(duplicate_policy)
+    defaults = {
+        "subject_code": subject_code,
+        "exam_period": exam_period,
+        "academic_year": academic_year,
+        "test_type": test_type,
+    }
+
+    try:
+        # UploadFile is spooled to disk, so ZipFile only seeks/reads the entries it needs
+        archive = zipfile.ZipFile(file.file)
+        manifest = read_manifest(archive)
+    except (zipfile.BadZipFile, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid zip archive: {str(e)}"
+        )
+
+    reports: List[ArchiveEntryResult] = []
+    pending: List[tuple] = []
+    in_flight = set()
+    limit = asyncio.Semaphore(OCR_WORKERS * 2)
+
+    async def process_entry(info: zipfile.ZipInfo, metadata: dict, report: ArchiveEntryResult):
+        try:
+            content = await asyncio.to_thread(archive.read, info)
+
+            page_hashes = await _compute_page_hashes(content, info.filename)
+            duplicate_of = None
+            if duplicate_policy != "allow":
+                duplicate_of = await _find_near_duplicate(metadata["subject_code"], page_hashes)
+                if duplicate_of and duplicate_policy == "reject":
+                    report.status = "skipped"
+                    report.detail = f"Near-duplicate of test {duplicate_of}"
+                    return
+
+            extracted, (preview, preview_media_type) = await asyncio.gather(
+                run_in_pool(extract_document, content, info.filename),
+                _render_preview(content, info.filename)
+            )
+            extracted_text = extracted["text"]
+            if not extracted_text or extracted_text.strip() == "":
+                raise ValueError("No text could be extracted from the file")
+
+            full_text = extract_questions_with_groups(extracted_text)
+            text_hash = simhash(full_text)
+            stored_content, stored_extension = await _optimize_for_storage(
+                content, info.filename, info.filename.rsplit(".", 1)[-1].lower()
+            )
+
+            test = Test(
+                subject_code=metadata["subject_code"],
+                exam_period=metadata["exam_period"],
+                academic_year=metadata["academic_year"],
+                test_type=metadata["test_type"].lower(),
+                full_text=full_text,
+                question_count=len(extract_questions_from_text(full_text)),
+                search_text=normalize_text(full_text),
+                **_stored_file_fields(content, stored_content, stored_extension),
+                word_boxes=_word_boxes_field(extracted["word_boxes"]),
+                page_hashes=page_hashes,
+                phash_bands=page_hash_bands(page_hashes),
+                duplicate_of=duplicate_of,
+                simhash=text_hash,
+                simhash_bands=simhash_bands(text_hash),
+                preview=Binary(preview) if preview else None,
+                preview_media_type=preview_media_type
+            )
+            pending.append((test, report))
+            if len(pending) >= ARCHIVE_INSERT_BATCH:
+                await _flush_archive_tests(pending)
+        except Exception as e:
+            report.status = "failed"
+            report.detail = f"Text extraction failed: {str(e)}"
+        finally:
+            limit.release()
+
+    try:
+        for info in iter_archive_entries(archive):
+            report = ArchiveEntryResult(filename=info.filename, status="pending")
+            reports.append(report)
+
+            extension = info.filename.rsplit(".", 1)[-1].lower() if "." in info.filename else ""
+            if extension not in ALLOWED_EXTENSIONS:
+                report.status = "skipped"
+                report.detail = f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+                continue
+
+            if info.file_size > MAX_ARCHIVE_ENTRY_BYTES:
+                report.status = "skipped"
+                report.detail = f"Entry larger than {MAX_ARCHIVE_ENTRY_BYTES} bytes"
+                continue
+
+            metadata = resolve_metadata(info.filename, manifest, defaults)
+            if metadata is None:
+                report.status = "skipped"
+                report.detail = "Missing subject_code, exam_period or academic_year (manifest, file name or form)"
+                continue
+
+            # Bound the number of entries held in memory / queued on the pool
+            await limit.acquire()
+            task = asyncio.create_task(process_entry(info, metadata, report))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        await _flush_archive_tests(pending)
+    finally:
+        archive.close()
+
+    result = ArchiveIngestResponse(
+        total_entries=len(reports),
+        created=sum(1 for r in reports if r.status == "created"),
+        failed=sum(1 for r in reports if r.status == "failed"),
+        skipped=sum(1 for r in reports if r.status == "skipped"),
+        entries=reports
+    )
+    if result.created == 0:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    elif result.created < result.total_entries:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return result
+
+
+# Everything a search result needs; files, previews and hashes stay in Mongo
+SEARCH_PROJECTION = {
+    "subject_code": 1,
+    "exam_period": 1,
+    "academic_year": 1,
+    "test_type": 1,
+    "full_text": 1,
+    "file_extension": 1,
+    "duplicate_of": 1,
+}
+SEARCH_SNIPPETS = 3
+
+
+def _search_result(doc: dict, full_text: bool = True) -> TestResponse:
+    return TestResponse(
+        id=str(doc["_id"]),
+        subject_code=doc["subject_code"],
+        exam_period=doc["exam_period"],
+        academic_year=doc["academic_year"],
+        test_type=doc["test_type"],
+        full_text=doc.get("full_text", "") if full_text else None,
+        file_extension=doc.get("file_extension"),
+        duplicate_of=doc.get("duplicate_of")
+    )
+
+
+@test_router.get("/find", response_model=List[TestResponse], response_model_exclude_none=True)
 async def search_tests(
         subject_code: Optional[str] = Query(None, description="Exact match: subject code"),
         academic_year: Optional[str] = Query(None, description="Exact match: academic year"),
         exam_period: Optional[str] = Query(None, description="Exact match: exam period"),
         test_type: Optional[str] = Query(None, description="Exact match: test type"),
         text_search: Optional[str] = Query(None,
-                                           description="Text search in content (case-insensitive, partial match)"),
+                                           description="Text search in content (either script, diacritics optional)"),
+        include_full_text: bool = Query(False, description="Also return full_text with text search results"),
+        backend: str = Query(DEFAULT_SEARCH_BACKEND, description="Text search engine: mongo ($text) or bm25"),
+        prefix: bool = Query(False, description="bm25 only: also match words starting with a search term"),
+        fuzzy: bool = Query(False, description="bm25 only: also match words one typo away (OCR errors)"),
         limit: int = Query(20, ge=1, le=100),
         skip: int = Query(0, ge=0)
 ):
@@ -129,7 +714,8 @@ async def search_tests(
     Search tests with exact matching on metadata fields and flexible text search on content.
 
     - **Exact match filters**: subject_code, academic_year, exam_period, test_type
-    - **Text search**: text_search (searches within full_text field)
+    - **Text search**: text_search, ranked by relevance; results carry a score and
+      highlighted snippets instead of the full text
     """
     try:
         # Build exact match filters
@@ -147,19 +733,73 @@ async def search_tests(
         if test_type:
             query_filters["test_type"] = test_type.lower()  # Exact match
 
-        # Add text search if provided
-        if text_search:
-            # Option 1: MongoDB text search (word-based, ranked by relevance)
-            query_filters["$text"] = {"$search": text_search}
-
-            tests = await Test.find(query_filters).sort("-created_at").skip(skip).limit(limit).to_list()
-        else:
-            # Regular query with exact matches only
-            tests = await Test.find(query_filters).sort("-created_at").skip(skip).limit(limit).to_list()
+        collection = Test.get_pymongo_collection()
 
+        if backend not in SEARCH_BACKENDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid backend: {backend}. Must be one of: {', '.join(SEARCH_BACKENDS)}"
+            )
 
-        return [TestResponse.from_test(test) for test in tests]
+        # Add text search if provided
+        normalized_search = normalize_text(text_search) if text_search else ""
+        if normalized_search and backend == "bm25":
+            if not SEARCH_BM25:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="The bm25 search backend is not enabled (set SEARCH_BM25=1)"
+                )
+
+            # Metadata filters are resolved in Mongo, ranking happens in the index
+            allowed = None
+            if query_filters:
+                allowed_ids = {str(i) for i in await collection.distinct("_id", query_filters)}
+                allowed = allowed_ids.__contains__
+
+            hits = await bm25_search("tests", text_search, skip + limit, prefix, fuzzy, allowed)
+            hits = hits[skip:]
+            if not hits:
+                return []
+
+            docs = await collection.find(
+                {"_id": {"$in": [ObjectId(test_id) for test_id, _ in hits]}}, SEARCH_PROJECTION
+            ).to_list(length=len(hits))
+            docs_by_id = {str(doc["_id"]): doc for doc in docs}
+
+            results = []
+            for test_id, score in hits:
+                doc = docs_by_id.get(test_id)
+                if doc is None:  # Deleted since it was indexed
+                    continue
+                result = _search_result(doc, full_text=include_full_text)
+                result.score = score
+                result.snippets = highlight_snippets(doc.get("full_text", ""), text_search, SEARCH_SNIPPETS)
+                results.append(result)
+            return results
+
+        if normalized_search:
+            # MongoDB text search over the folded search_text, best matches first
+            query_filters["$text"] = {"$search": normalized_search}
+            score = {"$meta": "textScore"}
+
+            cursor = collection.find(query_filters, {**SEARCH_PROJECTION, "score": score})
+            docs = await cursor.sort([("score", score)]).skip(skip).limit(limit).to_list(length=limit)
+
+            results = []
+            for doc in docs:
+                result = _search_result(doc, full_text=include_full_text)
+                result.score = doc["score"]
+                result.snippets = highlight_snippets(doc.get("full_text", ""), text_search, SEARCH_SNIPPETS)
+                results.append(result)
+            return results
+
+        # Regular query with exact matches only, newest first
+        cursor = collection.find(query_filters, SEARCH_PROJECTION)
+        docs = await cursor.sort("_id", -1).skip(skip).limit(limit).to_list(length=limit)
+        return [_search_result(doc) for doc in docs]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -184,61 +824,86 @@ async def get_all_tests(
             detail=f"Failed to retrieve tests: {str(e)}"
         )
 
-def similarity_ratio(str1: str, str2: str) -> float:
-    """Calculate similarity between two strings (0 to 1)"""
-    return SequenceMatcher(None, str1.lower().strip(), str2.lower().strip()).ratio()
+class StorageStatsResponse(BaseModel):
+    tests: int
+    optimized_tests: int
+    original_bytes: int
+    stored_bytes: int
+    stored_ratio: float  # stored_bytes / original_bytes
+    file_cache: dict
+    preview_cache: dict
 
 
-def extract_questions_from_text(full_text: str) -> List[str]:
-    """Extract individual questions from full_text using same logic as frontend"""
-    if not full_text:
-        return []
+@test_router.get("/stats/storage", response_model=StorageStatsResponse)
+async def get_storage_stats():
+    """
+    Storage metrics of ingest-time file optimization (original vs stored size),
+    plus the state of the in-process file caches.
+    """
+    try:
+        pipeline = [
+            {"$match": {"original_size": {"$ne": None}}},
+            {"$group": {
+                "_id": None,
+                "tests": {"$sum": 1},
+                "optimized_tests": {"$sum": {"$cond": [{"$lt": ["$stored_size", "$original_size"]}, 1, 0]}},
+                "original_bytes": {"$sum": "$original_size"},
+                "stored_bytes": {"$sum": "$stored_size"},
+            }}
+        ]
+        result = await Test.aggregate(pipeline).to_list()
+        totals = result[0] if result else {"tests": 0, "optimized_tests": 0, "original_bytes": 0, "stored_bytes": 0}
+
+        return StorageStatsResponse(
+            tests=totals["tests"],
+            optimized_tests=totals["optimized_tests"],
+            original_bytes=totals["original_bytes"],
+            stored_bytes=totals["stored_bytes"],
+            stored_ratio=totals["stored_bytes"] / totals["original_bytes"] if totals["original_bytes"] else 1.0,
+            file_cache=file_cache.stats(),
+            preview_cache=preview_cache.stats()
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute storage stats: {str(e)}"
+        )
 
-    # Find first question (with or without parenthesis)
-    first_question_match = None
-    start_index = 0
-    has_parenthesis = True
-
-    # Try finding "1. (" pattern
-    import re
-    match = re.search(r'\n\s*1\.\s*\(', full_text)
-    if match:
-        start_index = full_text.index(match.group(0))
-    else:
-        # Try finding "1. " pattern without parenthesis
-        match = re.search(r'^\s*1\.\s+', full_text, re.MULTILINE)
-        if not match:
-            return []
-        start_index = full_text.index(match.group(0))
-        has_parenthesis = False
-
-    cleaned_text = full_text[start_index:].strip()
-
-    # Split by question numbers
-    if has_parenthesis:
-        question_parts = re.split(r'\n\s*(?=\d+\.\s*\()', cleaned_text)
-    else:
-        question_parts = re.split(r'\n\s*(?=\d+\.\s+)', cleaned_text)
-
-    question_parts = [q.strip() for q in question_parts if q.strip()]
-
-    # Remove question numbers and clean up
-    questions = []
-    for q in question_parts:
-        # Remove number prefix like "1. " or "1. ("
-        without_number = re.sub(r'^\d+\.\s*', '', q)
-        # Join lines and clean
-        cleaned = ' '.join([line.strip() for line in without_number.split('\n') if line.strip()])
-        if cleaned:
-            questions.append(cleaned)
-
-    return questions
+
+@test_router.get("/export")
+async def export_tests(
+        subject_code: Optional[str] = Query(None, description="Exact match: subject code"),
+        academic_year: Optional[str] = Query(None, description="Exact match: academic year"),
+        updated_since: Optional[datetime] = Query(None, description="Only tests changed at or after this time"),
+        after: Optional[str] = Query(None, description="Cursor token: id of the last exported test, to resume")
+):
+    """
+    Stream tests as newline-delimited JSON straight from a Mongo cursor, without files.
+    Every line carries `id`; pass the last one as `after` to resume an interrupted export.
+    """
+    query = export_query(subject_code, academic_year, updated_since, after)
+
+    async def lines():
+        async for doc in export_cursor(query):
+            yield ndjson_line({
+                "id": str(doc["_id"]),
+                "subject_code": doc.get("subject_code"),
+                "exam_period": doc.get("exam_period"),
+                "academic_year": doc.get("academic_year"),
+                "test_type": doc.get("test_type"),
+                "full_text": doc.get("full_text"),
+                "file_extension": doc.get("file_extension"),
+                "updated_at": doc.get("updated_at"),
+            })
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 class QuestionFrequency(BaseModel):
     question: str
     count: int
-    test_ids: List[str]
+    test_ids: Optional[List[str]] = None  # Omitted when include_test_ids is false
+    test_count: int  # Distinct tests the question appeared in
     exam_periods: List[str]
 
 
@@ -248,13 +913,224 @@ class QuestionAnalysisResponse(BaseModel):
     total_questions: int
     unique_questions: int
     questions: List[QuestionFrequency]
+    next_cursor: Optional[str] = None  # Pass as cursor to get the next top_k questions
+
+
+def _parse_analysis_cursor(cursor: Optional[str]) -> int:
+    """Analysis cursors are the rank of the next question to return."""
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+        if offset < 0:
+            raise ValueError(cursor)
+        return offset
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor token: {cursor}"
+        )
+
 
+def _analysis_match(
+        subject_code: str,
+        academic_year_from: Optional[str] = None,
+        academic_year_to: Optional[str] = None,
+        exam_period: Optional[str] = None,
+        test_type: Optional[str] = None
+) -> dict:
+    """
+    $match stage for analysis queries. Academic years have the fixed
+    'YYYY/YYYY' form, so the range is a plain string range on the index.
+    """
+    match = {"subject_code": subject_code}
+
+    year_range = {}
+    if academic_year_from:
+        year_range["$gte"] = academic_year_from
+    if academic_year_to:
+        year_range["$lte"] = academic_year_to
+    if year_range:
+        match["academic_year"] = year_range
+
+    if exam_period:
+        match["exam_period"] = exam_period
+    if test_type:
+        match["test_type"] = test_type.lower()
+
+    return match
 
-@test_router.get("/analyze/{subject_code}", response_model=QuestionAnalysisResponse)
+
+class StatsBucket(BaseModel):
+    key: str
+    tests: int
+    questions: int
+    avg_questions_per_test: Optional[float] = None
+
+
+class SubjectStatsResponse(BaseModel):
+    subject_code: str
+    total_tests: int
+    total_questions: int
+    avg_questions_per_test: Optional[float] = None
+    by_academic_year: List[StatsBucket]
+    by_exam_period: List[StatsBucket]
+    by_test_type: List[StatsBucket]
+
+
+def _stats_group(field: str) -> list:
+    return [
+        {"$group": {
+            "_id": f"${field}",
+            "tests": {"$sum": 1},
+            "questions": {"$sum": {"$ifNull": ["$question_count", 0]}},
+            "avg_questions_per_test": {"$avg": "$question_count"},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+@test_router.get("/analyze/{subject_code}/stats", response_model=SubjectStatsResponse)
+async def get_subject_stats(
+        subject_code: str,
+        academic_year_from: Optional[str] = Query(None, description="First academic year, e.g. '2020/2021'"),
+        academic_year_to: Optional[str] = Query(None, description="Last academic year, e.g. '2023/2024'"),
+        exam_period: Optional[str] = Query(None, description="Exact match: exam period"),
+        test_type: Optional[str] = Query(None, description="Exact match: test type")
+):
+    """
+    Cheap per-subject statistics computed by one aggregation on the
+    (subject_code, academic_year, ...) index: tests and questions per academic
+    year, exam period and test type. No test text is loaded.
+    """
+    try:
+        match = _analysis_match(subject_code, academic_year_from, academic_year_to, exam_period, test_type)
+        pipeline = [
+            {"$match": match},
+            {"$project": {"academic_year": 1, "exam_period": 1, "test_type": 1, "question_count": 1}},
+            {"$facet": {
+                "totals": [{"$group": {
+                    "_id": None,
+                    "tests": {"$sum": 1},
+                    "questions": {"$sum": {"$ifNull": ["$question_count", 0]}},
+                    "avg_questions_per_test": {"$avg": "$question_count"},
+                }}],
+                "by_academic_year": _stats_group("academic_year"),
+                "by_exam_period": _stats_group("exam_period"),
+                "by_test_type": _stats_group("test_type"),
+            }}
+        ]
+        result = (await Test.aggregate(pipeline).to_list())[0]
+
+        if not result["totals"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No tests found for subject code: {subject_code}"
+            )
+
+        def buckets(rows):
+            return [
+                StatsBucket(
+                    key=str(row["_id"]),
+                    tests=row["tests"],
+                    questions=row["questions"],
+                    avg_questions_per_test=row["avg_questions_per_test"]
+                )
+                for row in rows
+            ]
+
+        totals = result["totals"][0]
+        return SubjectStatsResponse(
+            subject_code=subject_code,
+            total_tests=totals["tests"],
+            total_questions=totals["questions"],
+            avg_questions_per_test=totals["avg_questions_per_test"],
+            by_academic_year=buckets(result["by_academic_year"]),
+            by_exam_period=buckets(result["by_exam_period"]),
+            by_test_type=buckets(result["by_test_type"])
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute subject stats: {str(e)}"
+        )
+
+
+class TrendsResponse(BaseModel):
+    subject_code: str
+    academic_years: List[str]
+    exam_periods: List[str]
+    questions: List[str]
+    totals: List[int]
+    by_year: List[List[int]]  # by_year[i][j]: occurrences of questions[i] in academic_years[j]
+    by_period: List[List[int]]  # by_period[i][j]: occurrences of questions[i] in exam_periods[j]
+    updated_at: datetime
+
+
+@test_router.get("/analyze/{subject_code}/trends", response_model=TrendsResponse)
+async def get_question_trends(
+        subject_code: str,
+        min_total: int = Query(1, ge=1, description="Only questions that occurred at least this many times"),
+        limit: Optional[int] = Query(None, ge=1, description="Return at most this many questions")
+):
+    """
+    Occurrence counts of each question cluster per academic year and exam period,
+    as parallel arrays, most frequent first. Kept up to date at ingest and delete,
+    so this is a single read of the subject's trend document.
+    """
+    try:
+        collection = QuestionTrend.get_pymongo_collection()
+        projection = {"clusters.test_counts": 0}
+        doc = await collection.find_one({"subject_code": subject_code}, projection)
+        if doc is None:
+            # First request for this subject: build its trends once
+            if await rebuild_trends(subject_code) is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"No tests found for subject code: {subject_code}"
+                )
+            doc = await collection.find_one({"subject_code": subject_code}, projection)
+
+        clusters = [c for c in doc.get("clusters", []) if c["total"] >= min_total]
+        clusters.sort(key=lambda c: c["total"], reverse=True)
+        if limit:
+            clusters = clusters[:limit]
+
+        return TrendsResponse(
+            subject_code=subject_code,
+            academic_years=doc.get("academic_years", []),
+            exam_periods=doc.get("exam_periods", []),
+            questions=[c["question"] for c in clusters],
+            totals=[c["total"] for c in clusters],
+            by_year=[c["by_year"] for c in clusters],
+            by_period=[c["by_period"] for c in clusters],
+            updated_at=doc["updated_at"]
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load question trends: {str(e)}"
+        )
+
+
+@test_router.get("/analyze/{subject_code}", response_model=QuestionAnalysisResponse, response_model_exclude_none=True)
 async def analyze_question_frequency(
         subject_code: str,
         similarity_threshold: float = Query(0.85, ge=0.0, le=1.0,
-                                            description="Similarity threshold for matching questions (0.85 = 85% similar)")
+                                            description="Similarity threshold for matching questions (0.85 = 85% similar)"),
+        academic_year_from: Optional[str] = Query(None, description="First academic year, e.g. '2020/2021'"),
+        academic_year_to: Optional[str] = Query(None, description="Last academic year, e.g. '2023/2024'"),
+        exam_period: Optional[str] = Query(None, description="Exact match: exam period"),
+        test_type: Optional[str] = Query(None, description="Exact match: test type"),
+        top_k: Optional[int] = Query(None, ge=1, le=1000, description="Return only this many questions per page"),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        include_test_ids: bool = Query(True, description="Include member test ids (false returns only counts)")
 ):
     """
     Analyze question frequency for a specific subject.
@@ -262,80 +1138,49 @@ async def analyze_question_frequency(
 
     - **subject_code**: The subject code to analyze
     - **similarity_threshold**: Questions with similarity above this threshold are considered the same (default 0.85)
+    - **academic_year_from / academic_year_to / exam_period / test_type**: filters applied in Mongo
+    - **top_k / cursor**: page through the ranking; without top_k every question is returned
     """
     try:
-        # Get all tests for this subject
-        tests = await Test.find(Test.subject_code == subject_code).to_list()
-
-        if not tests:
+        offset = _parse_analysis_cursor(cursor)
+        # Filter in Mongo and fetch only the fields the analysis needs (no files);
+        # results are cached per subject version and kept warm for hot subjects
+        match = _analysis_match(subject_code, academic_year_from, academic_year_to, exam_period, test_type)
+        async with interactive_request(subject_code):
+            analysis = await get_analysis(match, similarity_threshold)
+
+        if not analysis["total_tests"]:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No tests found for subject code: {subject_code}"
             )
 
-        # Extract all questions from all tests
-        all_questions = []
-        for test in tests:
-            questions = extract_questions_from_text(test.full_text)
-            for q in questions:
-                all_questions.append({
-                    'text': q,
-                    'test_id': str(test.id),
-                    'exam_period': test.exam_period
-                })
-
-        # Group similar questions
-        question_groups = []
-        processed = set()
-
-        for i, q1 in enumerate(all_questions):
-            if i in processed:
-                continue
-
-            # Start a new group
-            group = {
-                'question': q1['text'],
-                'count': 1,
-                'test_ids': [q1['test_id']],
-                'exam_periods': [q1['exam_period']]
-            }
-            processed.add(i)
-
-            # Find similar questions
-            for j, q2 in enumerate(all_questions):
-                if j <= i or j in processed:
-                    continue
-
-                # Check similarity
-                sim = similarity_ratio(q1['text'], q2['text'])
-                if sim >= similarity_threshold:
-                    group['count'] += 1
-                    group['test_ids'].append(q2['test_id'])
-                    group['exam_periods'].append(q2['exam_period'])
-                    processed.add(j)
+        question_groups = analysis["groups"]
 
-            question_groups.append(group)
-
-        # Sort by frequency (most common first)
-        question_groups.sort(key=lambda x: x['count'], reverse=True)
+        # Most common first; a page only keeps top_k groups on a heap
+        page = rank_groups(question_groups, offset, top_k)
+        next_offset = offset + len(page)
+        next_cursor = str(next_offset) if top_k and next_offset < len(question_groups) else None
 
         # Convert to response model
         questions_freq = [
             QuestionFrequency(
                 question=g['question'],
                 count=g['count'],
-                test_ids=g['test_ids'],
+                test_ids=g['test_ids'] if include_test_ids else None,
+                test_count=len(set(g['test_ids'])),
                 exam_periods=list(set(g['exam_periods']))  # Remove duplicates
             )
-            for g in question_groups
+            for g in page
         ]
 
         return QuestionAnalysisResponse(
             subject_code=subject_code,
-            total_tests=len(tests),
-            total_questions=len(all_questions),
+            total_tests=analysis["total_tests"],
+            total_questions=analysis["total_questions"],
             unique_questions=len(question_groups),
-            questions=questions_freq
+            questions=questions_freq,
+            next_cursor=next_cursor
         )
 
     except HTTPException:
@@ -371,6 +1216,8 @@ async def update_test(test_id: str, update_data: TestUpdateRequest):
                 detail=f"Test with ID {test_id} not found"
             )
 
+        old_placement = (test.academic_year, test.exam_period)
+
         if update_data.exam_period is not None:
             test.exam_period = update_data.exam_period
 
@@ -380,7 +1227,12 @@ async def update_test(test_id: str, update_data: TestUpdateRequest):
         if update_data.test_type is not None:
             test.test_type = update_data.test_type.lower()
 
+        test.updated_at = datetime.utcnow()
         await test.save()
+        mark_subject_changed(test.subject_code)
+        if (test.academic_year, test.exam_period) != old_placement:
+            schedule_trend_update(rebuild_trends(test.subject_code))
+            await invalidate(CATALOG)
 
         return TestResponse.from_test(test)
 
@@ -393,6 +1245,20 @@ async def update_test(test_id: str, update_data: TestUpdateRequest):
         )
 
 
+def _evict_test_files(test_id: str):
+    file_cache.pop(test_id)
+    for key in preview_cache.keys():
+        if key[0] == test_id:
+            preview_cache.pop(key)
+
+
+async def test_files_listener(message: str):
+    # A test deleted through another worker: stop serving its file and previews here
+    namespace, _, test_id = message.partition(":")
+    if namespace == TEST_FILES and test_id:
+        _evict_test_files(test_id)
+
+
 @test_router.delete("/{test_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_test(test_id: str):
     try:
@@ -413,6 +1279,14 @@ async def delete_test(test_id: str):
             )
 
         await test.delete()
+        mark_subject_changed(test.subject_code)
+        schedule_index_removal(test_id)
+        await invalidate(CATALOG)
+        schedule_trend_update(
+            remove_test_from_trends(test.subject_code, test_id, test.academic_year, test.exam_period)
+        )
+        _evict_test_files(test_id)
+        await invalidate(f"{TEST_FILES}:{test_id}")
 
         return None
 
@@ -424,8 +1298,36 @@ async def delete_test(test_id: str):
             detail=f"Failed to delete test: {str(e)}"
         )
 
+FILE_MIMETYPES = {
+    "pdf": "application/pdf",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "tiff": "image/tiff",
+    "bmp": "image/bmp",
+    "webp": "image/webp"
+}
+
+
+class TestFileHashProjection(BaseModel):
+    file_sha256: Optional[str] = None
+    file_extension: Optional[str] = None
+
+
+def _file_response_headers(test_id: str, file_extension: Optional[str], file_sha256: str) -> dict:
+    return {
+        "ETag": f'"{file_sha256}"',
+        "Cache-Control": FILE_CACHE_CONTROL,
+        "Content-Disposition": f'inline; filename="test_{test_id}.{file_extension or "pdf"}"'
+    }
+
+
 @test_router.get("/{test_id}/file")
-async def get_test_file(test_id: str):
+async def get_test_file(test_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Original uploaded file. Served from an in-process byte-bounded LRU when hot,
+    with a strong ETag (SHA-256 of the content) and 304 for If-None-Match.
+    """
     try:
         try:
             obj_id = ObjectId(test_id)
@@ -436,6 +1338,24 @@ async def get_test_file(test_id: str):
                 detail=f"Invalid test ID format: {test_id}"
             )
 
+        # Hot path: no Mongo round trip at all
+        cached = file_cache.get(test_id)
+        if cached is not None:
+            file_sha256, file_extension, content = cached
+            headers = _file_response_headers(test_id, file_extension, file_sha256)
+            if etag_matches(if_none_match, file_sha256):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=content, media_type=_file_media_type(file_extension), headers=headers)
+
+        # Conditional request: compare against the stored hash without transferring the file
+        if if_none_match:
+            meta = await Test.find_one(Test.id == obj_id).project(TestFileHashProjection)
+            if meta and etag_matches(if_none_match, meta.file_sha256):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=_file_response_headers(test_id, meta.file_extension, meta.file_sha256)
+                )
+
         test = await Test.get(obj_id)
 
         if not test:
@@ -450,26 +1370,15 @@ async def get_test_file(test_id: str):
                 detail=f"No file found for test with ID {test_id}"
             )
 
-        mimetype = {
-            "pdf": "application/pdf",
-            "jpg": "image/jpeg",
-            "jpeg": "image/jpeg",
-            "png": "image/png",
-            "tiff": "image/tiff",
-            "bmp": "image/bmp"
-        }
-
-        content_type = mimetype.get(
-            test.file_extension.lower() if test.file_extension else "pdf",
-            "application/octet-stream"
-        )
+        content = bytes(test.full_file)
+        # Documents stored before file_sha256 existed get it computed on first download
+        file_sha256 = test.file_sha256 or hashlib.sha256(content).hexdigest()
+        file_cache.put(test_id, (file_sha256, test.file_extension, content), len(content))
 
         return Response(
-            content=bytes(test.full_file),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f'inline; filename="test_{test_id}.{test.file_extension or "pdf"}"'
-            }
+            content=content,
+            media_type=_file_media_type(test.file_extension),
+            headers=_file_response_headers(test_id, test.file_extension, file_sha256)
         )
 
     except HTTPException:
@@ -480,4 +1389,234 @@ async def get_test_file(test_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve file: {str(e)}"
         )
-        
\ No newline at end of file
+
+
+def _file_media_type(file_extension: Optional[str]) -> str:
+    return FILE_MIMETYPES.get(
+        file_extension.lower() if file_extension else "pdf",
+        "application/octet-stream"
+    )
+
+
+class TestPreviewProjection(BaseModel):
+    model_config = {"arbitrary_types_allowed": True}
+
+    preview: Optional[Any] = None
+    preview_media_type: Optional[str] = None
+    file_extension: Optional[str] = None
+
+
+async def _load_file_content(test_id: str, obj_id: ObjectId) -> tuple:
+    """(content, file_extension) of a test's original file, using the hot file cache when possible."""
+    cached = file_cache.get(test_id)
+    if cached is not None:
+        return cached[2], cached[1]
+
+    test = await Test.get(obj_id)
+    if not test or not test.full_file:
+        return None, None
+    return bytes(test.full_file), test.file_extension
+
+
+@test_router.get("/{test_id}/preview")
+async def get_test_preview(
+        test_id: str,
+        width: Optional[int] = Query(None, ge=PREVIEW_MIN_WIDTH, le=PREVIEW_MAX_WIDTH,
+                                     description=f"Preview width in pixels (default {PREVIEW_WIDTH})"),
+        if_none_match: Optional[str] = Header(None)
+):
+    """
+    Small first-page preview (WebP/JPEG) of a test. The default width is generated at
+    ingest and stored with the test; other widths are rendered once and kept in memory.
+    """
+    try:
+        try:
+            obj_id = ObjectId(test_id)
+        except (InvalidId, Exception):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid test ID format: {test_id}"
+            )
+
+        width = width or PREVIEW_WIDTH
+        preview, media_type = None, None
+
+        if width == PREVIEW_WIDTH:
+            stored = await Test.find_one(Test.id == obj_id).project(TestPreviewProjection)
+            if not stored:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Test with ID {test_id} not found"
+                )
+            if stored.preview:
+                preview, media_type = bytes(stored.preview), stored.preview_media_type
+        else:
+            cached = preview_cache.get((test_id, width))
+            if cached is not None:
+                preview, media_type = cached
+
+        if preview is None:
+            content, file_extension = await _load_file_content(test_id, obj_id)
+            if content is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"No file found for test with ID {test_id}"
+                )
+
+            preview, media_type = await _render_preview(content, f"test.{file_extension or 'pdf'}", width)
+            if preview is None:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Could not render a preview for test with ID {test_id}"
+                )
+
+            if width == PREVIEW_WIDTH:
+                # Tests stored before previews existed get theirs saved on first view
+                await Test.find_one(Test.id == obj_id).update(
+                    {"$set": {"preview": Binary(preview), "preview_media_type": media_type}}
+                )
+            else:
+                preview_cache.put((test_id, width), (preview, media_type), len(preview))
+
+        etag = hashlib.sha256(preview).hexdigest()[:32]
+        headers = {"ETag": f'"{etag}"', "Cache-Control": FILE_CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(content=preview, media_type=media_type, headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve preview: {str(e)}"
+        )
+
+
+class WordBoxesResponse(BaseModel):
+    test_id: str
+    count: int
+    page: List[int]
+    block: List[int]
+    line: List[int]
+    left: List[int]
+    top: List[int]
+    width: List[int]
+    height: List[int]
+    conf: List[int]
+    text: List[str]
+
+
+class TestWordBoxesProjection(BaseModel):
+    model_config = {"arbitrary_types_allowed": True}
+
+    word_boxes: Optional[Any] = None
+
+
+@test_router.get("/{test_id}/boxes", response_model=WordBoxesResponse)
+async def get_test_word_boxes(test_id: str):
+    """
+    Word-level OCR boxes of a test in columnar form, so a question can be
+    highlighted inside the original file without running OCR again.
+    """
+    try:
+        try:
+            obj_id = ObjectId(test_id)
+        except (InvalidId, Exception):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid test ID format: {test_id}"
+            )
+
+        # Project only the boxes blob so the original file is not transferred
+        test = await Test.find_one(Test.id == obj_id).project(TestWordBoxesProjection)
+
+        if not test:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Test with ID {test_id} not found"
+            )
+
+        if not test.word_boxes:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No word boxes stored for test with ID {test_id}"
+            )
+
+        columns, words = unpack_word_boxes(test.word_boxes)
+
+        return WordBoxesResponse(
+            test_id=test_id,
+            count=len(words),
+            text=words,
+            **{name: columns[name].tolist() for name in WORD_BOX_COLUMNS}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve word boxes: {str(e)}"
+        )
+
+
+@test_router.post("/duplicates/check", response_model=DuplicateCheckResponse)
+async def check_text_duplicates(
+        request: DuplicateCheckRequest,
+        max_distance: int = Query(SIMHASH_MAX_DISTANCE, ge=0, le=SIMHASH_MAX_DISTANCE,
+                                  description="Maximum differing SimHash bits")
+):
+    """Find stored tests, in any subject, whose text is a near-duplicate of the given text."""
+    try:
+        text_hash = simhash(request.full_text)
+        duplicates = await _find_text_duplicates(text_hash, max_distance=max_distance)
+        return DuplicateCheckResponse(
+            simhash=f"{text_hash & 0xFFFFFFFFFFFFFFFF:016x}" if text_hash is not None else None,
+            duplicates=duplicates
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Duplicate check failed: {str(e)}"
+        )
+
+
+@test_router.get("/{test_id}/duplicates", response_model=DuplicateCheckResponse)
+async def get_test_duplicates(
+        test_id: str,
+        max_distance: int = Query(SIMHASH_MAX_DISTANCE, ge=0, le=SIMHASH_MAX_DISTANCE,
+                                  description="Maximum differing SimHash bits")
+):
+    """Near-duplicate tests of a stored test, e.g. the same exam under another period or subject code."""
+    try:
+        try:
+            obj_id = ObjectId(test_id)
+        except (InvalidId, Exception):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid test ID format: {test_id}"
+            )
+
+        test = await Test.find_one(Test.id == obj_id).project(TestSimhashProjection)
+
+        if not test:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Test with ID {test_id} not found"
+            )
+
+        duplicates = await _find_text_duplicates(test.simhash, exclude_id=test.id, max_distance=max_distance)
+        return DuplicateCheckResponse(
+            simhash=f"{test.simhash & 0xFFFFFFFFFFFFFFFF:016x}" if test.simhash is not None else None,
+            duplicates=duplicates
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Duplicate check failed: {str(e)}"
+        )
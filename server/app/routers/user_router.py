@@ -1,6 +1,5 @@
 import os
 
-import bcrypt
 from fastapi import APIRouter, HTTPException, status, Depends, Body
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
@@ -10,6 +9,8 @@ from pydantic import BaseModel, EmailStr
 from beanie import PydanticObjectId
 
 from app.models.user import User
+from app.password_hashing import hash_password, hash_password_sync, verify_password
+from app.auth_state import get_auth_state, invalidate_auth_state
 
 user_router = APIRouter()
 
@@ -40,18 +41,38 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[str] = None
+    is_admin: bool = False
+    auth_version: int = 0
 
 
-class AdminToggleRequest(BaseModel):
+class CurrentUser(BaseModel):
+    """The authenticated principal, built from token claims without loading the User document."""
+    id: PydanticObjectId
+    email: str
     is_admin: bool
+    is_active: bool = True
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+class AdminToggleRequest(BaseModel):
+    is_admin: bool
 
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Blocking; request handlers use the awaitable hash_password instead."""
+    return hash_password_sync(password)
+
+
+def user_claims(user: User) -> dict:
+    """Signed claims that let get_current_user skip loading the user on every request."""
+    return {"sub": user.email, "uid": str(user.id), "adm": user.is_admin, "ver": user.auth_version}
+
+
+async def revoke_tokens(user: User):
+    """Invalidate every token issued to the user so far; they must log in again."""
+    user.auth_version += 1
+    await user.save()
+    await invalidate_auth_state()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -66,7 +87,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,26 +97,40 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        user_id: str = payload.get("uid")
+        # Tokens issued before claims were added carry no uid: the user logs in again
+        if email is None or user_id is None or not PydanticObjectId.is_valid(user_id):
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+        token_data = TokenData(
+            email=email,
+            user_id=user_id,
+            is_admin=bool(payload.get("adm", False)),
+            auth_version=int(payload.get("ver", 0))
+        )
+    except (JWTError, ValueError, TypeError):
         raise credentials_exception
 
-    user = await User.find_one(User.email == token_data.email)
-    if user is None:
+    state = await get_auth_state(token_data.user_id)
+    if not state["exists"]:
         raise credentials_exception
 
-    if not user.is_active:
+    if not state["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is disabled"
         )
 
-    return user
+    if state["auth_version"] != token_data.auth_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked, please log in again",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return CurrentUser(id=token_data.user_id, email=token_data.email, is_admin=token_data.is_admin)
 
 
-async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_admin_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -115,7 +150,7 @@ async def register_user(user_data: UserCreate):
 
     user = User(
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await hash_password(user_data.password),
         is_admin=False,
         is_active=True
     )
@@ -135,7 +170,7 @@ async def register_user(user_data: UserCreate):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await User.find_one(User.email == form_data.username)
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -150,25 +185,31 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=user_claims(user), expires_delta=access_token_expires
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @user_router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: CurrentUser = Depends(get_current_user)):
+    user = await User.get(current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with ID {current_user.id} not found"
+        )
     return UserResponse(
-        id=str(current_user.id),
-        email=current_user.email,
-        is_admin=current_user.is_admin,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at
+        id=str(user.id),
+        email=user.email,
+        is_admin=user.is_admin,
+        is_active=user.is_active,
+        created_at=user.created_at
     )
 
 
 @user_router.get("/", response_model=List[UserResponse])
-async def list_all_users(current_user: User = Depends(get_current_admin_user)):
+async def list_all_users(current_user: CurrentUser = Depends(get_current_admin_user)):
     users = await User.find_all().to_list()
 
     return [
@@ -187,7 +228,7 @@ async def list_all_users(current_user: User = Depends(get_current_admin_user)):
 async def toggle_admin_privileges(
         user_id: PydanticObjectId,
         admin_data: AdminToggleRequest,
-        current_user: User = Depends(get_current_admin_user)
+        current_user: CurrentUser = Depends(get_current_admin_user)
 ):
     target_user = await User.get(user_id)
     if not target_user:
@@ -203,7 +244,7 @@ async def toggle_admin_privileges(
         )
 
     target_user.is_admin = admin_data.is_admin
-    await target_user.save()
+    await revoke_tokens(target_user)
 
     return UserResponse(
         id=str(target_user.id),
@@ -218,7 +259,7 @@ async def toggle_admin_privileges(
 async def toggle_user_active_status(
         user_id: PydanticObjectId,
         is_active: bool = Body(..., embed=True),
-        current_user: User = Depends(get_current_admin_user)
+        current_user: CurrentUser = Depends(get_current_admin_user)
 ):
     target_user = await User.get(user_id)
     if not target_user:
@@ -234,7 +275,7 @@ async def toggle_user_active_status(
         )
 
     target_user.is_active = is_active
-    await target_user.save()
+    await revoke_tokens(target_user)
 
     return UserResponse(
         id=str(target_user.id),
@@ -248,7 +289,7 @@ async def toggle_user_active_status(
 @user_router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
         user_id: PydanticObjectId,
-        current_user: User = Depends(get_current_admin_user)
+        current_user: CurrentUser = Depends(get_current_admin_user)
 ):
     target_user = await User.get(user_id)
     if not target_user:
@@ -264,4 +305,5 @@ async def delete_user(
         )
 
     await target_user.delete()
-    return None
\ No newline at end of file
+    await invalidate_auth_state()
+    return None
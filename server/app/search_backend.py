@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.analysis import extract_questions_from_text
+from processing.bm25_index import MANIFEST_NAME, BM25Index
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, run a single API worker there
+    fcntl = None
+
+# Set SEARCH_BM25=1 to maintain the in-process BM25 index next to Mongo's $text index
+SEARCH_BM25 = os.getenv("SEARCH_BM25", "0").lower() in ("1", "true", "yes")
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "search_index")
+# Segments are merged in the background once an index has more than this many
+BM25_MAX_SEGMENTS = int(os.getenv("BM25_MAX_SEGMENTS", 8))
+BM25_MERGE_FACTOR = 4
+# Processes that do not hold the writer lock re-read the manifest at most this often
+BM25_RELOAD_SECONDS = float(os.getenv("BM25_RELOAD_SECONDS", 5))
+WRITER_LOCK_NAME = "writer.lock"
+
+SEARCH_BACKENDS = ["mongo", "bm25"]
+DEFAULT_SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo")
+
+# One index of whole tests and one of their extracted questions ("<test_id>:<n>")
+INDEX_KINDS = ["tests", "questions"]
+
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+# kind -> (manifest mtime the index was opened at, time it was last checked)
+_index_checked: Dict[str, Tuple[float, float]] = {}
+_background_tasks = set()
+
+_writer_lock = threading.Lock()
+_writer_lock_file = None
+_is_writer: Optional[bool] = None
+
+
+def acquire_writer_lock() -> bool:
+    """
+    Each process keeps its own segment list and rewrites the manifest from it,
+    so only one process may write the index directory. The first to ask takes
+    an exclusive lock file for its lifetime; in every other process (further
+    uvicorn workers, build_search_index while the API runs) this returns False,
+    updates are skipped there and searches follow the writer's manifest.
+    """
+    global _writer_lock_file, _is_writer
+    with _writer_lock:
+        if _is_writer is not None:
+            return _is_writer
+        os.makedirs(BM25_INDEX_DIR, exist_ok=True)
+        if fcntl is None:
+            _is_writer = True
+            return True
+        lock_file = open(os.path.join(BM25_INDEX_DIR, WRITER_LOCK_NAME), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            _is_writer = False
+            print(f"[search] {BM25_INDEX_DIR} is written by another process; this one only reads it")
+            return False
+        _writer_lock_file = lock_file
+        _is_writer = True
+        return True
+
+
+def _manifest_mtime(kind: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(BM25_INDEX_DIR, kind, MANIFEST_NAME))
+    except OSError:
+        return 0.0
+
+
+def get_index(kind: str) -> BM25Index:
+    """
+    Open an index on first use; updates and searches call this from worker threads.
+    In processes that are not the writer, the index is reopened when the writer
+    has replaced its manifest since.
+    """
+    is_writer = acquire_writer_lock()
+    with _indexes_lock:
+        now = time.monotonic()
+        if kind in _indexes and not is_writer:
+            opened_mtime, checked_at = _index_checked[kind]
+            if now - checked_at >= BM25_RELOAD_SECONDS:
+                mtime = _manifest_mtime(kind)
+                _index_checked[kind] = (opened_mtime, now)
+                if mtime != opened_mtime:
+                    try:
+                        _indexes[kind] = BM25Index(os.path.join(BM25_INDEX_DIR, kind))
+                        _index_checked[kind] = (mtime, now)
+                    except (OSError, ValueError) as e:
+                        # A merge removed a segment while it was being opened: retry next time
+                        print(f"[search] reloading the {kind} index failed: {e}")
+        if kind not in _indexes:
+            mtime = _manifest_mtime(kind)
+            _indexes[kind] = BM25Index(os.path.join(BM25_INDEX_DIR, kind))
+            _index_checked[kind] = (mtime, now)
+        return _indexes[kind]
+
+
+def question_doc_id(test_id: str, index: int) -> str:
+    return f"{test_id}:{index}"
+
+
+def split_question_doc_id(doc_id: str) -> Tuple[str, int]:
+    test_id, index = doc_id.rsplit(":", 1)
+    return test_id, int(index)
+
+
+def index_tests(tests: Iterable[Tuple[str, str]]):
+    """Add or replace (test_id, full_text) pairs in both indexes, merging segments when needed."""
+    tests = list(tests)
+    if not tests:
+        return
+
+    questions = []
+    for test_id, full_text in tests:
+        questions.extend(
+            (question_doc_id(test_id, i), q) for i, q in enumerate(extract_questions_from_text(full_text))
+        )
+
+    # Replacing a test's text may leave it with fewer questions: drop the old ones first
+    question_index = get_index("questions")
+    for test_id, _ in tests:
+        question_index.delete_prefix(f"{test_id}:")
+
+    get_index("tests").add_documents(tests)
+    question_index.add_documents(questions)
+
+    for kind in INDEX_KINDS:
+        get_index(kind).merge(BM25_MAX_SEGMENTS, BM25_MERGE_FACTOR)
+
+
+def remove_test(test_id: str):
+    get_index("tests").delete([test_id])
+    get_index("questions").delete_prefix(f"{test_id}:")
+
+
+def _schedule(fn, *args):
+    async def run():
+        try:
+            await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            print(f"[search] index update failed: {e}")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def schedule_index_update(tests: List[Tuple[str, str]]):
+    """
+    Index new or changed tests off the request path (no-op unless SEARCH_BM25 is on).
+    Only the writer process updates the index; see acquire_writer_lock.
+    """
+    if SEARCH_BM25 and acquire_writer_lock():
+        _schedule(index_tests, tests)
+
+
+def schedule_index_removal(test_id: str):
+    if SEARCH_BM25 and acquire_writer_lock():
+        _schedule(remove_test, test_id)
+
+
+async def bm25_search(kind: str, query: str, limit: int, prefix: bool = False, fuzzy: bool = False,
+                      allowed: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+    return await asyncio.to_thread(get_index(kind).search, query, limit, prefix, fuzzy, allowed)
@@ -0,0 +1,57 @@
+from pymongo import UpdateOne
+
+from app.analysis import extract_questions_from_text
+from processing.hashing import simhash, simhash_bands
+from processing.text_normalization import normalize_text
+
+# Tests missing any of these get them computed from full_text
+MISSING_TEXT_FIELDS = {"$or": [{"search_text": None}, {"question_count": None}, {"simhash": None}]}
+
+
+def text_field_backfill(doc: dict) -> dict:
+    """Fields derived from full_text that the stored document lacks; no OCR involved."""
+    full_text = doc.get("full_text") or ""
+    backfill = {}
+    if doc.get("search_text") is None:
+        backfill["search_text"] = normalize_text(full_text)
+    if doc.get("question_count") is None:
+        backfill["question_count"] = len(extract_questions_from_text(full_text))
+    if doc.get("simhash") is None:
+        text_hash = simhash(full_text)
+        # Text without tokens has no SimHash; leave it unset rather than rewriting None
+        if text_hash is not None:
+            backfill.update({"simhash": text_hash, "simhash_bands": simhash_bands(text_hash)})
+    return backfill
+
+
+async def backfill_text_fields(collection, batch_size: int = 500) -> int:
+    """
+    Fill derived text fields of tests stored before those fields existed,
+    straight from the stored full_text. Safe to re-run; returns the number of
+    tests updated.
+    """
+    query = dict(MISSING_TEXT_FIELDS)
+    projection = {"full_text": 1, "search_text": 1, "question_count": 1, "simhash": 1}
+    updated = 0
+    last_id = None
+
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, projection=projection) \
+            .sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            backfill = text_field_backfill(doc)
+            if backfill:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": backfill}))
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        last_id = batch[-1]["_id"]
+
+    return updated
+
@@ -0,0 +1,228 @@
+import asyncio
+import bisect
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.analysis import cluster_questions, extract_questions_from_text, similarity_ratio
+from app.models.question_trend import QuestionTrend, TrendCluster
+from app.models.test import Test
+from app.versioning import version_filter
+from processing.worker_pool import run_in_pool
+from pymongo.errors import DuplicateKeyError
+
+# Similarity at which a question joins an existing trend cluster (same meaning as /analyze)
+TREND_SIMILARITY = float(os.getenv("TREND_SIMILARITY", 0.85))
+
+# Trend documents are read-modify-write. Saves are conditioned on the version that
+# was read, so concurrent workers retry instead of losing increments; the in-process
+# lock only keeps this worker's own updates of a subject from conflicting with each other.
+TREND_SAVE_ATTEMPTS = 5
+_subject_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+# Strong references to fire-and-forget update tasks so they are not garbage collected
+_background_tasks = set()
+
+
+def _axis_index(trend: QuestionTrend, axis_name: str, counts_name: str, value: str) -> int:
+    """Index of value on a sorted axis, inserting it (and a zero column in every cluster) when new."""
+    axis = getattr(trend, axis_name)
+    if value in axis:
+        return axis.index(value)
+    index = bisect.bisect(axis, value)
+    axis.insert(index, value)
+    for cluster in trend.clusters:
+        getattr(cluster, counts_name).insert(index, 0)
+    return index
+
+
+def _add_questions(trend: QuestionTrend, test_id: str, academic_year: str, exam_period: str, questions: List[str]):
+    year_index = _axis_index(trend, "academic_years", "by_year", academic_year)
+    period_index = _axis_index(trend, "exam_periods", "by_period", exam_period)
+
+    for question in questions:
+        target = None
+        for cluster in trend.clusters:
+            if similarity_ratio(cluster.question, question) >= trend.similarity_threshold:
+                target = cluster
+                break
+
+        if target is None:
+            target = TrendCluster(
+                question=question,
+                by_year=[0] * len(trend.academic_years),
+                by_period=[0] * len(trend.exam_periods)
+            )
+            trend.clusters.append(target)
+
+        target.total += 1
+        target.by_year[year_index] += 1
+        target.by_period[period_index] += 1
+        target.test_counts[test_id] = target.test_counts.get(test_id, 0) + 1
+
+
+def _remove_test(trend: QuestionTrend, test_id: str, academic_year: str, exam_period: str):
+    """
+    Subtract a test's occurrences. A cluster keeps its representative text even
+    when the test it came from is gone; empty clusters are dropped.
+    """
+    year_index = trend.academic_years.index(academic_year) if academic_year in trend.academic_years else None
+    period_index = trend.exam_periods.index(exam_period) if exam_period in trend.exam_periods else None
+
+    for cluster in trend.clusters:
+        occurrences = cluster.test_counts.pop(test_id, 0)
+        if not occurrences:
+            continue
+        cluster.total -= occurrences
+        if year_index is not None:
+            cluster.by_year[year_index] = max(0, cluster.by_year[year_index] - occurrences)
+        if period_index is not None:
+            cluster.by_period[period_index] = max(0, cluster.by_period[period_index] - occurrences)
+
+    trend.clusters = [c for c in trend.clusters if c.total > 0]
+
+
+async def _save_if_unchanged(trend: QuestionTrend, loaded_version: Optional[int]) -> bool:
+    """
+    Write the trend document only if no one saved it since it was loaded
+    (loaded_version None: it did not exist). False means another worker won
+    the race and the caller must reload and redo its change.
+    """
+    trend.version = (loaded_version or 0) + 1
+    trend.updated_at = datetime.utcnow()
+    doc = trend.model_dump(exclude={"id", "revision_id"})
+    collection = QuestionTrend.get_pymongo_collection()
+
+    if loaded_version is None:
+        try:
+            result = await collection.insert_one(doc)
+        except DuplicateKeyError:
+            return False
+        trend.id = result.inserted_id
+        return True
+
+    result = await collection.replace_one({"_id": trend.id, **version_filter(loaded_version)}, doc)
+    return result.matched_count == 1
+
+
+async def _delete_if_unchanged(trend: QuestionTrend) -> bool:
+    result = await QuestionTrend.get_pymongo_collection().delete_one(
+        {"_id": trend.id, **version_filter(trend.version)}
+    )
+    return result.deleted_count == 1
+
+
+async def _build_trend(subject_code: str, existing: Optional[QuestionTrend]) -> Optional[QuestionTrend]:
+    """Trend document computed from the subject's current tests; None when it has none."""
+    tests = await Test.aggregate([
+        {"$match": {"subject_code": subject_code}},
+        {"$project": {"full_text": 1, "academic_year": 1, "exam_period": 1}}
+    ]).to_list()
+    if not tests:
+        return None
+
+    all_questions = []
+    test_years = {}
+    for test in tests:
+        test_id = str(test["_id"])
+        test_years[test_id] = test.get("academic_year", "")
+        for q in extract_questions_from_text(test.get("full_text", "")):
+            all_questions.append({'text': q, 'test_id': test_id, 'exam_period': test.get("exam_period", "")})
+
+    groups = await run_in_pool(cluster_questions, all_questions, TREND_SIMILARITY)
+
+    academic_years = sorted(set(test_years.values()))
+    exam_periods = sorted({t.get("exam_period", "") for t in tests})
+    year_index = {y: i for i, y in enumerate(academic_years)}
+    period_index = {p: i for i, p in enumerate(exam_periods)}
+
+    clusters = []
+    for group in groups:
+        cluster = TrendCluster(
+            question=group['question'],
+            total=group['count'],
+            by_year=[0] * len(academic_years),
+            by_period=[0] * len(exam_periods),
+            test_counts=dict(Counter(group['test_ids']))
+        )
+        for test_id, exam_period in zip(group['test_ids'], group['exam_periods']):
+            cluster.by_year[year_index[test_years[test_id]]] += 1
+            cluster.by_period[period_index[exam_period]] += 1
+        clusters.append(cluster)
+
+    trend = existing or QuestionTrend(subject_code=subject_code, similarity_threshold=TREND_SIMILARITY)
+    trend.academic_years = academic_years
+    trend.exam_periods = exam_periods
+    trend.clusters = clusters
+    trend.similarity_threshold = TREND_SIMILARITY
+    return trend
+
+
+async def rebuild_trends(subject_code: str) -> Optional[QuestionTrend]:
+    """Recompute a subject's trend document from its tests. Returns None when the subject has no tests."""
+    async with _subject_locks[subject_code]:
+        for _ in range(TREND_SAVE_ATTEMPTS):
+            existing = await QuestionTrend.find_one(QuestionTrend.subject_code == subject_code)
+            loaded_version = existing.version if existing else None
+            trend = await _build_trend(subject_code, existing)
+            if trend is None:
+                if existing is None or await _delete_if_unchanged(existing):
+                    return None
+            elif await _save_if_unchanged(trend, loaded_version):
+                return trend
+        print(f"[trends] gave up rebuilding {subject_code} after {TREND_SAVE_ATTEMPTS} conflicting writes")
+        return await QuestionTrend.find_one(QuestionTrend.subject_code == subject_code)
+
+
+async def add_test_to_trends(test: Test):
+    """Fold a newly inserted test into its subject's trends (builds them if missing)."""
+    test_id = str(test.id)
+    questions = extract_questions_from_text(test.full_text)
+    async with _subject_locks[test.subject_code]:
+        for _ in range(TREND_SAVE_ATTEMPTS):
+            trend = await QuestionTrend.find_one(QuestionTrend.subject_code == test.subject_code)
+            if trend is None or trend.similarity_threshold != TREND_SIMILARITY:
+                break
+            # A rebuild running after the insert may already have counted it
+            if any(test_id in cluster.test_counts for cluster in trend.clusters):
+                return
+            loaded_version = trend.version
+            await asyncio.to_thread(
+                _add_questions, trend, test_id, test.academic_year, test.exam_period, questions
+            )
+            if await _save_if_unchanged(trend, loaded_version):
+                return
+
+    # No trend yet (or built with another threshold, or too contended): the rebuild includes this test
+    await rebuild_trends(test.subject_code)
+
+
+async def remove_test_from_trends(subject_code: str, test_id: str, academic_year: str, exam_period: str):
+    async with _subject_locks[subject_code]:
+        for _ in range(TREND_SAVE_ATTEMPTS):
+            trend = await QuestionTrend.find_one(QuestionTrend.subject_code == subject_code)
+            if trend is None:
+                return
+            loaded_version = trend.version
+            _remove_test(trend, test_id, academic_year, exam_period)
+            if not trend.clusters:
+                if await _delete_if_unchanged(trend):
+                    return
+            elif await _save_if_unchanged(trend, loaded_version):
+                return
+
+    await rebuild_trends(subject_code)
+
+
+def schedule_trend_update(coro):
+    """Run a trend update in the background; failures are logged, never raised to the request."""
+    async def run():
+        try:
+            await coro
+        except Exception as e:
+            print(f"[trends] update failed: {e}")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+def version_filter(expected_version: Optional[int]) -> dict:
+    """Optimistic lock condition; documents written before versioning count as version 0."""
+    if expected_version is None:
+        return {}
+    if expected_version == 0:
+        return {"version": {"$in": [0, None]}}
+    return {"version": expected_version}
+
+
+async def raise_update_conflict(collection, doc_id, expected_version: Optional[int], label: str):
+    """
+    Explain why a conditional update matched nothing: missing document (404) or
+    stale version (409). Returns when neither applies any more, e.g. the version
+    matches again by now; callers decide what that means and must raise themselves.
+    """
+    current = await collection.find_one({"_id": doc_id}, {"version": 1})
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{label} with id {doc_id} not found"
+        )
+    if expected_version is not None and current.get("version", 0) != expected_version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{label} was modified concurrently (expected version {expected_version}, "
+                   f"current {current.get('version', 0)})"
+        )
+
+
+def concurrent_update_error(label: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"{label} was modified concurrently, please retry"
+    )
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from typing import Dict, Iterator, Optional
+
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+METADATA_FIELDS = ("subject_code", "exam_period", "academic_year", "test_type")
+
+# Refuse single entries that would decompress to more than this (zip bomb guard)
+MAX_ARCHIVE_ENTRY_BYTES = int(os.getenv("MAX_ARCHIVE_ENTRY_BYTES", 50 * 1024 * 1024))
+
+
+def _is_ignored(name: str) -> bool:
+    base = name.rsplit("/", 1)[-1]
+    return (
+        name.endswith("/")
+        or name.startswith("__MACOSX/")
+        or base.startswith(".")
+        or base.lower() in MANIFEST_NAMES
+    )
+
+
+def iter_archive_entries(archive: zipfile.ZipFile) -> Iterator[zipfile.ZipInfo]:
+    """Yield file entries of the archive, skipping folders, OS metadata and the manifest."""
+    for info in archive.infolist():
+        if not _is_ignored(info.filename):
+            yield info
+
+
+def read_manifest(archive: zipfile.ZipFile) -> Dict[str, dict]:
+    """
+    Read per-file metadata from manifest.json or manifest.csv, if present.
+
+    JSON may be a list of objects with a `file` key or an object keyed by
+    file name; CSV needs a `file` column. Other columns/keys are the Test
+    metadata fields (subject_code, exam_period, academic_year, test_type).
+    Keys of the result are base file names.
+    """
+    names = {info.filename.rsplit("/", 1)[-1].lower(): info for info in archive.infolist()}
+    manifest = {}
+
+    if "manifest.json" in names:
+        data = json.loads(archive.read(names["manifest.json"]).decode("utf-8-sig"))
+        rows = data.items() if isinstance(data, dict) else ((row.get("file"), row) for row in data)
+        for file_name, row in rows:
+            if file_name:
+                manifest[os.path.basename(file_name)] = {k: row[k] for k in METADATA_FIELDS if row.get(k)}
+
+    elif "manifest.csv" in names:
+        text = archive.read(names["manifest.csv"]).decode("utf-8-sig")
+        for row in csv.DictReader(io.StringIO(text)):
+            file_name = (row.get("file") or "").strip()
+            if file_name:
+                manifest[os.path.basename(file_name)] = {
+                    k: row[k].strip() for k in METADATA_FIELDS if row.get(k) and row[k].strip()
+                }
+
+    return manifest
+
+
+def metadata_from_filename(file_name: str) -> dict:
+    """
+    Parse metadata from the naming convention
+    `SUBJECT__2023-2024__Januarski 2024[__type].ext`.
+    The academic year uses '-' in file names and is stored with '/'.
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    parts = [p.strip() for p in stem.split("__")]
+    if len(parts) < 3:
+        return {}
+
+    metadata = {
+        "subject_code": parts[0],
+        "academic_year": parts[1].replace("-", "/"),
+        "exam_period": parts[2],
+    }
+    if len(parts) > 3 and parts[3]:
+        metadata["test_type"] = parts[3]
+    return metadata
+
+
+def resolve_metadata(file_name: str, manifest: Dict[str, dict], defaults: dict) -> Optional[dict]:
+    """
+    Merge metadata for one entry: manifest first, then file naming, then
+    form defaults. Returns None if a required field is still missing.
+    """
+    metadata = {k: v for k, v in defaults.items() if v}
+    metadata.update(metadata_from_filename(file_name))
+    metadata.update(manifest.get(os.path.basename(file_name), {}))
+
+    metadata.setdefault("test_type", "regular")
+    if not all(metadata.get(k) for k in METADATA_FIELDS):
+        return None
+    return metadata
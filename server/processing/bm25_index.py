@@ -0,0 +1,371 @@
+import bisect
+import heapq
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from processing.text_normalization import tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score weights of query-term expansions relative to an exact term match
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+# Fuzzy (one edit) expansion only for words long enough not to match everything
+FUZZY_MIN_LENGTH = 5
+MAX_EXPANSIONS = 20
+
+# One posting: segment-local document number and term frequency
+POSTING_DTYPE = np.dtype([("doc", "<u4"), ("tf", "<u2")])
+MANIFEST_NAME = "manifest.json"
+
+
+def _write_atomic(path: str, write: Callable):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path: str, data):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    _write_atomic(path, write)
+
+
+def _write_npy(path: str, array: np.ndarray):
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+    _write_atomic(path, write)
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True when b is a or differs from it by one insertion, deletion or substitution."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class Segment:
+    """
+    Immutable on-disk segment: a JSON lexicon (term -> [start, count]) and doc id
+    list, plus memory-mapped .npy arrays of postings and document lengths.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        base = os.path.join(directory, name)
+        with open(f"{base}.lex.json", encoding="utf-8") as f:
+            self.lexicon: Dict[str, List[int]] = json.load(f)
+        with open(f"{base}.docs.json", encoding="utf-8") as f:
+            self.doc_ids: List[str] = json.load(f)
+        self.postings = np.load(f"{base}.post.npy", mmap_mode="r")
+        self.lengths = np.load(f"{base}.len.npy", mmap_mode="r")
+        self.terms = sorted(self.lexicon)
+        self.total_length = int(self.lengths.sum())
+
+    def term_postings(self, term: str) -> Optional[np.ndarray]:
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return None
+        start, count = entry
+        return self.postings[start:start + count]
+
+    def prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        matches = []
+        for term in self.terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    @staticmethod
+    def write(directory: str, name: str, doc_ids: List[str], lengths: List[int],
+              postings: Dict[str, List[Tuple[int, int]]]):
+        lexicon = {}
+        rows = []
+        for term in sorted(postings):
+            lexicon[term] = [len(rows), len(postings[term])]
+            rows.extend(postings[term])
+
+        base = os.path.join(directory, name)
+        _write_npy(f"{base}.post.npy", np.array(rows, dtype=POSTING_DTYPE))
+        _write_npy(f"{base}.len.npy", np.array(lengths, dtype=np.uint32))
+        _write_json(f"{base}.docs.json", doc_ids)
+        # The lexicon is written last: a segment without it was never completed
+        _write_json(f"{base}.lex.json", lexicon)
+
+    def remove_files(self, directory: str):
+        for suffix in (".lex.json", ".docs.json", ".post.npy", ".len.npy"):
+            try:
+                os.remove(os.path.join(directory, self.name + suffix))
+            except OSError:
+                pass
+
+
+class BM25Index:
+    """
+    Log-structured BM25 index. Every add_documents call writes a new immutable
+    segment; deletes are per-segment tombstones; merge() folds the smallest
+    segments into one and drops tombstoned documents. The manifest listing the
+    live segments is replaced atomically, so readers never see partial state.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.RLock()  # guards the segment list, tombstones and doc map
+        self._merge_lock = threading.Lock()
+
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        manifest = {"segments": [], "deleted": {}}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        self._order: List[str] = list(manifest["segments"])
+        self._segments: Dict[str, Segment] = {name: Segment(directory, name) for name in self._order}
+        self._deleted: Dict[str, set] = {
+            name: set(manifest["deleted"].get(name, [])) for name in self._order
+        }
+        self._rebuild_doc_map()
+
+    def _rebuild_doc_map(self):
+        self._doc_map: Dict[str, Tuple[str, int]] = {}
+        for name in self._order:
+            deleted = self._deleted[name]
+            for local, doc_id in enumerate(self._segments[name].doc_ids):
+                if local not in deleted:
+                    self._doc_map[doc_id] = (name, local)
+
+    def _write_manifest(self):
+        _write_json(os.path.join(self.directory, MANIFEST_NAME), {
+            "segments": self._order,
+            "deleted": {name: sorted(deleted) for name, deleted in self._deleted.items() if deleted},
+        })
+
+    def _new_segment_name(self) -> str:
+        return f"seg_{time.time_ns()}_{uuid.uuid4().hex[:6]}"
+
+    def _delete_locked(self, doc_id: str) -> bool:
+        location = self._doc_map.pop(doc_id, None)
+        if location is None:
+            return False
+        name, local = location
+        self._deleted[name].add(local)
+        return True
+
+    def __len__(self):
+        return len(self._doc_map)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._order)
+
+    def add_documents(self, documents: Iterable[Tuple[str, str]]):
+        """Index (doc_id, text) pairs as one new segment, replacing earlier versions of the same ids."""
+        latest = {}
+        for doc_id, text in documents:
+            latest[doc_id] = tokenize(text)
+
+        doc_ids, lengths = [], []
+        postings = defaultdict(list)
+        for doc_id, tokens in latest.items():
+            if not tokens:
+                continue
+            local = len(doc_ids)
+            doc_ids.append(doc_id)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((local, min(tf, 65535)))
+
+        # Build the segment outside the lock; searches keep running meanwhile
+        name = self._new_segment_name() if doc_ids else None
+        if name:
+            Segment.write(self.directory, name, doc_ids, lengths, postings)
+
+        with self._lock:
+            for doc_id in latest:
+                self._delete_locked(doc_id)
+            if name:
+                self._order.append(name)
+                self._segments[name] = Segment(self.directory, name)
+                self._deleted[name] = set()
+                for local, doc_id in enumerate(doc_ids):
+                    self._doc_map[doc_id] = (name, local)
+            self._write_manifest()
+
+    def delete(self, doc_ids: Iterable[str]) -> int:
+        with self._lock:
+            removed = sum(self._delete_locked(doc_id) for doc_id in doc_ids)
+            if removed:
+                self._write_manifest()
+            return removed
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            return self.delete([doc_id for doc_id in self._doc_map if doc_id.startswith(prefix)])
+
+    def _expand(self, segments: List[Segment], terms: List[str], prefix: bool, fuzzy: bool) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for term in terms:
+            weights[term] = 1.0
+
+            expansions = {}
+            if prefix:
+                for segment in segments:
+                    for candidate in segment.prefix_terms(term):
+                        expansions[candidate] = max(expansions.get(candidate, 0.0), PREFIX_WEIGHT)
+            if fuzzy and len(term) >= FUZZY_MIN_LENGTH:
+                for segment in segments:
+                    for candidate in segment.terms:
+                        if candidate[0] == term[0] and _within_one_edit(term, candidate):
+                            expansions[candidate] = max(expansions.get(candidate, 0.0), FUZZY_WEIGHT)
+
+            # Closest expansions first (shortest for prefixes), capped to keep queries cheap
+            ranked = sorted(expansions.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+            for candidate, weight in ranked[:MAX_EXPANSIONS]:
+                if candidate != term:
+                    weights[candidate] = max(weights.get(candidate, 0.0), weight)
+        return weights
+
+    def search(self, query: str, limit: int = 20, prefix: bool = False, fuzzy: bool = False,
+               allowed: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        Top `limit` (doc_id, score) pairs by BM25. `prefix` also matches words
+        starting with a query term, `fuzzy` words one edit away (OCR slips);
+        `allowed` filters doc ids before ranking.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            segments = [self._segments[name] for name in self._order]
+            deleted = {name: set(self._deleted[name]) for name in self._order}
+            live_docs = len(self._doc_map)
+        if not terms or not live_docs:
+            return []
+
+        total_length = 0
+        for segment in segments:
+            total_length += segment.total_length
+            if deleted[segment.name]:
+                total_length -= int(segment.lengths[sorted(deleted[segment.name])].sum())
+        avgdl = max(total_length / live_docs, 1.0)
+
+        weights = self._expand(segments, terms, prefix, fuzzy)
+        seg_scores = {segment.name: np.zeros(len(segment.doc_ids)) for segment in segments}
+
+        for term, weight in weights.items():
+            # Document frequency counts tombstoned copies too, like most LSM engines
+            df = sum(segment.lexicon[term][1] for segment in segments if term in segment.lexicon)
+            if not df:
+                continue
+            idf = math.log(1 + (live_docs - df + 0.5) / (df + 0.5))
+
+            for segment in segments:
+                rows = segment.term_postings(term)
+                if rows is None:
+                    continue
+                docs = rows["doc"].astype(np.int64)
+                tf = rows["tf"].astype(np.float64)
+                dl = segment.lengths[docs].astype(np.float64)
+                contribution = weight * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+                np.add.at(seg_scores[segment.name], docs, contribution)
+
+        candidates = []
+        for segment in segments:
+            scores = seg_scores[segment.name]
+            dead = deleted[segment.name]
+            for local in np.flatnonzero(scores).tolist():
+                if local in dead:
+                    continue
+                doc_id = segment.doc_ids[local]
+                if allowed is not None and not allowed(doc_id):
+                    continue
+                candidates.append((float(scores[local]), doc_id))
+
+        return [(doc_id, score) for score, doc_id in heapq.nlargest(limit, candidates)]
+
+    def merge(self, max_segments: int, merge_factor: int = 4) -> bool:
+        """
+        Merge the `merge_factor` smallest segments while there are more than
+        `max_segments`. Safe to run in a background thread next to searches and adds.
+        """
+        with self._merge_lock:
+            merged_any = False
+            while True:
+                with self._lock:
+                    if len(self._order) <= max_segments:
+                        return merged_any
+                    by_size = sorted(
+                        self._order,
+                        key=lambda n: len(self._segments[n].doc_ids) - len(self._deleted[n])
+                    )
+                    picked = by_size[:max(2, merge_factor)]
+                    sources = [self._segments[name] for name in picked]
+                    deleted_snapshot = {name: set(self._deleted[name]) for name in picked}
+
+                name = self._new_segment_name()
+                doc_ids, lengths = [], []
+                local_maps = {}
+                for segment in sources:
+                    mapping = {}
+                    for local, doc_id in enumerate(segment.doc_ids):
+                        if local in deleted_snapshot[segment.name]:
+                            continue
+                        mapping[local] = len(doc_ids)
+                        doc_ids.append(doc_id)
+                        lengths.append(int(segment.lengths[local]))
+                    local_maps[segment.name] = mapping
+
+                postings = defaultdict(list)
+                for segment in sources:
+                    mapping = local_maps[segment.name]
+                    for term, (start, count) in segment.lexicon.items():
+                        rows = segment.postings[start:start + count]
+                        for local, tf in zip(rows["doc"].tolist(), rows["tf"].tolist()):
+                            if local in mapping:
+                                postings[term].append((mapping[local], tf))
+
+                if doc_ids:
+                    Segment.write(self.directory, name, doc_ids, lengths, postings)
+
+                with self._lock:
+                    # Carry over deletes that happened while merging
+                    new_deleted = set()
+                    for segment in sources:
+                        for local in self._deleted[segment.name] - deleted_snapshot[segment.name]:
+                            if local in local_maps[segment.name]:
+                                new_deleted.add(local_maps[segment.name][local])
+
+                    for old in picked:
+                        self._order.remove(old)
+                        del self._segments[old]
+                        del self._deleted[old]
+                    if doc_ids:
+                        self._order.append(name)
+                        self._segments[name] = Segment(self.directory, name)
+                        self._deleted[name] = new_deleted
+                    self._rebuild_doc_map()
+                    self._write_manifest()
+
+                # Open searches keep their memory maps; unlinked files vanish once those close
+                for segment in sources:
+                    segment.remove_files(self.directory)
+                merged_any = True
@@ -0,0 +1,72 @@
+import io
+import os
+from typing import Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+from PIL import Image
+
+from processing.text_extraction import _is_pdf
+
+# Set OPTIMIZE_UPLOADS=0 to store uploads exactly as received
+OPTIMIZE_UPLOADS = os.getenv("OPTIMIZE_UPLOADS", "1").lower() not in ("0", "false", "no")
+EXIF_ORIENTATION = 0x0112
+
+
+def compact_pdf(data: bytes) -> bytes:
+    """Rewrite a PDF without unused objects and with deflate-compressed streams."""
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return doc.tobytes(garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, clean=True)
+
+
+def transcode_image(data: bytes) -> bytes:
+    """
+    Re-encode a raster upload as lossless WebP at its full resolution. Stored files
+    are what reextract_tests OCRs again, so storage never trades away pixels OCR
+    could use: a large photo that WebP does not shrink is simply kept as uploaded.
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    arr = np.array(img)
+    if arr.ndim == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+
+    # Quality above 100 selects lossless WebP in OpenCV
+    ok, encoded = cv2.imencode(".webp", arr, [cv2.IMWRITE_WEBP_QUALITY, 101])
+    if not ok:
+        raise ValueError("WebP encoding failed")
+    return encoded.tobytes()
+
+
+def _keeps_layout(data: bytes) -> bool:
+    """
+    Whether a single WebP frame can stand in for the image: a multi-page TIFF
+    would lose all pages but the first, and an EXIF-rotated photo would need
+    rotating, which would no longer match the word boxes OCR found on the raw pixels.
+    """
+    img = Image.open(io.BytesIO(data))
+    return getattr(img, "n_frames", 1) == 1 and img.getexif().get(EXIF_ORIENTATION, 1) == 1
+
+
+def optimize_file(data: bytes, filename: Optional[str], file_extension: str) -> Tuple[bytes, str]:
+    """
+    Storage version of an upload, run after OCR so extraction always sees the original.
+    Lossless only, so OCR word boxes fit the stored file and re-extraction sees the
+    same pixels. Returns (content, extension); the original is kept whenever the
+    rewrite is not smaller.
+    """
+    if not OPTIMIZE_UPLOADS:
+        return data, file_extension
+
+    if _is_pdf(data, filename):
+        optimized, extension = compact_pdf(data), "pdf"
+    elif not _keeps_layout(data):
+        return data, file_extension
+    else:
+        optimized, extension = transcode_image(data), "webp"
+
+    if len(optimized) >= len(data):
+        return data, file_extension
+    return optimized, extension
@@ -0,0 +1,156 @@
+import hashlib
+import io
+from typing import List, Optional
+
+import cv2
+import fitz
+import numpy as np
+from PIL import Image
+
+from processing.text_extraction import _is_pdf, extract_paper_robust
+from processing.text_normalization import tokenize
+
+# Pages are downscaled to this longest side before the paper region is located
+HASH_WORK_SIZE = 512
+HASH_RENDER_DPI = 50
+# Only the first pages are hashed; enough to recognise the same exam sheet
+MAX_HASH_PAGES = 4
+
+# Perceptual hashes within this many differing bits are treated as the same page.
+# PHASH_BANDS bands are used so that, by pigeonhole, any pair within
+# PHASH_BANDS - 1 bits shares at least one identical band.
+PHASH_MAX_DISTANCE = 6
+PHASH_BANDS = 8
+
+# SimHash neighbours of the whole test text: 4 bands of 16 bits find every
+# pair within 3 bits through an exact band match.
+SIMHASH_MAX_DISTANCE = 3
+SIMHASH_BANDS = 4
+SIMHASH_SHINGLE = 3
+
+
+def to_signed64(value: int) -> int:
+    """Mongo stores int64, so unsigned 64-bit hashes are kept in two's complement."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(to_unsigned64(a) ^ to_unsigned64(b)).count("1")
+
+
+def hash_bands(value: int, bands: int, bits: int = 64) -> List[str]:
+    """
+    Split a hash into `bands` equal slices, each tagged with its position,
+    e.g. "3:a1". Stored in a multikey index to find candidates in one query.
+    """
+    value = to_unsigned64(value)
+    width = bits // bands
+    mask = (1 << width) - 1
+    digits = (width + 3) // 4
+    return [f"{i}:{(value >> (i * width)) & mask:0{digits}x}" for i in range(bands)]
+
+
+def dhash(img: np.ndarray, hash_size: int = 8) -> int:
+    """Difference hash: sign of horizontal gradients on a (hash_size+1)×hash_size thumbnail."""
+    if len(img.shape) == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    else:
+        gray = img
+
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    value = 0
+    for bit in bits.tolist():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _downscale(img: np.ndarray) -> np.ndarray:
+    h, w = img.shape[:2]
+    scale = HASH_WORK_SIZE / max(h, w)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _page_images(data: bytes, filename: Optional[str] = None, max_pages: int = MAX_HASH_PAGES) -> List[np.ndarray]:
+    if _is_pdf(data, filename):
+        try:
+            images = []
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                for page_index in range(min(doc.page_count, max_pages)):
+                    pix = doc[page_index].get_pixmap(dpi=HASH_RENDER_DPI)
+                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    images.append(np.array(img))
+            return images
+        except Exception as e:
+            print(f"[hashing] PDF render failed, trying as image: {e}")
+
+    img = Image.open(io.BytesIO(data))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return [np.array(img)]
+
+
+def compute_page_hashes(data: bytes, filename: Optional[str] = None) -> List[int]:
+    """
+    Perceptual hash of the paper region of each of the first pages,
+    as signed 64-bit integers ready to be stored on a Test.
+    """
+    hashes = []
+    for img in _page_images(data, filename):
+        paper = extract_paper_robust(_downscale(img))
+        hashes.append(to_signed64(dhash(paper)))
+    return hashes
+
+
+def page_hash_bands(page_hashes: List[int]) -> List[str]:
+    bands = set()
+    for value in page_hashes:
+        bands.update(hash_bands(value, PHASH_BANDS))
+    return sorted(bands)
+
+
+def pages_match(new_hashes: List[int], existing_hashes: List[int], max_distance: int = PHASH_MAX_DISTANCE) -> bool:
+    """True when every hashed page of the new upload has a near-identical page in the existing test."""
+    if not new_hashes or not existing_hashes:
+        return False
+    return all(
+        min(hamming_distance(new, old) for old in existing_hashes) <= max_distance
+        for new in new_hashes
+    )
+
+
+def simhash(text: str, shingle: int = SIMHASH_SHINGLE) -> Optional[int]:
+    """
+    64-bit SimHash of the folded text (word shingles, blake2b feature hashes),
+    returned as a signed 64-bit integer. None when the text has no tokens.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+
+    if len(tokens) < shingle:
+        features = [" ".join(tokens)]
+    else:
+        features = [" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)]
+
+    digests = b"".join(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest() for f in features)
+    hashes = np.frombuffer(digests, dtype=">u8").astype(np.uint64)
+
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.astype(np.int64).sum(axis=0) * 2 - len(features)
+
+    value = 0
+    for i in np.flatnonzero(votes > 0).tolist():
+        value |= 1 << i
+    return to_signed64(value)
+
+
+def simhash_bands(value: Optional[int]) -> List[str]:
+    return hash_bands(value, SIMHASH_BANDS) if value is not None else []
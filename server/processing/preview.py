@@ -0,0 +1,72 @@
+import io
+import os
+from typing import Optional, Tuple
+
+import cv2
+import fitz
+import numpy as np
+from PIL import Image
+
+from processing.text_extraction import _is_pdf
+
+# Width of the preview generated at ingest and served when no width is asked for
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", 320))
+PREVIEW_MIN_WIDTH = 64
+PREVIEW_MAX_WIDTH = 1024
+PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "webp")  # webp or jpeg
+PREVIEW_QUALITY = 75
+
+PREVIEW_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def _first_page_image(data: bytes, filename: Optional[str], width: int) -> np.ndarray:
+    """First page as a BGR array, rendered (PDF) or decoded (image) at roughly the target width."""
+    if _is_pdf(data, filename):
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            page = doc[0]
+            # Render straight at the preview scale instead of at OCR resolution
+            zoom = width / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            return cv2.cvtColor(img, cv2.COLOR_RGB2BGR) if pix.n == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+    # Let the decoder downsample large photos while decoding (much cheaper for JPEG)
+    try:
+        source_width = Image.open(io.BytesIO(data)).size[0]
+    except Exception:
+        source_width = 0
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                            (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if source_width // factor >= width:
+            flag = reduced
+            break
+
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if img is None:
+        raise ValueError("Could not decode image for preview")
+    return img
+
+
+def render_preview(data: bytes, filename: Optional[str] = None, width: int = PREVIEW_WIDTH) -> Tuple[bytes, str]:
+    """
+    Small first-page preview of an uploaded test.
+    Returns the encoded image bytes and their media type.
+    """
+    width = max(PREVIEW_MIN_WIDTH, min(PREVIEW_MAX_WIDTH, width))
+    img = _first_page_image(data, filename, width)
+
+    h, w = img.shape[:2]
+    if w > width:
+        height = max(1, round(h * width / w))
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+    if PREVIEW_FORMAT == "webp":
+        ok, encoded = cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, PREVIEW_QUALITY])
+        if ok:
+            return encoded.tobytes(), PREVIEW_MEDIA_TYPES["webp"]
+
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode preview")
+    return encoded.tobytes(), PREVIEW_MEDIA_TYPES["jpeg"]
@@ -8,6 +8,9 @@ import numpy as np
 import pytesseract
 from PIL import Image
 import re
+import time
+
+from processing import word_boxes
 
 def extract_paper_robust_from_disk(image_path):
     img = cv2.imread(image_path)
@@ -199,46 +202,155 @@ def preprocess_fast(img):
     return binary
 
 
-def extract_text_structured(img, lang='srp'):
-    # Preprocess
-    processed = preprocess_fast(img)
+# Words at or below this confidence are dropped from the output text
+MIN_WORD_CONFIDENCE = 30
+# Lines whose mean word confidence falls below this are re-OCR'd on their own
+REOCR_LINE_CONFIDENCE = 60
+# Upper bound on re-OCR passes per page so a hopeless photo stays cheap
+MAX_REOCR_LINES = 40
+REOCR_PADDING = 6
+REOCR_UPSCALE = 2
+
+
+def preprocess_strong(img):
+    """
+    Heavier preprocessing used only for low-confidence regions:
+    upscale, denoise and adaptive threshold instead of a global Otsu split.
+    """
+    if len(img.shape) == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = img
 
-    custom_config = r'--oem 3 --psm 6'
+    upscaled = cv2.resize(gray, None, fx=REOCR_UPSCALE, fy=REOCR_UPSCALE, interpolation=cv2.INTER_CUBIC)
+    denoised = cv2.fastNlMeansDenoising(upscaled, None, h=10, templateWindowSize=7, searchWindowSize=21)
+    binary = cv2.adaptiveThreshold(
+        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+    )
 
+    return binary
+
+
+def _image_to_data(processed, lang='srp', config=r'--oem 3 --psm 6'):
     try:
-        data = pytesseract.image_to_data(
+        return pytesseract.image_to_data(
             processed,
             lang=lang,
-            config=custom_config,
+            config=config,
             output_type=pytesseract.Output.DICT
         )
     except Exception as e:
-        print(f"OCR with 'srp' failed, trying 'eng': {e}")
-        data = pytesseract.image_to_data(
+        print(f"OCR with '{lang}' failed, trying 'eng': {e}")
+        return pytesseract.image_to_data(
             processed,
             lang='eng',
-            config=custom_config,
+            config=config,
             output_type=pytesseract.Output.DICT
         )
 
-    lines = {}
-    for i in range(len(data['text'])):
-        conf = int(data['conf'][i]) if data['conf'][i] != -1 else 0
-        if conf > 30 and data['text'][i].strip():  # Lower threshold
-            line_num = data['line_num'][i]
-            block_num = data['block_num'][i]
 
-            key = (block_num, line_num)
-            if key not in lines:
-                lines[key] = []
-            lines[key].append(data['text'][i])
+def _line_from_words(columns, words, box, reocr=False):
+    conf = columns['conf']
+    kept = [word for word, keep in zip(words, (conf > MIN_WORD_CONFIDENCE).tolist()) if keep]
+    return {
+        'text': ' '.join(kept),
+        'conf': float(conf.mean()) if len(conf) else 0.0,
+        'box': tuple(int(v) for v in box),
+        'reocr': reocr,
+        'columns': columns,
+        'words': words
+    }
+
+
+def _reocr_line(img, line, lang='srp'):
+    """Run a single-line OCR pass with strong preprocessing over one line box."""
+    box = line['box']
+    h, w = img.shape[:2]
+    left = max(0, box[0] - REOCR_PADDING)
+    top = max(0, box[1] - REOCR_PADDING)
+    right = min(w, box[2] + REOCR_PADDING)
+    bottom = min(h, box[3] + REOCR_PADDING)
+    if right <= left or bottom <= top:
+        return None
+
+    region = preprocess_strong(img[top:bottom, left:right])
+    data = _image_to_data(region, lang=lang, config=r'--oem 3 --psm 7')
+
+    columns, words = word_boxes.columns_from_tesseract(data)
+    if not words:
+        return None
+
+    # Map the upscaled crop back onto page coordinates and the original line key
+    columns['left'] = (columns['left'] // REOCR_UPSCALE + left).astype(np.int32)
+    columns['top'] = (columns['top'] // REOCR_UPSCALE + top).astype(np.int32)
+    columns['width'] = (columns['width'] // REOCR_UPSCALE).astype(np.int32)
+    columns['height'] = (columns['height'] // REOCR_UPSCALE).astype(np.int32)
+    for name in ('page', 'block', 'line'):
+        columns[name][:] = line['columns'][name][0]
+
+    return _line_from_words(columns, words, box, reocr=True)
+
+
+def extract_lines_structured(img, lang='srp', reocr_low_confidence=True, page=0):
+    """
+    OCR an image and return its lines in reading order.
+
+    Each line is a dict with `text`, mean word `conf`, bounding `box`
+    (left, top, right, bottom), whether it came from a re-OCR pass, and
+    the line's word `columns`/`words` (see processing.word_boxes).
+    Lines below REOCR_LINE_CONFIDENCE are cropped out of the original
+    image and OCR'd again with `preprocess_strong`; the better of the
+    two readings is kept.
+    """
+    processed = preprocess_fast(img)
+    data = _image_to_data(processed, lang=lang)
+
+    columns, words = word_boxes.columns_from_tesseract(data, page=page)
+    grouped = word_boxes.group_lines(columns)
+    order = grouped['order']
 
-    # Format output
     result = []
-    for key in sorted(lines.keys()):
-        line = ' '.join(lines[key])
-        if line.strip():
-            result.append(line)
+    for start, end, box in zip(grouped['starts'].tolist(), grouped['ends'].tolist(), grouped['boxes']):
+        index = order[start:end]
+        result.append(_line_from_words(
+            word_boxes.take(columns, index),
+            [words[i] for i in index.tolist()],
+            box
+        ))
+
+    if not reocr_low_confidence:
+        return result
+
+    low = sorted(
+        (i for i, line in enumerate(result) if line['conf'] < REOCR_LINE_CONFIDENCE),
+        key=lambda i: result[i]['conf']
+    )[:MAX_REOCR_LINES]
+
+    if low:
+        print(f"Re-OCR of {len(low)}/{len(result)} low-confidence lines...")
+
+    for i in low:
+        try:
+            retry = _reocr_line(img, result[i], lang=lang)
+        except Exception as e:
+            print(f"Re-OCR failed for line {i}: {e}")
+            continue
+        if retry is not None and retry['text'] and retry['conf'] > result[i]['conf']:
+            result[i] = retry
+
+    return result
+
+
+def lines_to_word_boxes(lines):
+    """Collect the word columns of OCR'd lines into one (columns, words) pair."""
+    return word_boxes.concat_columns([(line['columns'], line['words']) for line in lines])
+
+
+def extract_text_structured(img, lang='srp', reocr_low_confidence=True):
+    lines = extract_lines_structured(img, lang=lang, reocr_low_confidence=reocr_low_confidence)
+
+    # Format output
+    result = [line['text'] for line in lines if line['text'].strip()]
 
     return '\n'.join(result)
 
@@ -361,6 +473,15 @@ def process_image_from_array(img):
     Returns:
         str: Extracted text from the image
     """
+    text, _ = process_image_with_boxes(img)
+    return text
+
+
+def process_image_with_boxes(img, page=0):
+    """
+    Same as process_image_from_array, but also returns the word boxes
+    of the page as a (columns, words) pair from processing.word_boxes.
+    """
     if img is None:
         raise ValueError("Input image is None")
 
@@ -371,19 +492,17 @@ def process_image_from_array(img):
     # Extract paper region
     paper = img #extract_paper_robust(img)
 
-    # Preprocess for OCR (binary)
-    processed = preprocess_fast(paper)
-
     # Extract structured text
     print("\nExtracting text...")
-    text = extract_text_structured(paper)
+    lines = extract_lines_structured(paper, page=page)
+    text = '\n'.join(line['text'] for line in lines if line['text'].strip())
 
     print("=" * 50)
     print("RESULT:")
     print("=" * 50)
     print(text)
 
-    return extract_questions_with_groups(text)
+    return extract_questions_with_groups(text), lines_to_word_boxes(lines)
 
 
 def _is_pdf_bytes(b: bytes) -> bool:
@@ -434,50 +553,151 @@ def _ext_from_name(name: Optional[str]) -> Optional[str]:
     return parts[-1].lower() if len(parts) > 1 else None
 
 
-def get_text_from_bytes(data: bytes, filename: Optional[str] = None) -> str:
+PDF_RENDER_DPI = 300
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "tiff", "bmp", "webp"]
+
+
+def _ocr_page_with_boxes(img_arr, page=0):
+    """OCR one page image the way safe_process_image does, keeping word boxes."""
+    try:
+        return process_image_with_boxes(img_arr, page=page)
+    except Exception as e:
+        return f"Text extraction failed: {str(e)}", None
+
+
+def _is_pdf(data: bytes, filename: Optional[str] = None) -> bool:
+    return bool(_is_pdf_bytes(data) or (filename and _ext_from_name(filename) == "pdf"))
+
+
+def _extract_pdf_page(page, page_index: int) -> dict:
     """
-    Unified text extraction: PDF or image bytes → text
-    Automatically uses your `safe_process_image` OCR.
+    Extract one fitz page: use its text layer when it has enough text,
+    otherwise render it and OCR the image.
     """
-    # --- PDF detection ---
-    is_pdf = _is_pdf_bytes(data) or (filename and _ext_from_name(filename) == "pdf")
+    text = page.get_text("text") or ""
+    if len(text.strip()) > 50:  # enough text → use it
+        return {
+            "page": page_index,
+            "method": "text",
+            "text": text,
+            "boxes": word_boxes.columns_from_pdf_words(page.get_text("words"), page_index, PDF_RENDER_DPI / 72)
+        }
+
+    # No text → render page to image and OCR
+    pix = page.get_pixmap(dpi=PDF_RENDER_DPI)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    img_arr = np.array(img)
+    page_text, page_boxes = _ocr_page_with_boxes(img_arr, page=page_index)
+    return {"page": page_index, "method": "ocr", "text": page_text, "boxes": page_boxes}
+
+
+def split_pages(data: bytes, filename: Optional[str] = None) -> List[bytes]:
+    """
+    The document as one self-contained PDF per page (an image stays as it is),
+    so each page can go to a worker without the whole upload. Pass a part to
+    extract_page with single_page=True.
+    """
+    if _is_pdf(data, filename):
+        try:
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                if doc.page_count <= 1:
+                    return [data]
+                parts = []
+                for page_index in range(doc.page_count):
+                    with fitz.open() as part:
+                        part.insert_pdf(doc, from_page=page_index, to_page=page_index)
+                        parts.append(part.tobytes(garbage=3, deflate=True))
+                return parts
+        except Exception as e:
+            print(f"[split_pages] PDF failed, treating as image: {e}")
+    return [data]
 
-    if is_pdf:
+
+def extract_page(data: bytes, filename: Optional[str] = None, page_index: int = 0, single_page: bool = False) -> dict:
+    """
+    Extract a single page of a document, for callers that report progress
+    page by page. With single_page, data is only that page (see split_pages)
+    and page_index is its position in the original document. Returns a dict
+    with `page`, `method` ("text" or "ocr"), `text`, `boxes` (a (columns, words)
+    pair or None) and `elapsed_ms`.
+    """
+    started = time.perf_counter()
+
+    if _is_pdf(data, filename):
         try:
-            doc = fitz.open(stream=data, filetype="pdf")
-            all_text = []
-
-            for page in doc:
-                text = page.get_text("text") or ""
-                if len(text.strip()) > 50:  # enough text → use it
-                    all_text.append(text)
-                else:
-                    # No text → render page to image and OCR
-                    pix = page.get_pixmap(dpi=300)
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    img_arr = np.array(img)
-                    all_text.append(safe_process_image(img_arr))
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                result = _extract_pdf_page(doc[0 if single_page else page_index], page_index)
+        except Exception as e:
+            print(f"[extract_page] PDF failed, OCR fallback: {e}")
+            result = {"page": page_index, "method": "ocr", "text": safe_process_image(data), "boxes": None}
+    else:
+        extracted = _extract_image(data, filename)
+        result = {"page": 0, "method": "ocr", "text": extracted["text"], "boxes": extracted["boxes"]}
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def extract_document(data: bytes, filename: Optional[str] = None) -> dict:
+    """
+    Unified extraction: PDF or image bytes → text and word boxes.
 
+    Returns a dict with `text` and `word_boxes`, the packed word columns
+    of every page (see processing.word_boxes.pack_word_boxes), or None
+    when no boxes could be collected.
+    """
+    # --- PDF detection ---
+    if _is_pdf(data, filename):
+        try:
+            doc = fitz.open(stream=data, filetype="pdf")
+            pages = [_extract_pdf_page(page, page_index) for page_index, page in enumerate(doc)]
             doc.close()
-            return "\n\n".join(all_text).strip()
+            return join_pages(pages)
 
         except Exception as e:
             # fallback: OCR on bytes as image
-            print(f"[get_text_from_bytes] PDF failed, OCR fallback: {e}")
-            return safe_process_image(data)
+            print(f"[extract_document] PDF failed, OCR fallback: {e}")
+            return {"text": safe_process_image(data), "word_boxes": None}
+
+    extracted = _extract_image(data, filename)
+    boxes = extracted["boxes"]
+    return {
+        "text": extracted["text"],
+        "word_boxes": word_boxes.pack_word_boxes(*boxes) if boxes is not None and boxes[1] else None
+    }
 
+
+def join_pages(pages: List[dict]) -> dict:
+    """Combine extract_page results (in page order) into the extract_document shape."""
+    columns, words = word_boxes.concat_columns([p["boxes"] for p in pages if p["boxes"] is not None])
+    return {
+        "text": "\n\n".join(p["text"] for p in pages).strip(),
+        "word_boxes": word_boxes.pack_word_boxes(columns, words) if words else None
+    }
+
+
+def _extract_image(data: bytes, filename: Optional[str] = None) -> dict:
     # --- Image detection ---
-    is_img = _is_image_bytes(data) or (filename and _ext_from_name(filename) in
-                                       ["jpg", "jpeg", "png", "tiff", "bmp", "webp"])
+    is_img = _is_image_bytes(data) or (filename and _ext_from_name(filename) in IMAGE_EXTENSIONS)
     if is_img:
         try:
             img = Image.open(io.BytesIO(data))
             if img.mode != "RGB":
                 img = img.convert("RGB")
             img_arr = np.array(img)
-            return safe_process_image(img_arr)
         except Exception as e:
             raise RuntimeError(f"Failed to process image: {e}")
 
+        text, boxes = _ocr_page_with_boxes(img_arr)
+        return {"text": text, "boxes": boxes}
+
     # --- Unknown fallback ---
     raise ValueError("Unsupported file type or invalid data format")
+
+
+def get_text_from_bytes(data: bytes, filename: Optional[str] = None) -> str:
+    """
+    Unified text extraction: PDF or image bytes → text
+    Automatically uses your `safe_process_image` OCR.
+    """
+    return extract_document(data, filename)["text"]
@@ -0,0 +1,99 @@
+import html
+import re
+import unicodedata
+from typing import List
+
+# Serbian Cyrillic → Latin (Gaj's alphabet)
+_CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "ђ": "đ", "е": "e", "ж": "ž",
+    "з": "z", "и": "i", "ј": "j", "к": "k", "л": "l", "љ": "lj", "м": "m", "н": "n",
+    "њ": "nj", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "ћ": "ć", "у": "u",
+    "ф": "f", "х": "h", "ц": "c", "ч": "č", "џ": "dž", "ш": "š",
+}
+_TRANSLITERATION = str.maketrans(
+    {**_CYRILLIC_TO_LATIN, **{k.upper(): v.capitalize() for k, v in _CYRILLIC_TO_LATIN.items()}}
+)
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_WORD = re.compile(r"\w+")
+
+# Characters of context kept on each side of the first match in a snippet
+SNIPPET_CONTEXT = 80
+
+
+def transliterate(text: str) -> str:
+    """Convert Serbian Cyrillic to Latin script, leaving other characters as they are."""
+    return text.translate(_TRANSLITERATION)
+
+
+def fold_text(text: str) -> str:
+    """
+    Normalize text for matching: Cyrillic → Latin, lowercase, and strip
+    diacritics (č/ć → c, š → s, ž → z, đ → dj), so the same question typed,
+    OCR'd or written in either script compares equal.
+    """
+    if not text:
+        return ""
+    text = transliterate(text).lower().replace("đ", "dj")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Folded alphanumeric tokens of a text."""
+    return [token for token in _NON_WORD.split(fold_text(text)) if token]
+
+
+def normalize_text(text: str) -> str:
+    """Folded tokens joined by single spaces."""
+    return " ".join(tokenize(text))
+
+
+def ngrams(text: str, n: int = 3) -> List[str]:
+    """Distinct character n-grams of each folded token (whole token when shorter than n)."""
+    grams = set()
+    for token in tokenize(text):
+        if len(token) <= n:
+            grams.add(token)
+        else:
+            grams.update(token[i:i + n] for i in range(len(token) - n + 1))
+    return sorted(grams)
+
+
+def highlight_snippets(text: str, query: str, max_snippets: int = 3, context: int = SNIPPET_CONTEXT) -> List[str]:
+    """
+    Lines of text containing query terms (compared folded, so either script
+    and missing diacritics match), best lines first. Each is HTML-escaped,
+    cut to `context` characters around its first match, with matched words
+    wrapped in <mark>.
+    """
+    terms = set(tokenize(query))
+    if not text or not terms:
+        return []
+
+    scored = []
+    for line_number, line in enumerate(text.splitlines()):
+        matches = [m for m in _WORD.finditer(line) if normalize_text(m.group(0)) in terms]
+        if matches:
+            distinct = len({normalize_text(m.group(0)) for m in matches})
+            scored.append((-distinct, -len(matches), line_number, line, matches))
+    scored.sort(key=lambda item: item[:3])
+
+    snippets = []
+    for _, _, _, line, matches in scored[:max_snippets]:
+        start = max(0, matches[0].start() - context)
+        end = min(len(line), matches[0].end() + context)
+
+        parts = []
+        position = start
+        for m in matches:
+            if m.start() < start or m.end() > end:
+                continue
+            parts.append(html.escape(line[position:m.start()]))
+            parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+            position = m.end()
+        parts.append(html.escape(line[position:end]))
+
+        snippet = "".join(parts).strip()
+        snippets.append(("…" if start > 0 else "") + snippet + ("…" if end < len(line) else ""))
+    return snippets
@@ -0,0 +1,183 @@
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Column layout of the stored word boxes. Coordinates are pixels of the page
+# image that was OCR'd (PDF text-layer pages are scaled to the same 300 dpi).
+WORD_BOX_DTYPES = {
+    "page": np.uint16,
+    "block": np.uint16,
+    "line": np.uint16,
+    "left": np.int32,
+    "top": np.int32,
+    "width": np.int32,
+    "height": np.int32,
+    "conf": np.int8,
+}
+WORD_BOX_COLUMNS = tuple(WORD_BOX_DTYPES.keys())
+
+WORD_BOX_FORMAT_VERSION = 1
+_MAGIC = b"IQWB"
+_HEADER = "<4sBII"
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    return {name: np.zeros(0, dtype=dtype) for name, dtype in WORD_BOX_DTYPES.items()}
+
+
+def columns_from_tesseract(data: dict, page: int = 0) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """
+    Convert a `pytesseract.image_to_data` DICT into word columns.
+    Entries without text (page/block/paragraph/line rows) are dropped.
+    """
+    text = np.asarray(data['text'], dtype=object)
+    stripped = np.char.strip(text.astype(str)) if len(text) else np.zeros(0, dtype=str)
+    mask = np.char.str_len(stripped) > 0 if len(text) else np.zeros(0, dtype=bool)
+
+    conf = np.asarray(data['conf'], dtype=np.float64)[mask]
+    conf = np.clip(np.where(conf < 0, 0, conf), 0, 100)
+
+    columns = {
+        "page": np.full(int(mask.sum()), page, dtype=np.uint16),
+        "block": np.asarray(data['block_num'])[mask].astype(np.uint16),
+        "line": np.asarray(data['line_num'])[mask].astype(np.uint16),
+        "left": np.asarray(data['left'])[mask].astype(np.int32),
+        "top": np.asarray(data['top'])[mask].astype(np.int32),
+        "width": np.asarray(data['width'])[mask].astype(np.int32),
+        "height": np.asarray(data['height'])[mask].astype(np.int32),
+        "conf": conf.astype(np.int8),
+    }
+    return columns, stripped[mask].tolist()
+
+
+def columns_from_pdf_words(words: list, page: int, scale: float) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """
+    Convert `fitz.Page.get_text("words")` tuples
+    (x0, y0, x1, y1, word, block_no, line_no, word_no) into word columns.
+    Text-layer words are exact, so they get full confidence.
+    """
+    if not words:
+        return empty_columns(), []
+
+    boxes = np.asarray([w[:4] for w in words], dtype=np.float64) * scale
+    columns = {
+        "page": np.full(len(words), page, dtype=np.uint16),
+        "block": np.asarray([w[5] for w in words]).astype(np.uint16),
+        "line": np.asarray([w[6] for w in words]).astype(np.uint16),
+        "left": np.rint(boxes[:, 0]).astype(np.int32),
+        "top": np.rint(boxes[:, 1]).astype(np.int32),
+        "width": np.rint(boxes[:, 2] - boxes[:, 0]).astype(np.int32),
+        "height": np.rint(boxes[:, 3] - boxes[:, 1]).astype(np.int32),
+        "conf": np.full(len(words), 100, dtype=np.int8),
+    }
+    return columns, [w[4] for w in words]
+
+
+def take(columns: Dict[str, np.ndarray], index) -> Dict[str, np.ndarray]:
+    return {name: values[index] for name, values in columns.items()}
+
+
+def concat_columns(parts: List[Tuple[Dict[str, np.ndarray], List[str]]]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    if not parts:
+        return empty_columns(), []
+
+    columns = {
+        name: np.concatenate([part[0][name] for part in parts]).astype(dtype)
+        for name, dtype in WORD_BOX_DTYPES.items()
+    }
+    words = [word for part in parts for word in part[1]]
+    return columns, words
+
+
+def group_lines(columns: Dict[str, np.ndarray]) -> dict:
+    """
+    Vectorized line grouping over word columns.
+
+    Words are ordered by (page, block, line) with a stable sort so the
+    original word order inside a line is kept. Returns the sort `order`,
+    line `starts`/`ends` into that order, per-line boxes as an (n, 4)
+    array of (left, top, right, bottom) and the mean word confidence.
+    """
+    n = len(columns["line"])
+    if n == 0:
+        return {
+            "order": np.zeros(0, dtype=np.intp),
+            "starts": np.zeros(0, dtype=np.intp),
+            "ends": np.zeros(0, dtype=np.intp),
+            "boxes": np.zeros((0, 4), dtype=np.int32),
+            "conf": np.zeros(0, dtype=np.float64),
+        }
+
+    order = np.lexsort((columns["line"], columns["block"], columns["page"]))
+    page = columns["page"][order]
+    block = columns["block"][order]
+    line = columns["line"][order]
+
+    changed = (np.diff(page) != 0) | (np.diff(block) != 0) | (np.diff(line) != 0)
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    ends = np.concatenate((starts[1:], [n]))
+
+    left = columns["left"][order]
+    top = columns["top"][order]
+    right = left + columns["width"][order]
+    bottom = top + columns["height"][order]
+
+    boxes = np.stack([
+        np.minimum.reduceat(left, starts),
+        np.minimum.reduceat(top, starts),
+        np.maximum.reduceat(right, starts),
+        np.maximum.reduceat(bottom, starts),
+    ], axis=1)
+
+    conf_sum = np.add.reduceat(columns["conf"][order].astype(np.int64), starts)
+    conf = conf_sum / (ends - starts)
+
+    return {"order": order, "starts": starts, "ends": ends, "boxes": boxes, "conf": conf}
+
+
+def pack_word_boxes(columns: Dict[str, np.ndarray], words: List[str]) -> bytes:
+    """
+    Serialize word columns into one compact binary blob.
+
+    Layout (zlib-compressed): magic, version, word count, text length,
+    then every column as a raw little-endian array in WORD_BOX_COLUMNS
+    order, the uint32 end offsets of each word and the UTF-8 word text.
+    """
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = np.cumsum([len(w) for w in encoded], dtype=np.int64) if encoded else np.zeros(0, dtype=np.int64)
+    text = b"".join(encoded)
+
+    body = [struct.pack(_HEADER, _MAGIC, WORD_BOX_FORMAT_VERSION, len(words), len(text))]
+    for name, dtype in WORD_BOX_DTYPES.items():
+        body.append(np.ascontiguousarray(columns[name], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+    body.append(offsets.astype('<u4').tobytes())
+    body.append(text)
+
+    return zlib.compress(b"".join(body), 6)
+
+
+def unpack_word_boxes(blob: Optional[bytes]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    if not blob:
+        return empty_columns(), []
+
+    raw = zlib.decompress(bytes(blob))
+    magic, version, count, text_length = struct.unpack_from(_HEADER, raw)
+    if magic != _MAGIC or version != WORD_BOX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported word box blob (version {version})")
+
+    position = struct.calcsize(_HEADER)
+    columns = {}
+    for name, dtype in WORD_BOX_DTYPES.items():
+        le = np.dtype(dtype).newbyteorder('<')
+        columns[name] = np.frombuffer(raw, dtype=le, count=count, offset=position).astype(dtype)
+        position += le.itemsize * count
+
+    ends = np.frombuffer(raw, dtype='<u4', count=count, offset=position).astype(np.int64)
+    position += 4 * count
+    text = raw[position:position + text_length]
+
+    starts = np.concatenate(([0], ends[:-1])) if count else ends
+    words = [text[s:e].decode('utf-8') for s, e in zip(starts.tolist(), ends.tolist())]
+    return columns, words